@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+# Latencia ticks -> comando, nos separados x fred_move_base_composite.
+#
+# No ROS rodando, faz o papel do ESP e do joystick: libera o abort manual,
+# liga a navegacao, manda um goal a frente, publica distancias livres nos
+# ultrassonicos e um par de ticks a cada periodo. Mede o tempo entre o par de
+# ticks e o primeiro /cmd_vel/navigation e /cmd_vel/safe que vem depois dele.
+#
+#   roslaunch fred_move_base odom.launch & roslaunch fred_move_base position_pid.launch & \
+#       roslaunch fred_move_base safe_twist.launch
+#   python3 benchmarks/bench_composite_latency.py --seconds 20
+#
+#   roslaunch fred_move_base composite.launch
+#   python3 benchmarks/bench_composite_latency.py --seconds 20
+#
+# Para comparar o transporte (e nao a fase dos timers), rode os nos separados
+# com fred_odom/mode=event e position_control_node/mode=odom, como no
+# composite.launch. Com --offline so mede, sem ROS rodando, o custo de
+# serializar e desserializar as mensagens que o composite deixa de trocar.
+
+import argparse
+import io
+import threading
+import time
+import timeit
+
+import numpy as np
+
+TICK_RATE = 100.0   # pares de ticks por segundo
+TICK_STEP = 20.0    # ticks por periodo em cada roda (~0.5 m/s)
+FREE_RANGE = 400.0  # cm, nada a frente
+WARMUP = 2.0        # segundos antes de comecar a medir
+
+
+def percentiles(samples):
+    if not samples:
+        return "sem amostras"
+    ms = np.array(samples) * 1e3
+    p50, p90, p99 = np.percentile(ms, (50, 90, 99))
+    return (f"n={len(ms):6d}  p50={p50:7.3f} ms  p90={p90:7.3f} ms  "
+            f"p99={p99:7.3f} ms  max={ms.max():7.3f} ms")
+
+
+class LatencyProbe:
+    """Time from the last tick pair sent to the first command after it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = None
+        self.pending = set()
+        self.samples = {}
+        self.measuring = False
+
+    def tick_sent(self, outputs):
+        with self.lock:
+            self.sent = time.perf_counter()
+            self.pending = set(outputs)
+
+    def output(self, name, msg):
+        now = time.perf_counter()
+        with self.lock:
+            if self.measuring and name in self.pending:
+                self.pending.discard(name)
+                self.samples.setdefault(name, []).append(now - self.sent)
+
+
+def run_live(seconds):
+    import rospy
+    from geometry_msgs.msg import PoseStamped
+    from std_msgs.msg import Bool, Float32, Int16
+
+    rospy.init_node("composite_latency_probe", anonymous=True)
+
+    outputs = ("/cmd_vel/navigation", "/cmd_vel/safe")
+    probe = LatencyProbe()
+    # AnyMsg: so o instante importa, e /cmd_vel/navigation pode ser Twist ou TwistStamped
+    for topic in outputs:
+        rospy.Subscriber(topic, rospy.AnyMsg, lambda msg, name=topic: probe.output(name, msg),
+                         queue_size=100, tcp_nodelay=True)
+
+    left = rospy.Publisher("power/status/distance/ticks/left", Float32, queue_size=10, tcp_nodelay=True)
+    right = rospy.Publisher("power/status/distance/ticks/right", Float32, queue_size=10, tcp_nodelay=True)
+    ranges = [rospy.Publisher(f"sensor/range/ultrasonic/{name}", Float32, queue_size=1)
+              for name in ("left", "right", "back")]
+    goal = rospy.Publisher("/goal_manager/goal/current", PoseStamped, queue_size=1, latch=True)
+    navigation = rospy.Publisher("/navigation/on", Bool, queue_size=1, latch=True)
+    abort = rospy.Publisher("joy/controler/ps4/break", Int16, queue_size=1)
+
+    # espera as conexoes com os nos
+    rospy.sleep(1.0)
+
+    pose = PoseStamped()
+    pose.header.frame_id = "odom"
+    pose.pose.position.x = 1000.0
+    pose.pose.orientation.w = 1.0
+    goal.publish(pose)
+    navigation.publish(True)
+
+    # o safe_twist comeca bloqueado: um toque no botao de break libera
+    abort.publish(1)
+    rospy.sleep(0.1)
+    abort.publish(0)
+
+    rate = rospy.Rate(TICK_RATE)
+    ticks = 0.0
+    start = time.monotonic()
+    while not rospy.is_shutdown():
+        elapsed = time.monotonic() - start
+        if elapsed > WARMUP + seconds:
+            break
+        probe.measuring = elapsed > WARMUP
+
+        for pub in ranges:
+            pub.publish(FREE_RANGE)
+
+        ticks += TICK_STEP
+        left.publish(ticks)
+        probe.tick_sent(outputs)
+        right.publish(ticks)
+        rate.sleep()
+
+    navigation.publish(False)
+
+    print(f"ticks a {TICK_RATE:.0f} Hz por {seconds:.0f} s")
+    for topic in outputs:
+        print(f"  ticks -> {topic:20s} {percentiles(probe.samples.get(topic, []))}")
+
+
+def run_offline(number):
+    # custo por mensagem que o transporte em memoria evita: serializar no
+    # publisher e desserializar em cada subscriber
+    from geometry_msgs.msg import Twist
+    from nav_msgs.msg import Odometry
+
+    for msg_type in (Odometry, Twist):
+        msg = msg_type()
+        buff = io.BytesIO()
+
+        def roundtrip():
+            buff.seek(0)
+            buff.truncate()
+            msg.serialize(buff)
+            msg_type().deserialize(buff.getvalue())
+
+        total = timeit.timeit(roundtrip, number=number)
+        print(f"  {msg_type._type:24s} serialize + deserialize {total / number * 1e6:7.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--offline", action="store_true")
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.offline:
+        run_offline(args.number)
+    else:
+        run_live(args.seconds)
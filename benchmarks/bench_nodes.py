@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+# Replay offline dos nos do fred_move_base: regressao e throughput.
+#
+# Roda o codigo dos proprios nos (setup, callbacks, timers e o passo de cada
+# loop) sobre o ReplayTransport de replay_transport, sem roscore, com um
+# fluxo gravado (rosbag) ou o cenario sintetico de replay_streams como
+# entrada e o tempo ROS seguindo o fluxo. Cada no roda sozinho, com os
+# parametros de NODES e os padroes do codigo (os mesmos dos launch files) no
+# resto. Para cada no reporta:
+#
+#   - tempo de trabalho por mensagem de entrada e p50/p99/max de cada
+#     callback, timer ou iteracao do loop (das amostras, sem histograma);
+#   - memoria (tracemalloc): pico do replay e o que o codigo de scripts/
+#     deixou alocado ao final;
+#   - equivalencia da saida (tudo o que o no publicou, menos /diagnostics)
+#     com a saida dourada em benchmarks/golden/.
+#
+#   python3 benchmarks/bench_nodes.py                     # cenario sintetico
+#   python3 benchmarks/bench_nodes.py --nodes safe_twist,ticks2odom
+#   python3 benchmarks/bench_nodes.py --bag robo.bag      # dourado: <no>.robo.json
+#   python3 benchmarks/bench_nodes.py --update-golden     # depois de mudar o comportamento
+#
+# Precisa do rospy e dos pacotes de mensagens (sem roscore). Sai com erro se
+# alguma saida diferir da dourada.
+
+import argparse
+import importlib
+import json
+import math
+import os
+import sys
+import tracemalloc
+from collections import namedtuple
+from time import perf_counter
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.normpath(os.path.join(BENCH_DIR, "..", "scripts"))
+GOLDEN_DIR = os.path.join(BENCH_DIR, "golden")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from replay_streams import synthetic, read_bag
+from replay_transport import ReplayTransport
+
+FLOAT_TOLERANCE = 1e-6
+
+
+# ------ nos: modulo, nome ROS (namespace dos ~parametros), parametros e partida
+
+# loop de um no: passo de uma iteracao, periodo (None: so acorda pelo wake), Event
+# que acorda o loop antes do periodo e atraso da primeira iteracao
+Loop = namedtuple("Loop", ["step", "period", "wake", "delay"], defaults=(None, None, 0.0))
+
+Node = namedtuple("Node", ["module", "ros_name", "params", "start"])
+
+
+def start_ticks2odom(module, transport):
+    node = module.Ticks2Odom(transport)
+    node.start()
+    if node.mode == "event":
+        return []
+    return [Loop(node.loop_step, 1.0 / node.rate)]
+
+
+def start_path_publisher(module, transport):
+    module.PathPublisher(transport)
+    return []
+
+
+def start_position_control(module, transport):
+    module.setup(transport)
+    if module.control_mode == "odom":
+        return []
+    return [Loop(module.position_control, 1.0 / module.LOOP_RATE)]
+
+
+def start_safe_twist(module, transport):
+    module.setup(transport)
+    # o loop espera um periodo (ou um comando) antes do primeiro ciclo
+    return [Loop(module.loop_step, module.LOOP_PERIOD, module.pipeline.wake, module.LOOP_PERIOD)]
+
+
+def start_joy(module, transport):
+    module.setup(transport)
+    return [Loop(module.loop_step, 1.0 / module.LOOP_RATE),
+            Loop(module.odom_reset_step, wake=module.odom_reset_request)]
+
+
+def start_led_manager(module, transport):
+    module.setup(transport)
+    return []
+
+
+NODES = {
+    "ticks2odom": Node("ticks2odom", "fred_odom", {}, start_ticks2odom),
+    "position_control": Node("position_control", "position_control_node", {}, start_position_control),
+    "safe_twist": Node("safe_twist", "safe_twist", {}, start_safe_twist),
+    "path_publisher": Node("path_publisher", "odometry_to_path_node", {}, start_path_publisher),
+    "joy_esp_interface": Node("joy_esp_interface", "esp_control", {}, start_joy),
+    "fred_led_manager": Node("fred_led_manager", "led_manager", {}, start_led_manager),
+}
+
+
+# ------ replay e medicao
+
+ReplayResult = namedtuple("ReplayResult", ["outputs", "messages", "timer_calls", "iterations", "samples"])
+
+
+def replay(node, events, end=None):
+    """Start a fresh copy of ``node`` (module reloaded) and deliver
+    ``events`` in time order, running before each one the timers and loop
+    iterations due by then, and after it the loops it woke. Returns a
+    ``ReplayResult``; ``samples`` has the seconds of every callback, timer
+    and loop iteration, without the cost of recording the outputs."""
+    start = events[0].t if events else 0.0
+    end = end if end is not None else (events[-1].t if events else start)
+    transport = ReplayTransport(node.ros_name, node.params, start)
+
+    # estado de modulo novo a cada replay (position_control, safe_twist, ... guardam estado em globais)
+    module = importlib.reload(importlib.import_module(node.module))
+    loops = node.start(module, transport)
+
+    samples = []
+    counts = {"messages": 0, "timer_calls": 0, "iterations": 0}
+    next_due = [start + loop.delay if loop.period is not None else math.inf for loop in loops]
+
+    def measure(function, *args):
+        overhead = transport.overhead
+        started = perf_counter()
+        function(*args)
+        samples.append(perf_counter() - started - (transport.overhead - overhead))
+
+    def run_loop(loop):
+        # o ciclo consome o wake pendente, como o Event.wait do loop
+        if loop.wake is not None:
+            loop.wake.clear()
+        measure(loop.step)
+        counts["iterations"] += 1
+
+    def wake_loops():
+        for loop in loops:
+            if loop.wake is not None and loop.wake.is_set():
+                run_loop(loop)
+
+    def advance(until):
+        while True:
+            due = transport.next_timer()
+            due = math.inf if due is None else due
+            index = None
+            for i, loop_due in enumerate(next_due):
+                if loop_due < due:
+                    due, index = loop_due, i
+            if due > until:
+                break
+
+            if index is None:
+                callback, timer_event = transport.fire_timer()
+                measure(callback, timer_event)
+                counts["timer_calls"] += 1
+            else:
+                transport.time = max(transport.time, due)
+                next_due[index] += loops[index].period
+                run_loop(loops[index])
+            wake_loops()
+        transport.time = max(transport.time, until)
+
+    for event in events:
+        callbacks = transport.subscribers.get(event.topic)
+        if not callbacks:
+            continue
+        advance(event.t)
+        counts["messages"] += 1
+        for callback in callbacks:
+            measure(callback, event.msg)
+        wake_loops()
+    advance(end)
+    transport.shutdown = True
+
+    return ReplayResult(transport.outputs, samples=samples, **counts)
+
+
+def allocations(node, events):
+    """Peak traced memory of a replay and the bytes/blocks still held by
+    code under scripts/ at the end (the recorded outputs are not counted)."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    replay(node, events)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    scripts_only = [tracemalloc.Filter(True, os.path.join(SCRIPTS_DIR, "*"))]
+    diff = after.filter_traces(scripts_only).compare_to(before.filter_traces(scripts_only), "filename")
+    held = sum(stat.size_diff for stat in diff)
+    blocks = sum(stat.count_diff for stat in diff)
+    return peak, held, blocks
+
+
+# ------ saida dourada
+
+def normalize_outputs(outputs):
+    # pela ida e volta em JSON: tuplas viram listas, como na dourada lida
+    return json.loads(json.dumps([list(output) for output in outputs]))
+
+
+def same(a, b):
+    if isinstance(a, float) or isinstance(b, float):
+        if not isinstance(a, (int, float)) or not isinstance(b, (int, float)):
+            return False
+        return math.isclose(a, b, rel_tol=FLOAT_TOLERANCE, abs_tol=FLOAT_TOLERANCE)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    return a == b
+
+
+def compare(outputs, golden):
+    """None if equivalent, else a description of the first difference."""
+    for i, (out, gold) in enumerate(zip(outputs, golden)):
+        if not same(out, gold):
+            return f"mensagem {i}: {out} != dourada {gold}"
+    if len(outputs) != len(golden):
+        return f"{len(outputs)} mensagens, dourada tem {len(golden)}"
+    return None
+
+
+def golden_path(node_name, scenario):
+    suffix = "" if scenario == "synthetic" else f".{scenario}"
+    return os.path.join(GOLDEN_DIR, f"{node_name}{suffix}.json")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bag", help="rosbag gravado no robo (precisa do pacote rosbag)")
+    parser.add_argument("--nodes", default=",".join(NODES), help="nos separados por virgula")
+    parser.add_argument("--repeat", type=int, default=5, help="replays por no; vale o mais rapido")
+    parser.add_argument("--no-alloc", action="store_true", help="pula a passada com tracemalloc")
+    parser.add_argument("--update-golden", action="store_true", help="grava a saida atual como dourada")
+    args = parser.parse_args()
+
+    if args.bag:
+        events = read_bag(args.bag)
+        scenario = os.path.splitext(os.path.basename(args.bag))[0]
+    else:
+        events = synthetic()
+        scenario = "synthetic"
+    print(f"cenario {scenario}: {len(events)} mensagens em {events[-1].t - events[0].t:.1f} s\n")
+
+    header = (f"{'no':18s} {'msgs':>6s} {'timer':>6s} {'loop':>6s} {'trab/msg':>10s} {'p50':>9s} "
+              f"{'p99':>9s} {'max':>9s} {'pico':>9s} {'retido':>9s}  saida")
+    print(header)
+    print("-" * len(header))
+
+    failed = False
+    for name in args.nodes.split(","):
+        node = NODES[name]
+
+        best = None
+        for _ in range(args.repeat):
+            result = replay(node, events)
+            if best is None or sum(result.samples) < sum(best.samples):
+                best = result
+
+        outputs = normalize_outputs(best.outputs)
+        path = golden_path(name, scenario)
+        if args.update_golden:
+            os.makedirs(GOLDEN_DIR, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump({"scenario": scenario, "outputs": outputs}, f, separators=(",", ":"))
+            verdict = f"dourada gravada ({len(outputs)})"
+        elif os.path.exists(path):
+            with open(path) as f:
+                difference = compare(outputs, json.load(f)["outputs"])
+            verdict = "igual" if difference is None else f"DIFERENTE: {difference}"
+            failed |= difference is not None
+        else:
+            verdict = "sem dourada (--update-golden)"
+
+        if args.no_alloc:
+            memory = f"{'-':>9s} {'-':>9s}"
+        else:
+            peak, held, blocks = allocations(node, events)
+            memory = f"{peak / 1024:7.1f}kB {held / 1024:7.1f}kB"
+
+        samples = np.array(best.samples) * 1e6
+        work = samples.sum() / best.messages if best.messages else 0.0
+        p50, p99 = np.percentile(samples, (50, 99)) if len(samples) else (0.0, 0.0)
+        worst = samples.max() if len(samples) else 0.0
+        print(f"{name:18s} {best.messages:6d} {best.timer_calls:6d} {best.iterations:6d} {work:8.2f}us "
+              f"{p50:7.2f}us {p99:7.2f}us {worst:7.2f}us {memory}  {verdict}")
+
+    print("\ntrab/msg: soma de callbacks, timers e loop / mensagens de entrada")
+    print("p50/p99/max: cada callback, timer ou iteracao do loop; pico/retido: tracemalloc")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+# Microbenchmark do passo de controle do position_control.
+#
+# Compara o passo original (round trips de quaternion com tf.transformations
+# e reduce_angle com while) com o PositionController.step atual, para a mesma
+# sequencia de poses de odometria.
+#
+#   python3 benchmarks/bench_position_control.py
+
+import math
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import numpy as np
+
+from control_law import PositionController, MIN_VEL, MAX_VEL, yaw_from_quaternion
+from pid import PIDController
+
+STEPS = 20000
+
+
+# --- passo original do position_control.py, sem ROS --------------------------
+# tf.transformations implementa estas funcoes em NumPy; estas copias seguem a
+# mesma implementacao para que a comparacao rode sem o tf instalado.
+
+def quaternion_from_euler(ai, aj, ak):
+    ai, aj, ak = ai / 2.0, aj / 2.0, ak / 2.0
+    ci, si = math.cos(ai), math.sin(ai)
+    cj, sj = math.cos(aj), math.sin(aj)
+    ck, sk = math.cos(ak), math.sin(ak)
+    cc, cs = ci*ck, ci*sk
+    sc, ss = si*ck, si*sk
+    quaternion = np.empty((4, ), dtype=np.float64)
+    quaternion[0] = cj*sc - sj*cs
+    quaternion[1] = cj*ss + sj*cc
+    quaternion[2] = cj*cs - sj*sc
+    quaternion[3] = cj*cc + sj*ss
+    return quaternion
+
+
+def quaternion_multiply(quaternion1, quaternion0):
+    x0, y0, z0, w0 = quaternion0
+    x1, y1, z1, w1 = quaternion1
+    return np.array((
+         x1*w0 + y1*z0 - z1*y0 + w1*x0,
+        -x1*z0 + y1*w0 + z1*x0 + w1*y0,
+         x1*y0 - y1*x0 + z1*w0 + w1*z0,
+        -x1*x0 - y1*y0 - z1*z0 + w1*w0), dtype=np.float64)
+
+
+def euler_from_quaternion(quaternion):
+    q = np.array(quaternion[:4], dtype=np.float64, copy=True)
+    nq = np.dot(q, q)
+    if nq < np.finfo(float).eps * 4.0:
+        matrix = np.identity(4)
+    else:
+        q *= math.sqrt(2.0 / nq)
+        q = np.outer(q, q)
+        matrix = np.array((
+            (1.0-q[1, 1]-q[2, 2],     q[0, 1]-q[2, 3],     q[0, 2]+q[1, 3], 0.0),
+            (    q[0, 1]+q[2, 3], 1.0-q[0, 0]-q[2, 2],     q[1, 2]-q[0, 3], 0.0),
+            (    q[0, 2]-q[1, 3],     q[1, 2]+q[0, 3], 1.0-q[0, 0]-q[1, 1], 0.0),
+            (                0.0,                 0.0,                 0.0, 1.0)), dtype=np.float64)
+    M = matrix
+    cy = math.sqrt(M[0, 0]*M[0, 0] + M[1, 0]*M[1, 0])
+    if cy > np.finfo(float).eps * 4.0:
+        ax = math.atan2(M[2, 1], M[2, 2])
+        ay = math.atan2(-M[2, 0], cy)
+        az = math.atan2(M[1, 0], M[0, 0])
+    else:
+        ax = math.atan2(-M[1, 2], M[1, 1])
+        ay = math.atan2(-M[2, 0], cy)
+        az = 0.0
+    return ax, ay, az
+
+
+def legacy_reduce_angle(angle):
+    while angle > math.pi:
+        angle -= 2*math.pi
+
+    while angle <= -math.pi:
+        angle += 2*math.pi
+
+    return angle
+
+
+class LegacyPositionControl:
+    def __init__(self):
+        self.motion_direction = 1
+        self.pid = PIDController(20, 1, 0, dt=0.02)
+
+    def backward_orientation(self, x, y, q):
+        q_rot = quaternion_from_euler(0, 0, math.pi)
+        bkward_quaternion = quaternion_multiply(q, q_rot)
+        return x, y, euler_from_quaternion(bkward_quaternion)[2]
+
+    def front_orientation(self, x, y, theta):
+        return x, y, theta
+
+    def odom_callback(self, x, y, q):
+        self.x, self.y, self.q = x, y, q
+        self.theta = euler_from_quaternion(q)[2]
+
+    def step(self, goal_x, goal_y):
+        if self.motion_direction == 1:
+            robot_pose = self.front_orientation(self.x, self.y, self.theta)
+        else:
+            robot_pose = self.backward_orientation(self.x, self.y, self.q)
+
+        error_angle = math.atan2(goal_y - robot_pose[1], goal_x - robot_pose[0])
+        backward_orientation_error = legacy_reduce_angle(
+            error_angle - self.backward_orientation(self.x, self.y, self.q)[2])
+        front_orientation_error = legacy_reduce_angle(
+            error_angle - self.front_orientation(self.x, self.y, self.theta)[2])
+
+        if abs(front_orientation_error) > abs(backward_orientation_error) and self.motion_direction == 1:
+            self.motion_direction = -1
+            robot_pose = self.backward_orientation(self.x, self.y, self.q)
+        elif abs(backward_orientation_error) > abs(front_orientation_error) and self.motion_direction == -1:
+            self.motion_direction = 1
+            robot_pose = self.front_orientation(self.x, self.y, self.theta)
+
+        error_angle = math.atan2(goal_y - robot_pose[1], goal_x - robot_pose[0])
+        orientation_error = legacy_reduce_angle(error_angle - robot_pose[2])
+
+        linear = ((1-abs(orientation_error)/math.pi)*(MAX_VEL - MIN_VEL) + MIN_VEL) * self.motion_direction
+        angular = self.pid.output(20, 1, 0, orientation_error)
+        return linear, angular
+
+
+# --- cenario ------------------------------------------------------------------
+
+class Quaternion:
+    __slots__ = ("x", "y", "z", "w")
+
+    def __init__(self, yaw):
+        self.x = 0.0
+        self.y = 0.0
+        self.z = math.sin(0.5 * yaw)
+        self.w = math.cos(0.5 * yaw)
+
+
+def make_poses(n, seed=0):
+    rng = random.Random(seed)
+    poses = []
+    for _ in range(n):
+        yaw = rng.uniform(-math.pi, math.pi)
+        poses.append((rng.uniform(-5, 5), rng.uniform(-5, 5), Quaternion(yaw)))
+    return poses
+
+
+def main():
+    poses = make_poses(STEPS)
+    goal_x, goal_y = 1.0, 2.0
+
+    legacy = LegacyPositionControl()
+
+    def run_legacy():
+        for x, y, q in poses:
+            legacy.odom_callback(x, y, (q.x, q.y, q.z, q.w))
+            legacy.step(goal_x, goal_y)
+
+    controller = PositionController(pid=PIDController(20, 1, 0, dt=0.02))
+
+    def run_current():
+        for x, y, q in poses:
+            theta = yaw_from_quaternion(q)     # odom_callback
+            controller.step(x, y, theta, goal_x, goal_y)
+
+    # mesma saida antes de medir
+    legacy_out = []
+    for x, y, q in poses[:1000]:
+        legacy.odom_callback(x, y, (q.x, q.y, q.z, q.w))
+        legacy_out.append(legacy.step(goal_x, goal_y))
+    current_out = [controller.step(x, y, yaw_from_quaternion(q), goal_x, goal_y) for x, y, q in poses[:1000]]
+    max_diff = max(abs(a - b) for la, ca in zip(legacy_out, current_out) for a, b in zip(la, ca))
+
+    legacy_time = min(timeit.repeat(run_legacy, number=1, repeat=5)) / STEPS
+    current_time = min(timeit.repeat(run_current, number=1, repeat=5)) / STEPS
+
+    print(f"max output difference: {max_diff:.2e}")
+    print(f"legacy  step: {legacy_time * 1e6:8.2f} us")
+    print(f"current step: {current_time * 1e6:8.2f} us")
+    print(f"speedup:      {legacy_time / current_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
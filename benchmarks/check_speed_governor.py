@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Verificacao do SpeedGovernor (tempo ate colisao) em casos montados a mao.
+#
+# Confere que o comando longe de obstaculos passa inteiro, que a aproximacao
+# dentro da distancia de seguranca é zerada, que a odometria so aperta o
+# limite de quem se aproxima, que o sensor de tras nao limita andar para
+# frente e que a fuga (re) de dentro da distancia de seguranca passa inteira
+# mesmo com o robo ainda derivando para o obstaculo.
+#
+#   python3 benchmarks/check_speed_governor.py
+
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from speed_governor import SpeedGovernor, MIN_DIST_CLEARANCE
+
+TOLERANCE = 1e-9
+FREE = 4.0                          # metros, nada perto
+INSIDE = 0.5 * MIN_DIST_CLEARANCE   # metros, dentro da distancia de seguranca
+
+
+def front(distance, back=FREE):
+    return {"left": distance, "right": distance, "back": back}
+
+
+# nome, leituras, comando (linear, angular), velocidade medida, saida esperada (None: so confere a escala)
+CASES = (
+    ("livre", front(FREE), (0.5, 0.3), (0.5, 0.3), (0.5, 0.3)),
+    ("aproximacao dentro da distancia", front(INSIDE), (0.3, 0.0), (0.3, 0.0), (0.0, 0.0)),
+    ("fuga de re derivando para frente", front(INSIDE), (-0.2, 0.0), (0.3, 0.0), (-0.2, 0.0)),
+    ("fuga de re parado", front(INSIDE), (-0.2, 0.1), (0.0, 0.0), (-0.2, 0.1)),
+    ("tras nao limita ir para frente", front(FREE, back=INSIDE), (0.4, 0.0), (0.4, 0.0), (0.4, 0.0)),
+    ("re com obstaculo atras", front(FREE, back=INSIDE), (-0.2, 0.0), (0.0, 0.0), (0.0, 0.0)),
+)
+
+
+def check_measured_tightens():
+    """The measured closing speed scales an approaching command further
+    down, never up."""
+    governor = SpeedGovernor()
+    distance = MIN_DIST_CLEARANCE + 0.3
+    allowed = governor.allowed_speed(distance)
+    linear, _ = governor.step(front(distance), 0.5 * allowed, 0.0, 2.0 * allowed, 0.0)
+    expected = 0.5 * allowed * 0.5
+    if not math.isclose(linear, expected, abs_tol=TOLERANCE):
+        return f"odometria mais rapida: linear {linear:.6f}, esperado {expected:.6f}"
+    linear, _ = governor.step(front(distance), 2.0 * allowed, 0.0, 0.0, 0.0)
+    if not math.isclose(linear, allowed, abs_tol=TOLERANCE):
+        return f"robo parado: linear {linear:.6f}, esperado {allowed:.6f}"
+    return None
+
+
+def main():
+    failures = 0
+    for name, ranges, (linear, angular), (measured_linear, measured_angular), expected in CASES:
+        output = SpeedGovernor().step(ranges, linear, angular, measured_linear, measured_angular)
+        if any(not math.isclose(a, b, abs_tol=TOLERANCE) for a, b in zip(output, expected)):
+            failures += 1
+            print(f"FAIL {name}: {output} != {expected}")
+
+    problem = check_measured_tightens()
+    if problem:
+        failures += 1
+        print(f"FAIL {problem}")
+
+    cases = len(CASES) + 1
+    print(f"{cases - failures}/{cases} governor cases as expected")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# Verificacao dos limites do RateLimiter do velocity_profiler.
+#
+# Roda rampas de subida, parada, reversao e degraus pequenos com varios
+# periodos de controle e confere, passo a passo, que |da|/dt nunca passa do
+# jerk maximo e |a| do limite de aceleracao, que a saida nao passa do alvo
+# partindo do repouso e que ela assenta exatamente no alvo com aceleracao
+# zero.
+#
+#   python3 benchmarks/check_velocity_profiler.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from velocity_profiler import (RateLimiter, MAX_LINEAR_ACCEL, MAX_LINEAR_JERK,
+                               MAX_ANGULAR_ACCEL, MAX_ANGULAR_JERK)
+
+PERIODS = (0.001, 0.005, 0.02, 0.05)
+TARGETS = (0.01, 0.05, 0.3, 1.0, 2.0, -0.7)
+HOLD_TIME = 6.0         # segundos em cada alvo da sequencia
+TOLERANCE = 1e-9        # folga relativa de ponto flutuante
+LIMITS = {"linear": (MAX_LINEAR_ACCEL, MAX_LINEAR_JERK),
+          "angular": (MAX_ANGULAR_ACCEL, MAX_ANGULAR_JERK)}
+
+
+def run(max_accel, max_jerk, dt, sequence):
+    """Step a fresh limiter through ``sequence`` of targets, holding each
+    for ``HOLD_TIME``; return the list of problems found."""
+    limiter = RateLimiter(max_accel, max_jerk)
+    problems = []
+    steps = int(round(HOLD_TIME / dt))
+    previous = 0.0
+    peak_jerk = 0.0
+
+    for target in sequence:
+        start = limiter.velocity
+        for _ in range(steps):
+            velocity = limiter.step(target, dt)
+            accel = limiter.acceleration
+            peak_jerk = max(peak_jerk, abs(accel - previous) / dt)
+            previous = accel
+
+            if abs(accel) > max_accel * (1 + TOLERANCE):
+                problems.append(f"|a| = {abs(accel):.4f} > {max_accel}")
+            # partindo do repouso o perfil nunca passa do alvo
+            if start == 0.0 and (velocity - target) * (target - start) > TOLERANCE:
+                problems.append(f"overshoot {velocity:.6f} past {target}")
+
+        if limiter.velocity != target or limiter.acceleration != 0.0:
+            problems.append(f"did not settle on {target}: v = {limiter.velocity}, a = {limiter.acceleration}")
+
+    if peak_jerk > max_jerk * (1 + TOLERANCE):
+        problems.append(f"peak jerk {peak_jerk:.4f} > {max_jerk}")
+    return problems
+
+
+def main():
+    failures = 0
+    for name, (max_accel, max_jerk) in LIMITS.items():
+        for dt in PERIODS:
+            for target in TARGETS:
+                # sobe, para, inverte e volta a um valor intermediario
+                sequence = (target, 0.0, -target, 0.3 * target)
+                problems = run(max_accel, max_jerk, dt, sequence)
+                if problems:
+                    failures += 1
+                    print(f"FAIL {name} dt={dt} target={target}: {problems[0]} ({len(problems)} problems)")
+
+    cases = len(LIMITS) * len(PERIODS) * len(TARGETS)
+    print(f"{cases - failures}/{cases} profiles within the acceleration and jerk limits")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
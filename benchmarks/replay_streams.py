@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+# Fluxos de entrada para o replay offline dos nos (bench_nodes.py).
+#
+# Um fluxo é uma lista de Event(t, topic, msg) em ordem de tempo, com as
+# mensagens ROS que os nos assinam nos topicos resolvidos (como no launch,
+# sem namespace). synthetic() gera um cenario deterministico que passa por
+# todos os casos dos nos (curva, glitch de encoder, obstaculo, sensor mudo,
+# fontes e lock do twist_mux, botoes, troca de estado); read_bag() le um
+# rosbag gravado no robo, quando o pacote rosbag esta instalado.
+
+import math
+import random
+from collections import namedtuple
+
+import rospy
+from geometry_msgs.msg import PoseStamped, Twist
+from nav_msgs.msg import Odometry, Path
+from sensor_msgs.msg import Imu
+from std_msgs.msg import Bool, Float32, Int16
+
+Event = namedtuple("Event", ["t", "topic", "msg"])
+
+START = 100.0           # tempo ROS do inicio do cenario sintetico (carimbo zero é "sem carimbo")
+DURATION = 20.0         # segundos do cenario sintetico
+WHEELTRACK = 0.38
+METERS_PER_TICK = 2 * math.pi * 0.075 / (2400 * 3)
+
+# topicos que algum no assina (read_bag so le estes)
+TOPICS = (
+    "/power/status/distance/ticks/left", "/power/status/distance/ticks/right",
+    "/sensor/orientation/imu", "/odom",
+    "/sensor/range/ultrasonic/left", "/sensor/range/ultrasonic/right", "/sensor/range/ultrasonic/back",
+    "/cmd_vel/navigation", "/cmd_vel/joy", "/cmd_vel", "/cmd_vel/lock",
+    "/joy/controler/ps4/cmd_vel/linear", "/joy/controler/ps4/cmd_vel/angular",
+    "/joy/controler/ps4/break", "/joy/controler/ps4/circle", "/joy/controler/ps4/triangle",
+    "/joy/controler/ps4/square", "/machine_state/control_mode/manual",
+    "/navigation/on", "/goal_manager/goal/current", "/goal_manager/path",
+    "/goal_manager/goal/reached", "/goal_manager/goal/reset", "/machine_state/main",
+    "/safety/abort/distance",
+)
+
+
+def _set_yaw(q, yaw):
+    q.z = math.sin(0.5 * yaw)
+    q.w = math.cos(0.5 * yaw)
+
+
+def _imu(yaw, rate):
+    msg = Imu()
+    _set_yaw(msg.orientation, yaw)
+    msg.angular_velocity.z = rate
+    return msg
+
+
+def _odom(t, x, y, yaw, vx, vth):
+    msg = Odometry()
+    msg.header.stamp = rospy.Time.from_sec(t)
+    msg.header.frame_id = "odom"
+    msg.child_frame_id = "base_footprint"
+    msg.pose.pose.position.x = x
+    msg.pose.pose.position.y = y
+    _set_yaw(msg.pose.pose.orientation, yaw)
+    msg.twist.twist.linear.x = vx
+    msg.twist.twist.angular.z = vth
+    return msg
+
+
+def _twist(linear, angular):
+    msg = Twist()
+    msg.linear.x = linear
+    msg.angular.z = angular
+    return msg
+
+
+def _goal(x, y, flag):
+    # flag do goal em orientation.z, como o goal_manager publica (GHOST: goal fantasma)
+    msg = PoseStamped()
+    msg.header.frame_id = "odom"
+    msg.pose.position.x = x
+    msg.pose.position.y = y
+    msg.pose.orientation.z = flag
+    return msg
+
+
+def _path(waypoints):
+    # so posicoes, orientacao zerada: como o path do goal_manager
+    msg = Path()
+    msg.header.frame_id = "odom"
+    for x, y in waypoints:
+        pose = PoseStamped()
+        pose.header.frame_id = "odom"
+        pose.pose.position.x = x
+        pose.pose.position.y = y
+        msg.poses.append(pose)
+    return msg
+
+
+def synthetic(duration=DURATION, seed=0, start=START):
+    """Deterministic scenario exercising every node."""
+    rng = random.Random(seed)
+    events = []
+
+    def add(t, topic, msg):
+        if t <= duration:
+            events.append(Event(round(start + t, 6), topic, msg))
+
+    # ------ movimento real: anda entre 1 e 15 s em curva suave
+    dt = 0.001
+    x = y = th = 0.0
+    left = right = 0.0
+    truth = []
+    for i in range(int(duration / dt) + 1):
+        t = i * dt
+        v = 0.5 if 1.0 <= t <= 15.0 else 0.0
+        w = 0.3 * math.sin(0.4 * t) if v else 0.0
+        x += v * math.cos(th) * dt
+        y += v * math.sin(th) * dt
+        th += w * dt
+        left += (v - 0.5 * WHEELTRACK * w) * dt / METERS_PER_TICK
+        right += (v + 0.5 * WHEELTRACK * w) * dt / METERS_PER_TICK
+        truth.append((t, x, y, th, v, w, left, right))
+
+    def at(t):
+        return truth[min(int(round(t / dt)), len(truth) - 1)]
+
+    # ------ encoders a 100 Hz (direita chega ~1 ms depois), com um glitch em 8 s
+    for k in range(int(duration * 100)):
+        t = k * 0.01
+        _, _, _, _, _, _, lt, rt = at(t)
+        glitch = 1e6 if abs(t - 8.0) < 1e-9 else 0.0
+        add(t, "/power/status/distance/ticks/left", Float32(float(round(lt)) + glitch))
+        add(t + 0.001 + rng.uniform(0.0, 0.002), "/power/status/distance/ticks/right", Float32(float(round(rt))))
+
+    # ------ IMU a 100 Hz, com ruido e um salto de orientacao em 11 s
+    for k in range(int(duration * 100)):
+        t = k * 0.01 + 0.004
+        _, _, _, th_t, _, w_t, _, _ = at(t)
+        yaw = th_t + rng.gauss(0.0, 0.01) + (2.5 if abs(t - 11.004) < 1e-9 else 0.0)
+        add(t, "/sensor/orientation/imu", _imu(math.remainder(yaw, 2 * math.pi), w_t + rng.gauss(0.0, 0.01)))
+
+    # ------ odometria (para quem assina /odom) a 50 Hz, parando entre 17 e 17.5 s
+    for k in range(int(duration * 50)):
+        t = k * 0.02 + 0.002
+        if 17.0 <= t < 17.5:
+            continue
+        _, x_t, y_t, th_t, v_t, w_t, _, _ = at(t)
+        add(t, "/odom", _odom(start + t, x_t, y_t, math.remainder(th_t, 2 * math.pi), v_t, w_t))
+
+    # ------ ultrassonicos a 20 Hz [cm]: obstaculo a frente entre 10 e 14 s, traseiro mudo em 16-17 s
+    for k in range(int(duration * 20)):
+        t = k * 0.05 + 0.01
+        front = 400.0
+        if 10.0 <= t <= 14.0:
+            front = 400.0 - 340.0 * min(1.0, (t - 10.0) / 3.0)
+        add(t, "/sensor/range/ultrasonic/left", Float32(front + rng.uniform(-2.0, 2.0)))
+        add(t + 0.002, "/sensor/range/ultrasonic/right", Float32(front + 10.0 + rng.uniform(-2.0, 2.0)))
+        if not 16.0 <= t <= 17.0:
+            add(t + 0.004, "/sensor/range/ultrasonic/back", Float32(300.0 + rng.uniform(-2.0, 2.0)))
+
+    # ------ fontes do twist_mux: navegacao a 50 Hz entre 1 e 18 s, teleop por cima em
+    # 4-5 s, /cmd_vel (prioridade menor) em 0.2-0.8 s e 18.2-19 s, lock entre 14.5 e 15 s
+    for k in range(int(duration * 50)):
+        t = k * 0.02 + 0.006
+        if 1.0 <= t <= 18.0:
+            add(t, "/cmd_vel/navigation", _twist(0.8, 0.5 * math.sin(t)))
+        if 4.0 <= t <= 5.0:
+            add(t + 0.001, "/cmd_vel/joy", _twist(-0.3, 1.0))
+        if 0.2 <= t <= 0.8 or 18.2 <= t <= 19.0:
+            add(t + 0.002, "/cmd_vel", _twist(0.2, -0.2))
+    add(14.5, "/cmd_vel/lock", Bool(True))
+    add(15.0, "/cmd_vel/lock", Bool(False))
+
+    # ------ joystick a 50 Hz: analogicos em senoide, botoes em instantes fixos
+    for k in range(int(duration * 50)):
+        t = k * 0.02 + 0.008
+        add(t, "/joy/controler/ps4/cmd_vel/linear", Int16(int(round(127 * math.sin(0.7 * t)))))
+        add(t, "/joy/controler/ps4/cmd_vel/angular", Int16(int(round(127 * math.cos(0.9 * t)))))
+
+    def press(topic, t, length=0.2):
+        add(t, topic, Int16(1))
+        add(t + length, topic, Int16(0))
+
+    press("/joy/controler/ps4/break", 2.0)          # libera o abort manual
+    press("/joy/controler/ps4/square", 5.0)
+    press("/joy/controler/ps4/square", 5.6)
+    press("/joy/controler/ps4/triangle", 7.0)
+    press("/joy/controler/ps4/circle", 9.0)
+    press("/joy/controler/ps4/break", 18.5)         # bloqueia de novo
+    add(3.0, "/machine_state/control_mode/manual", Bool(False))
+    add(4.0, "/machine_state/control_mode/manual", Bool(True))
+
+    # ------ maquina de estados, goals e caminho
+    add(0.5, "/navigation/on", Bool(True))
+    add(0.5, "/goal_manager/goal/current", _goal(3.0, 1.0, 0.0))
+    add(6.0, "/goal_manager/goal/reached", Bool(True))
+    add(6.5, "/goal_manager/goal/reached", Bool(False))
+    add(8.0, "/goal_manager/goal/current", _goal(5.2, 0.0, 1.0))     # goal fantasma: sem flash no LED
+    add(8.5, "/goal_manager/goal/reached", Bool(True))
+    add(9.0, "/goal_manager/goal/reached", Bool(False))
+    add(10.0, "/goal_manager/path", _path([(1.0 + 0.2 * i, 0.05 * i * i * 0.1) for i in range(30)]))
+    add(19.0, "/goal_manager/goal/reset", Bool(True))
+    for t, state in ((0.0, 0), (5.0, 50), (15.0, 2), (17.0, 0)):
+        add(t, "/machine_state/main", Int16(state))
+    add(11.0, "/safety/abort/distance", Bool(True))
+    add(13.0, "/safety/abort/distance", Bool(False))
+
+    events.sort(key=lambda e: e.t)
+    return events
+
+
+def read_bag(path):
+    """Events of a recorded bag, at the times they were recorded."""
+    import rosbag
+
+    with rosbag.Bag(path) as bag:
+        return [Event(stamp.to_sec(), topic, msg)
+                for topic, msg, stamp in bag.read_messages(topics=list(TOPICS))]
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+# Transporte do replay offline dos nos (bench_nodes.py).
+#
+# ReplayTransport tem a mesma interface do RosTransport (scripts/transport.py)
+# e roda o codigo dos proprios nos sem roscore: os subscribers recebem as
+# mensagens do fluxo gravado, os publishers, os broadcasters de TF e os
+# clientes de servico gravam o que o no manda, os timers disparam no relogio
+# do replay e o tempo ROS (get_time, now) é o tempo do fluxo. Os loops dos
+# nos nao rodam em threads: o replay chama o passo de cada loop (loop_step)
+# no periodo dele, entao a saida é deterministica. Precisa dos pacotes de
+# mensagens e do rospy instalados (so as classes, sem roscore).
+
+import heapq
+import itertools
+from collections import Counter
+from time import perf_counter
+
+import genpy
+import rospy
+from rospy.timer import TimerEvent
+
+UNRECORDED = {"/diagnostics"}   # fora da saida: os tempos medidos mudam a cada replay
+FLOAT_DIGITS = 9                # casas dos floats gravados
+
+
+def snapshot(value, origin=0.0):
+    """Plain copy of a message (JSON-ready) with only the fields that differ
+    from a default-constructed one; times relative to ``origin``. The nodes
+    reuse their messages, so the copy is taken at publish time."""
+    if isinstance(value, genpy.Message):
+        default = _default(type(value))
+        fields = {}
+        for name in value.__slots__:
+            field = getattr(value, name)
+            if isinstance(field, genpy.Time):
+                if not field.is_zero():
+                    fields[name] = round(field.to_sec() - origin, FLOAT_DIGITS)
+            elif isinstance(field, genpy.Duration):
+                if not field.is_zero():
+                    fields[name] = round(field.to_sec(), FLOAT_DIGITS)
+            elif isinstance(field, genpy.Message) or _is_sequence(field):
+                copy = snapshot(field, origin)
+                if copy:
+                    fields[name] = copy
+            elif field != getattr(default, name):
+                fields[name] = round(field, FLOAT_DIGITS) if isinstance(field, float) else field
+        return fields
+    if _is_sequence(value):
+        if len(value) and isinstance(value[0], genpy.Message):
+            return [snapshot(item, origin) for item in value]
+        # vetores numericos (covariancias): so os elementos nao nulos
+        return {str(i): round(float(item), FLOAT_DIGITS) for i, item in enumerate(value) if item != 0}
+    return value
+
+
+_DEFAULTS = {}
+
+
+def _default(cls):
+    default = _DEFAULTS.get(cls)
+    if default is None:
+        default = _DEFAULTS[cls] = cls()
+    return default
+
+
+def _is_sequence(value):
+    return hasattr(value, "__len__") and not isinstance(value, (str, bytes))
+
+
+class ReplayPublisher:
+    """Records every message with the replay time. Like
+    ``rospy.Publisher.publish``, takes a message or the arguments of the
+    message constructor."""
+
+    def __init__(self, transport, topic, msg_type):
+        self.transport = transport
+        self.topic = topic
+        self.msg_type = msg_type
+
+    def publish(self, *args, **kwargs):
+        if len(args) == 1 and not kwargs and isinstance(args[0], self.msg_type):
+            msg = args[0]
+        else:
+            msg = self.msg_type(*args, **kwargs)
+        self.transport.record(self.topic, msg)
+
+    def get_num_connections(self):
+        return 0
+
+
+class ReplayBroadcaster:
+    """``tf2_ros`` broadcaster recording on ``/tf`` or ``/tf_static``."""
+
+    def __init__(self, transport, topic):
+        self.transport = transport
+        self.topic = topic
+
+    def sendTransform(self, transform):
+        transforms = transform if isinstance(transform, list) else [transform]
+        for t in transforms:
+            self.transport.record(self.topic, t)
+
+
+class ReplayServiceProxy:
+    """Calls a service of the node under replay; calls to services of other
+    nodes, which are not running, are recorded as outputs and answered with
+    a default response."""
+
+    def __init__(self, transport, name, srv_type):
+        self.transport = transport
+        self.name = name
+        self.srv_type = srv_type
+
+    def wait_for_service(self, timeout=None):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        request_class = self.srv_type._request_class
+        if len(args) == 1 and not kwargs and isinstance(args[0], request_class):
+            request = args[0]
+        else:
+            request = request_class(*args, **kwargs)
+
+        handler = self.transport.services.get(self.name)
+        if handler is not None:
+            return handler(request)
+        self.transport.record(self.name, request)
+        return self.srv_type._response_class()
+
+
+class ReplayTimer:
+    def __init__(self, period, callback, oneshot):
+        self.period = period
+        self.callback = callback
+        self.oneshot = oneshot
+        self.cancelled = False
+
+    def shutdown(self):
+        self.cancelled = True
+
+
+class ReplayRate:
+    """The loops do not run under replay: the replay calls their step."""
+
+    def __init__(self, hz):
+        self.period = 1.0 / hz
+
+    def sleep(self):
+        raise RuntimeError("no replay o loop nao roda: chame o passo do loop (loop_step)")
+
+
+class ReplayTransport:
+    """Transport of one node under replay.
+
+    ``time`` is the replay clock, moved by the caller, which also runs the
+    timers in time order (``next_timer``, ``fire_timer``). Every message the
+    node publishes is kept in ``outputs`` as ``(t - origin, topic,
+    snapshot)``; ``overhead`` adds up the time spent recording, so the
+    caller can take it out of its measurements. Private parameters
+    ``~name`` come from ``params[name]``; anything else gets the default of
+    the node, the same one of the launch files.
+    """
+
+    def __init__(self, node_name, params=None, start=0.0):
+        self.node_name = node_name
+        self.params = dict(params or {})
+        self.time = start
+        self.origin = start
+        self.shutdown = False
+
+        self.subscribers = {}   # topico -> [callback]
+        self.services = {}      # servico -> handler
+        self.outputs = []       # (t - origin, topico, snapshot)
+        self.overhead = 0.0
+        self.logs = Counter()   # nivel -> mensagens de log
+
+        self.timers = []        # heap (prazo, seq, ReplayTimer)
+        self._seq = itertools.count()
+
+    def resolve(self, name):
+        if name.startswith("~"):
+            return f"/{self.node_name}/{name[1:]}"
+        return name if name.startswith("/") else "/" + name
+
+    def record(self, topic, msg):
+        if topic in UNRECORDED:
+            return
+        start = perf_counter()
+        self.outputs.append((round(self.time - self.origin, FLOAT_DIGITS), topic, snapshot(msg, self.origin)))
+        self.overhead += perf_counter() - start
+
+    # ------ interface do transporte
+
+    def Publisher(self, topic, msg_type, **kwargs):
+        return ReplayPublisher(self, self.resolve(topic), msg_type)
+
+    def Subscriber(self, topic, msg_type, callback, **kwargs):
+        self.subscribers.setdefault(self.resolve(topic), []).append(callback)
+
+    def get_param(self, name, default=None):
+        if name.startswith("~"):
+            return self.params.get(name[1:], default)
+        return default
+
+    def Service(self, name, srv_type, handler):
+        self.services[self.resolve(name)] = handler
+
+    def ServiceProxy(self, name, srv_type):
+        return ReplayServiceProxy(self, self.resolve(name), srv_type)
+
+    def Timer(self, period, callback, oneshot=False):
+        timer = ReplayTimer(period, callback, oneshot)
+        self._schedule(timer, self.time + period)
+        return timer
+
+    def TransformBroadcaster(self):
+        return ReplayBroadcaster(self, "/tf")
+
+    def StaticTransformBroadcaster(self):
+        return ReplayBroadcaster(self, "/tf_static")
+
+    def Rate(self, hz):
+        return ReplayRate(hz)
+
+    def get_time(self):
+        return self.time
+
+    def now(self):
+        return rospy.Time.from_sec(self.time)
+
+    def from_sec(self, seconds):
+        return rospy.Time.from_sec(seconds)
+
+    def is_shutdown(self):
+        return self.shutdown
+
+    def loginfo(self, msg, *args, **kwargs):
+        self.logs["info"] += 1
+
+    def logwarn(self, msg, *args, **kwargs):
+        self.logs["warn"] += 1
+
+    def logerr(self, msg, *args, **kwargs):
+        self.logs["error"] += 1
+
+    def loginfo_throttle(self, period, msg, *args, **kwargs):
+        self.logs["info"] += 1
+
+    def logwarn_throttle(self, period, msg, *args, **kwargs):
+        self.logs["warn"] += 1
+
+    def logwarn_once(self, msg, *args, **kwargs):
+        self.logs["warn"] += 1
+
+    # ------ timers
+
+    def _schedule(self, timer, due):
+        heapq.heappush(self.timers, (due, next(self._seq), timer))
+
+    def next_timer(self):
+        """Deadline of the next timer, or None."""
+        while self.timers and self.timers[0][2].cancelled:
+            heapq.heappop(self.timers)
+        return self.timers[0][0] if self.timers else None
+
+    def fire_timer(self):
+        """Move the clock to the next timer and return ``(callback,
+        TimerEvent)`` for the caller to run (and time)."""
+        due, _, timer = heapq.heappop(self.timers)
+        self.time = max(self.time, due)
+        if not timer.oneshot:
+            self._schedule(timer, due + timer.period)
+        expected = rospy.Time.from_sec(due)
+        return timer.callback, TimerEvent(None, None, expected, expected, None)
+
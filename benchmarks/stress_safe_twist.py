@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# Teste de estresse do estado compartilhado do safe_twist.
+#
+# Varias threads chamam os callbacks do SafetyPipeline (comandos de tres
+# fontes, locks, odometria, abort e sensores) enquanto o loop principal roda
+# em outra thread. Cada fonte publica comandos com angular = 2 * linear e o
+# perfil de velocidade roda sem limites, entao toda saida tem que manter
+# essa relacao; qualquer comando misturado de duas mensagens é detectado.
+# O loop tambem nao pode levantar excecao (deque alterado durante a leitura).
+#
+#   python3 benchmarks/stress_safe_twist.py [--seconds 5]
+
+import argparse
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from range_filter import RangeFilter
+from safety_pipeline import SafetyPipeline
+from speed_governor import SpeedGovernor, SENSOR_GEOMETRY
+from twist_mux import TwistMux
+from velocity_profiler import VelocityProfiler
+
+RATIO = 2.0     # angular / linear de todo comando publicado
+
+
+def consistent(linear, angular):
+    return angular == RATIO * linear
+
+
+def hammer(stop, target, *args):
+    rng = random.Random(threading.get_ident())
+    while not stop.is_set():
+        target(rng, *args)
+
+
+def publish_command(rng, pipeline, name):
+    linear = rng.uniform(-0.9, 0.9)
+    pipeline.on_command(name, linear, RATIO * linear, time.monotonic())
+
+
+def publish_lock(rng, pipeline):
+    pipeline.on_lock("pause", rng.random() < 0.1, time.monotonic())
+    time.sleep(0.001)
+
+
+def publish_odometry(rng, pipeline):
+    linear = rng.uniform(-1.0, 1.0)
+    pipeline.on_odometry(linear, RATIO * linear)
+
+
+def publish_abort(rng, pipeline):
+    pipeline.on_abort(rng.random() < 0.5)
+    time.sleep(0.001)
+
+
+def publish_range(rng, pipeline, name):
+    pipeline.on_range(name, rng.uniform(0.5, 5.0), time.monotonic())
+
+
+def stress_pipeline(seconds):
+    # sem limites de aceleracao: a saida é o comando do governador, sem rampa
+    profiler = VelocityProfiler(math.inf, 0.0, math.inf, 0.0, math.inf, math.inf)
+    pipeline = SafetyPipeline(
+        TwistMux(), SpeedGovernor(SENSOR_GEOMETRY), profiler,
+        {name: RangeFilter() for name in SENSOR_GEOMETRY})
+    # o robo comeca bloqueado; libera para que os comandos cheguem na saida
+    pipeline.on_abort(True)
+    pipeline.on_abort(False)
+
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=hammer, args=(stop, publish_command, pipeline, "joy")),
+        threading.Thread(target=hammer, args=(stop, publish_command, pipeline, "navigation")),
+        threading.Thread(target=hammer, args=(stop, publish_command, pipeline, "cmd_vel")),
+        threading.Thread(target=hammer, args=(stop, publish_lock, pipeline)),
+        threading.Thread(target=hammer, args=(stop, publish_odometry, pipeline)),
+        threading.Thread(target=hammer, args=(stop, publish_abort, pipeline)),
+    ] + [threading.Thread(target=hammer, args=(stop, publish_range, pipeline, name))
+         for name in SENSOR_GEOMETRY]
+
+    for thread in threads:
+        thread.start()
+
+    cycles = moving = inconsistent = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pipeline.wait(0.02)
+        try:
+            output = pipeline.step(time.monotonic())
+        except Exception as error:  # deque alterado durante a leitura, etc.
+            errors += 1
+            print(f"  erro no loop: {error!r}")
+            continue
+
+        cycles += 1
+        if output.linear != 0.0:
+            moving += 1
+        if not consistent(output.linear, output.angular) or (
+                output.target is not None and not consistent(*output.target)):
+            inconsistent += 1
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return cycles, moving, inconsistent, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    # trocas de thread frequentes aumentam a chance de intercalar as escritas
+    sys.setswitchinterval(1e-5)
+
+    cycles, moving, inconsistent, errors = stress_pipeline(args.seconds)
+    print(f"{cycles} ciclos ({moving} em movimento), "
+          f"{inconsistent} inconsistentes, {errors} erros")
+
+    if cycles == 0 or moving == 0 or inconsistent or errors:
+        print("FALHOU")
+        return 1
+
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
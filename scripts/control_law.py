@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# Lei de controle do position_control, sem dependencia do ROS.
+#
+# O no position_control.py e o simulador position_sim.py usam a mesma
+# implementacao, entao o que roda no robo e o que roda no CI sao iguais.
+
+import math
+
+from pid import PIDController
+
+# limites de velocidade
+MIN_VEL = 0.5     # velocidade para fazer curva
+MAX_VEL = 2
+
+# ṔID angular setup
+KP_ANGULAR = 20
+KI_ANGULAR = 1
+KD_ANGULAR = 0
+
+FRONT = 1       #  1  --> orientação frontal
+BACKWARD = -1   # -1  --> orientação traseira
+
+
+TWO_PI = 2*math.pi
+
+
+# reduz ângulo entre -pi e pi, em forma fechada (sem laço)
+def reduce_angle(angle):
+    return angle - TWO_PI*math.ceil((angle - math.pi)/TWO_PI)
+
+
+# yaw de um quaternion (x, y, z, w) sem passar por euler_from_quaternion
+def yaw_from_quaternion(q):
+    return math.atan2(2.0*(q.w*q.z + q.x*q.y), 1.0 - 2.0*(q.y*q.y + q.z*q.z))
+
+
+# Orientação do robô com x+ apontado para frente e y+ para esquerda
+def front_orientation(theta):
+    return theta
+
+
+# Orientação do robô com x+ apontado para trás e y+ para direita
+def backward_orientation(theta):
+    return reduce_angle(theta + math.pi)
+
+
+# mapea a velocidade linear em função do erro de orientação,
+# se o erro for máximo -> vel_linear mínima
+# sem o erro for mínimo -> vel_linear máxima
+def linear_speed(orientation_error, motion_direction, min_vel=MIN_VEL, max_vel=MAX_VEL):
+    return ((1 - abs(orientation_error)/math.pi)*(max_vel - min_vel) + min_vel) * motion_direction
+
+
+class PositionController:
+    """Goal-seeking control law of position_control, free of ROS.
+
+    ``step`` takes the robot pose and the goal and returns the
+    ``(linear, angular)`` command. The robot drives with whichever side,
+    front or back, points closer to the goal; ``motion_direction`` tells
+    which one is in use.
+    """
+
+    def __init__(self, kp=KP_ANGULAR, ki=KI_ANGULAR, kd=KD_ANGULAR,
+                 min_vel=MIN_VEL, max_vel=MAX_VEL, pid=None):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.min_vel = min_vel
+        self.max_vel = max_vel
+
+        self.angular_pid = pid if pid is not None else PIDController(kp, ki, kd)
+
+        # variavel de controle de direção e sentido
+        self.motion_direction = FRONT
+
+        # orientação traseira calculada uma vez por pose nova
+        self._theta = 0.0
+        self._backward_theta = backward_orientation(0.0)
+
+    def reset(self):
+        self.motion_direction = FRONT
+        self.angular_pid.reset()
+
+    def step(self, x, y, theta, goal_x, goal_y, dt=None):
+        if theta != self._theta:
+            self._theta = theta
+            self._backward_theta = backward_orientation(theta)
+
+        error_angle = math.atan2(goal_y - y, goal_x - x)
+
+        backward_orientation_error = reduce_angle(error_angle - self._backward_theta)
+        front_orientation_error = reduce_angle(error_angle - theta)
+
+        if (abs(front_orientation_error) > abs(backward_orientation_error)) and (self.motion_direction == FRONT):
+            self.motion_direction = BACKWARD
+
+        elif (abs(backward_orientation_error) > abs(front_orientation_error)) and (self.motion_direction == BACKWARD):
+            self.motion_direction = FRONT
+
+        if self.motion_direction == FRONT:
+            orientation_error = front_orientation_error
+        else:
+            orientation_error = backward_orientation_error
+
+        linear = linear_speed(orientation_error, self.motion_direction, self.min_vel, self.max_vel)
+
+        pid = self.angular_pid
+        pid.KP = self.kp
+        pid.KI = self.ki
+        pid.KD = self.kd
+        angular = pid.update(orientation_error, dt=dt)
+
+        return linear, angular
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+# Deteccao de borda de botoes e publicacao so na mudanca, sem ROS.
+#
+# Os nos recebem botoes e flags como niveis (Int16/Bool repetidos a cada
+# ciclo); EdgeDetector transforma o nivel em eventos de transicao e
+# OnChange so repassa um estado quando ele muda, para que os assinantes nao
+# acordem a cada ciclo para tratar o mesmo valor.
+
+RISING = 1
+FALLING = -1
+NO_EDGE = 0
+
+
+class EdgeDetector:
+    """Level-to-edge converter for a button or flag.
+
+    ``update(level)`` returns ``RISING``, ``FALLING`` or ``NO_EDGE`` and
+    calls ``on_rising``/``on_falling`` (if given) on the transitions.
+    Any truthy level (e.g. an ``Int16`` button at 1) counts as pressed.
+    """
+
+    __slots__ = ("state", "on_rising", "on_falling")
+
+    def __init__(self, on_rising=None, on_falling=None, initial=False):
+        self.state = bool(initial)
+        self.on_rising = on_rising
+        self.on_falling = on_falling
+
+    def update(self, level):
+        level = bool(level)
+        if level == self.state:
+            return NO_EDGE
+
+        self.state = level
+        if level:
+            if self.on_rising is not None:
+                self.on_rising()
+            return RISING
+
+        if self.on_falling is not None:
+            self.on_falling()
+        return FALLING
+
+
+class OnChange:
+    """Calls ``publish(value)`` only when ``value`` differs from the last
+    one published (the first value is always published)."""
+
+    __slots__ = ("publish", "value", "published")
+
+    def __init__(self, publish):
+        self.publish = publish
+        self.value = None
+        self.published = False
+
+    def update(self, value):
+        if self.published and value == self.value:
+            return False
+
+        self.value = value
+        self.published = True
+        self.publish(value)
+        return True
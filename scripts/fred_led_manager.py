@@ -1,153 +1,130 @@
 #!/usr/bin/env python3
 
+import threading
+import time
+
 import rospy
 from std_msgs.msg import Int16, Bool, Float32
-from enum import Enum, IntEnum
 from geometry_msgs.msg import PoseStamped,Pose2D
 
-GHOST = 1 
-LED = 0
-
-class Fred_color(IntEnum):
-    white = 0
-    blue = 100
-     
-    yellow = 5
-    pink = 4 
-    green = 3 
-    orange = 6 
-    red = 2 
-    black = -1 
-
+from edge_detector import EdgeDetector
+from fred_led_rules import (LED_RULES, GHOST, LED, LED_ON_TIME, ABORT_HOLD_TIME,
+                            DEFAULT_COLOR, INITIAL_STATE)
+from led_state_machine import LedStateMachine
+from node_diagnostics import DiagnosticsPublisher, DIAGNOSTICS_PERIOD
+from transport import ROS
 
-goals = [ [1, 0.00, LED], 
-          [5.20, 0.00, GHOST], 
+goals = [ [1, 0.00, LED],
+          [5.20, 0.00, GHOST],
           [7.0, 0.00, LED]]
 
-abort_distance = False
-abort_manual = 1
-main_state = -5
-goal_reached = False 
-last_goal_reached = False
-last_abort_status = False
+KEEPALIVE_PERIOD = 1.0      # segundos entre repeticoes da mesma cor para o controlador da fita
+UPDATE_BUDGET = 0.005       # segundos; uma atualizacao mais longa conta como iteracao longa
 
-led_on = False 
-
-LED_ON_TIME = rospy.Duration(1)
-start_timer = rospy.Time(0)
-led_goal_reached = False 
+# regras em fred_led_rules: a primeira que bate define a cor
+leds = LedStateMachine(LED_RULES, DEFAULT_COLOR, main_state=INITIAL_STATE)
+leds_lock = threading.Lock()
+led_color = None
+expiry_timer = None
+scheduled_expiry = None
 
 goal_pose = Pose2D()
 
-def setpoint_callback(msg): 
-    global goal_pose
+# ------ transporte e publishers (criados no setup)
+node_transport = None
+pub_fita_led = None
+pub_goal_reached_captured = None
+keepalive_timer = None
+
+# sem loop: mede cada atualizacao da fita (fila: eventos desde a ultima atualizacao)
+diagnostics = None
+timing = None
+
+def setpoint_callback(msg):
     goal_pose.x = msg.pose.position.x
-    goal_pose.y = msg.pose.position.y 
+    goal_pose.y = msg.pose.position.y
     goal_pose.theta = msg.pose.orientation.z
     # print(goal_pose)
 
-def call_abort_distance(msg):
-    global abort_distance 
-    abort_distance = msg.data 
-
-def call_abort_manual(msg):
-    global abort_manual
-    global last_abort_status
-    global abort_status
-
-    abort_status = msg.data
-
-    if abort_status > last_abort_status: 
-        abort_manual = not abort_manual
-
-    last_abort_status = abort_status
+def update_leds(event=None):
+    global led_color, expiry_timer, scheduled_expiry
 
-def call_main_state(msg):
-    global main_state
-    main_state = msg.data 
-
-def call_goal_reached_callback(msg):
-    global start_timer
-    global last_goal_reached
-    global led_goal_reached
-    global goal_reached
+    with leds_lock:
+        timing.wake(time.perf_counter())
+        now = node_transport.get_time()
+        color = leds.color(now)
 
-    goal_reached = msg.data 
+        # publica so quando a cor muda
+        if color != led_color:
+            led_color = color
+            pub_fita_led.publish(color)
+            # print(f"|{led_color}|  STATE {leds.main_state}")
 
-    if goal_reached > last_goal_reached: 
-        # rospy.loginfo("LED MANAGER: start ")
-        start_timer = rospy.Time.now()
-        led_goal_reached = True
-        pub_goal_reached_captured.publish(True)
-        
-        if goal_pose.theta == 1:
-            led_goal_reached = False
+        # acorda de novo quando o proximo estado transitorio expirar
+        expiry = leds.next_expiry(now)
+        if expiry is not None and expiry != scheduled_expiry:
+            scheduled_expiry = expiry
+            expiry_timer = node_transport.Timer(expiry - now + 1e-3, update_leds, oneshot=True)
 
-    last_goal_reached = goal_reached 
+        timing.done(time.perf_counter())
 
-    # print(rospy.Time.now() - start_timer)
+def keepalive_callback(event):
+    with leds_lock:
+        if led_color is not None:
+            pub_fita_led.publish(led_color)
 
-    if rospy.Time.now() - start_timer > LED_ON_TIME:
-
-        # rospy.loginfo("LED MANAGER: OFF")
-        led_goal_reached = False
+def call_abort_distance(msg):
+    with leds_lock:
+        timing.enqueue()
+        leds.set_level("abort_distance", msg.data, node_transport.get_time(), ABORT_HOLD_TIME)
+    update_leds()
 
-    #if goal_pose.theta == 1 :
-        #led_goal_reached = False 
+def call_main_state(msg):
+    with leds_lock:
+        timing.enqueue()
+        leds.set_state(msg.data)
+    update_leds()
 
+def on_goal_reached():
     # pub acknowledge -> next goal current
-    #pub_goal_reached_captured.publish(True)
+    pub_goal_reached_captured.publish(True)
 
-def main():
-        global goal_pose
-        print(goal_pose.theta)
+    with leds_lock:
+        # goal fantasma: sem flash
+        if goal_pose.theta == GHOST:
+            leds.clear("goal_reached")
+        else:
+            leds.trigger("goal_reached", node_transport.get_time(), LED_ON_TIME)
 
-        led_color = Fred_color.pink
+goal_reached_edge = EdgeDetector(on_rising=on_goal_reached)
 
-        if main_state == 50:
-            led_color = Fred_color.blue
-
-            if led_goal_reached:
-                led_color = Fred_color.green
-                  
+def call_goal_reached_callback(msg):
+    goal_reached_edge.update(msg.data)
+    update_leds()
 
+def setup(transport=ROS):
+    global node_transport, pub_fita_led, pub_goal_reached_captured, keepalive_timer, diagnostics, timing
 
-            if abort_distance:
-                led_color = Fred_color.orange
+    node_transport = transport
 
-           
-        if main_state == 0:
-            led_color = Fred_color.white
+    diagnostics = DiagnosticsPublisher(transport, transport.get_param("~diagnostics_period", DIAGNOSTICS_PERIOD))
+    timing = diagnostics.add_loop("update_leds", UPDATE_BUDGET, periodic=False)
 
-            if led_goal_reached:
-                 led_color = Fred_color.green
-            if abort_distance:
-                led_color = Fred_color.orange
+    pub_fita_led = transport.Publisher("/cmd/led_strip/color", Float32, queue_size=5)
+    pub_goal_reached_captured = transport.Publisher("/goal_manager/goal/reached/ack", Bool, queue_size=5)
 
-           
-       
-        if(main_state == 2):
-             led_color = Fred_color.red
+    transport.Subscriber("/goal_manager/goal/current", PoseStamped, setpoint_callback)
 
+    transport.Subscriber('/safety/abort/distance', Bool, call_abort_distance)
+    transport.Subscriber('/machine_state/main', Int16, call_main_state)
+    transport.Subscriber("/goal_manager/goal/reached", Bool, call_goal_reached_callback)
 
-        # print(f"|{led_color}|  ABORT: DISTANCE {abort_distance}, MANUAL {abort_manual}, STATE {main_state}, GOAL_REACHED {led_goal_reached}")
+    update_leds()
 
-        pub_fita_led.publish(led_color)
-        led_on = False 
+    # repeticao lenta: o controlador da fita recupera a cor se perder uma mensagem
+    keepalive_timer = transport.Timer(KEEPALIVE_PERIOD, keepalive_callback)
 
 if __name__ == '__main__':
     rospy.init_node('led_manager')
-    rate = rospy.Rate(50)
-    pub_fita_led = rospy.Publisher("/cmd/led_strip/color", Float32, queue_size=5)
-    pub_goal_reached_captured = rospy.Publisher("/goal_manager/goal/reached/ack", Bool, queue_size=5)
-
-    rospy.Subscriber("/goal_manager/goal/current", PoseStamped, setpoint_callback)
-
-    rospy.Subscriber('/safety/abort/distance', Bool, call_abort_distance)
-    rospy.Subscriber('/joy/controler/ps4/break', Int16, call_abort_manual)
-    rospy.Subscriber('/machine_state/main', Int16, call_main_state)
-    rospy.Subscriber("/goal_manager/goal/reached", Bool, call_goal_reached_callback)
-
-    while not rospy.is_shutdown():
-        main()
-        rate.sleep()
+    setup()
+    rospy.spin()
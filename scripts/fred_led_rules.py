@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+# Cores e tabela de regras da fita de LED do Fred, sem ROS.
+#
+# Usadas pelo fred_led_manager e pelo replay offline dos benchmarks.
+
+from enum import IntEnum
+
+from led_state_machine import LedRule
+
+GHOST = 1
+LED = 0
+
+class Fred_color(IntEnum):
+    white = 0
+    blue = 100
+
+    yellow = 5
+    pink = 4
+    green = 3
+    orange = 6
+    red = 2
+    black = -1
+
+
+LED_ON_TIME = 1.0           # segundos do flash verde de goal alcancado
+ABORT_HOLD_TIME = 0.5       # segundos que o laranja fica depois do abort por distancia sumir
+
+DEFAULT_COLOR = Fred_color.pink
+INITIAL_STATE = -5          # estado da maquina principal antes da primeira mensagem
+
+# em ordem de prioridade: a primeira regra que bate define a cor
+LED_RULES = (
+    LedRule({2}, None, Fred_color.red),
+    LedRule({0, 50}, "abort_distance", Fred_color.orange),
+    LedRule({0, 50}, "goal_reached", Fred_color.green),
+    LedRule({50}, None, Fred_color.blue),
+    LedRule({0}, None, Fred_color.white),
+)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# Todos os nos do fred_move_base em um unico processo.
+#
+# Roda ticks2odom, path_publisher, position_control, safe_twist,
+# joy_esp_interface e led_manager sobre um InProcessBus: as mensagens entre
+# eles sao entregues em memoria, sem serializacao nem TCPROS, e os topicos
+# continuam visiveis no ROS para quem assinar de fora. O reset da odometria
+# pelo joystick chama o servico do ticks2odom direto, no mesmo processo, e
+# os servicos seguem anunciados no ROS. Parametros de cada no
+# ficam em ~<nome do no>/ (ver launch/composite.launch).
+
+import threading
+
+import rospy
+
+import fred_led_manager
+import joy_esp_interface
+import position_control
+import safe_twist
+from path_publisher import PathPublisher
+from ticks2odom import Ticks2Odom
+from transport import InProcessBus
+
+# nome (namespace dos parametros) de cada no, como nos launch files
+NODES = ("fred_odom", "odometry_to_path_node", "position_control_node",
+         "safe_twist", "esp_control", "led_manager")
+
+
+def start_loop(name, target):
+    threading.Thread(target=target, name=name, daemon=True).start()
+
+
+if __name__ == '__main__':
+    rospy.init_node('fred_move_base')
+
+    nodes = rospy.get_param("~nodes", list(NODES))
+    bus = InProcessBus()
+    loops = []
+
+    if "fred_odom" in nodes:
+        ticks2odom = Ticks2Odom(bus.transport("fred_odom"))
+        ticks2odom.start()
+        if ticks2odom.mode != "event":
+            loops.append(("fred_odom", ticks2odom.loop))
+
+    if "odometry_to_path_node" in nodes:
+        PathPublisher(bus.transport("odometry_to_path_node"))
+
+    if "position_control_node" in nodes:
+        position_control.setup(bus.transport("position_control_node"))
+        if position_control.control_mode != "odom":
+            loops.append(("position_control_node", position_control.loop))
+
+    if "safe_twist" in nodes:
+        safe_twist.setup(bus.transport("safe_twist"))
+        loops.append(("safe_twist", safe_twist.loop))
+
+    if "esp_control" in nodes:
+        joy_esp_interface.setup(bus.transport("esp_control"))
+        loops.append(("esp_control", joy_esp_interface.loop))
+        loops.append(("esp_control/odom_reset", joy_esp_interface.odom_reset_worker))
+
+    if "led_manager" in nodes:
+        fred_led_manager.setup(bus.transport("led_manager"))
+
+    # so depois de todos os nos: topicos sem publisher local vem do ROS
+    bus.connect(external=rospy.get_param("~external_topics", []))
+
+    for name, target in loops:
+        start_loop(name, target)
+    rospy.loginfo(f"fred_move_base: {len(nodes)} nos em um processo, "
+                  f"{len(bus.publishers)} topicos em memoria")
+
+    rospy.spin()
@@ -1,24 +1,32 @@
 #!/usr/bin/env python3
 
+import threading
+from collections import deque
+
 import rospy
 from geometry_msgs.msg import Twist
-from std_msgs.msg import Float32, Int16, Bool
-
+from std_msgs.msg import Int16, Bool, String
+from std_srvs.srv import Trigger
 
-#TODO add joy drift if -10>x>10 ignore command
+from edge_detector import EdgeDetector
+from node_diagnostics import DiagnosticsPublisher, MonitoredRate, DIAGNOSTICS_PERIOD
+from teleop_shaping import TeleopShaper, SpeedMode, SPEED_MODES, DEADZONE, LINEAR_EXPO, ANGULAR_EXPO
+from transport import ROS
 
 cmd_vel_msg = Twist()
-vel_linear = 0
-vel_angular = 0
 manual_mode = True
 
-DRIFT_ANALOG_TOLERANCE = 20
+# deadzone continua + expo em tabela e modos de velocidade; criado no setup
+shaper = None
+keepalive = None
 
-reset_odom = False
-last_reset_odom = False
+KEEPALIVE_PERIOD = 0.2      # segundos entre repeticoes do mesmo comando em movimento (< timeout do twist_mux)
+LOOP_RATE = 50              # Hz
+ODOM_RESET_TIMEOUT = 1.0    # segundos esperando o servico /odom/reset do ticks2odom
 
-switch_mode = False
-last_switch_mode = False
+# tempo de cada ciclo do loop (fila: leituras dos analogicos por ciclo); criados no setup
+diagnostics = None
+loop_rate = None
 
 controler_buttons = {"square": None,
                      "circle": None,
@@ -30,99 +38,169 @@ controler_buttons = {"square": None,
                      "R_X":0}
 
 
-MAX_SPEED_ROBOT_LINEAR = 5
-MAX_SPEED_ROBOT_ANGULAR = 10
-MAX_VALUE_CONTROLER = 127
-
-
-# PUBS ---------------------------------
-cmd_vel_pub = rospy.Publisher('/cmd_vel', Twist, queue_size=10)
-
-def rising_edge(last,current):
-    return current > last 
+# PUBS (criados no setup) ---------------
+node_transport = None
+cmd_vel_pub = None
+sub_change_mode = None
+sub_goal_reset = None
+sub_goal_completed = None
+speed_mode_pub = None
+odom_reset_srv = None
+
+# o reset da odometria roda numa thread propria: o servico nao trava os callbacks do joystick
+odom_reset_request = threading.Event()
+
+# eventos: pulso de um ciclo, como no loop original -- True na borda de subida do
+# botao e False no ciclo seguinte (quem assina guarda o nivel), nunca False a cada ciclo
+pending_release = deque()
+
+def pulse(pub):
+    pub.publish(True)
+    pending_release.append(pub)
+
+# solta so os pulsos que ja estavam pendentes no ciclo anterior (True dura >= 1 ciclo)
+def release_pulses(due):
+    for _ in range(due):
+        pending_release.popleft().publish(False)
+    return len(pending_release)
+
+def on_reset_pressed():
+    sub_goal_completed.publish(False)
+    #names is wrong wont fix now sorry
+    pulse(sub_goal_reset)
+
+    # reset da odometria pelo servico do ticks2odom, fora do callback
+    odom_reset_request.set()
+
+def odom_reset_step():
+    try:
+        odom_reset_srv.wait_for_service(ODOM_RESET_TIMEOUT)
+        response = odom_reset_srv()
+        if not response.success:
+            node_transport.logwarn(f"JOY: reset da odometria recusado: {response.message}")
+    except (rospy.ServiceException, rospy.ROSException) as e:
+        node_transport.logwarn(f"JOY: falha ao resetar a odometria: {e}")
+
+def odom_reset_worker():
+    while not node_transport.is_shutdown():
+        if not odom_reset_request.wait(1.0):
+            continue
+        odom_reset_request.clear()
+        odom_reset_step()
+
+def on_switch_pressed():
+    pulse(sub_change_mode)
+
+def on_speed_pressed():
+    speed_mode_pub.publish(shaper.next_mode())
+    node_transport.loginfo(f"JOY: modo de velocidade {shaper.mode}")
+
+reset_button = EdgeDetector(on_rising=on_reset_pressed)     # circle
+switch_button = EdgeDetector(on_rising=on_switch_pressed)   # triangle
+speed_button = EdgeDetector(on_rising=on_speed_pressed)     # square
 
 def call_change_mode(msg):
-    global switch_mode 
-    switch_mode = msg.data
+    switch_button.update(msg.data)
 
 def call_reset_odom(msg):
-    global reset_odom  
-    reset_odom = msg.data
-   
+    reset_button.update(msg.data)
+
+def call_speed_mode(msg):
+    speed_button.update(msg.data)
+
 
 def call_manual(msg):
     global manual_mode
     manual_mode = msg.data
 
+# deadzone e curva aplicadas pelo shaper no loop
 def call_linear(msg):
-    global controler_buttons
-    if(abs(msg.data) > DRIFT_ANALOG_TOLERANCE):
-         controler_buttons["L_Y"] = msg.data
-    else:
-         controler_buttons["L_Y"] = 0
+    controler_buttons["L_Y"] = msg.data
+    loop_rate.stats.enqueue()
 
 def call_angular(msg):
-    global controler_buttons
-    if(abs(msg.data) > DRIFT_ANALOG_TOLERANCE):
-        controler_buttons["R_X"] = msg.data
-    else:
-        controler_buttons["R_X"] = 0
+    controler_buttons["R_X"] = msg.data
+    loop_rate.stats.enqueue()
 
 def call_break(msg):
-    global controler_buttons
     controler_buttons["x"] = msg.data
 
 
-if __name__ == '__main__':
-    rospy.init_node("joy_esp_interface_node")
+def setup(transport=ROS):
+    global node_transport, shaper, keepalive, cmd_vel_pub, sub_change_mode, sub_goal_reset, sub_goal_completed, speed_mode_pub, odom_reset_srv
+    global diagnostics, loop_rate
+
+    node_transport = transport
+    shaper = TeleopShaper(
+        deadzone=transport.get_param("~deadzone", DEADZONE),
+        linear_expo=transport.get_param("~linear_expo", LINEAR_EXPO),
+        angular_expo=transport.get_param("~angular_expo", ANGULAR_EXPO),
+        modes={name: SpeedMode(**mode) for name, mode in transport.get_param("~speed_modes", {}).items()} or SPEED_MODES,
+        mode=transport.get_param("~speed_mode", "normal"),
+    )
+    keepalive = transport.get_param("~keepalive", KEEPALIVE_PERIOD)
 
-    rospy.Subscriber("joy/controler/ps4/cmd_vel/linear", Int16, call_linear)
-    rospy.Subscriber("joy/controler/ps4/cmd_vel/angular",
-                     Int16, call_angular)
-    rospy.Subscriber('joy/controler/ps4/break', Int16, call_break)
+    diagnostics = DiagnosticsPublisher(transport, transport.get_param("~diagnostics_period", DIAGNOSTICS_PERIOD))
+    loop_rate = MonitoredRate(LOOP_RATE, diagnostics)
 
-    rospy.Subscriber("/machine_state/control_mode/manual", Bool,call_manual )
+    transport.Subscriber("joy/controler/ps4/cmd_vel/linear", Int16, call_linear)
+    transport.Subscriber("joy/controler/ps4/cmd_vel/angular",
+                         Int16, call_angular)
+    transport.Subscriber('joy/controler/ps4/break', Int16, call_break)
 
-    rospy.Subscriber("joy/controler/ps4/circle",Int16,call_reset_odom)
+    transport.Subscriber("/machine_state/control_mode/manual", Bool,call_manual )
 
-    rospy.Subscriber("/joy/controler/ps4/triangle",Int16,call_change_mode)
+    odom_reset_srv = transport.ServiceProxy("/odom/reset", Trigger)
+    cmd_vel_pub = transport.Publisher('/cmd_vel/joy', Twist, queue_size=10)
+    sub_change_mode = transport.Publisher("/machine_state/control_mode/switch",Bool,queue_size = 1)
+    sub_goal_reset = transport.Publisher("/goal_manager/goal/reset",Bool, queue_size=1)
+    sub_goal_completed = transport.Publisher("/goal_manager/goal/mission_completed",Bool, queue_size=1)
+    speed_mode_pub = transport.Publisher("joy/speed_mode", String, queue_size=1, latch=True)
+    speed_mode_pub.publish(shaper.mode)
 
-    sub_odom_reset = rospy.Publisher("odom/reset",Bool, queue_size = 1 )
-    sub_change_mode = rospy.Publisher("/machine_state/control_mode/switch",Bool,queue_size = 1)
-    sub_goal_reset = rospy.Publisher("/goal_manager/goal/reset",Bool, queue_size=1)
-    sub_goal_completed = rospy.Publisher("/goal_manager/goal/mission_completed",Bool, queue_size=1)
-    rate = rospy.Rate(50)
+    # botoes so depois dos publishers usados nos eventos
+    transport.Subscriber("joy/controler/ps4/circle",Int16,call_reset_odom)
 
-    while not rospy.is_shutdown():
-        #only send comands if manual mode on 
-        vel_angular = 0
-        vel_linear = 0
+    transport.Subscriber("/joy/controler/ps4/triangle",Int16,call_change_mode)
 
-        vel_angular = controler_buttons["R_X"]*(MAX_SPEED_ROBOT_ANGULAR/MAX_VALUE_CONTROLER) #regra de tres equivalendo a velocidade maxima do controle com a do robo 
-        vel_linear = controler_buttons["L_Y"]*(MAX_SPEED_ROBOT_LINEAR/MAX_VALUE_CONTROLER)
+    transport.Subscriber("joy/controler/ps4/square",Int16,call_speed_mode)
 
-        ## saturação controle 
+# estado do loop entre ciclos
+last_command = None
+last_publish_time = 0.0
+due_releases = 0
 
-        cmd_vel_msg.linear.x = vel_linear
-        cmd_vel_msg.angular.z = -1*vel_angular
+# um ciclo do loop: solta os pulsos e publica o comando dos analogicos
+def loop_step():
+    global last_command, last_publish_time, due_releases
 
-        if(manual_mode):
-            cmd_vel_pub.publish(cmd_vel_msg)
-        # print(f"Manual: {manual_mode}| Linear: {vel_linear}| Angular: {vel_angular}")
+    due_releases = release_pulses(due_releases)
 
-        #circle
-        odom_reset = rising_edge(last_reset_odom,reset_odom)
-        last_reset_odom = reset_odom
-        if(odom_reset):
-             sub_goal_completed.publish(False)
+    #only send comands if manual mode on 
+    if not manual_mode:
+        last_command = None
+        return
 
-        sub_odom_reset.publish(odom_reset)
-        #names is wrong wont fix now sorry
-        sub_goal_reset.publish(odom_reset)
+    # uma consulta de tabela por eixo, ja com a escala do modo de velocidade
+    command = shaper.command(controler_buttons["L_Y"], controler_buttons["R_X"])
+    now = node_transport.get_time()
 
-        #triangle
-        mode_change = rising_edge(last_switch_mode,switch_mode)
-        last_switch_mode = switch_mode
-        sub_change_mode.publish(mode_change)
+    # publica na mudanca; em movimento repete a cada keepalive para a fonte nao expirar
+    # no twist_mux. Parado, publica o zero uma vez e fica em silencio.
+    moving = command[0] != 0 or command[1] != 0
+    if command != last_command or (moving and now - last_publish_time >= keepalive):
+        cmd_vel_msg.linear.x, cmd_vel_msg.angular.z = command
+        cmd_vel_pub.publish(cmd_vel_msg)
+        last_command = command
+        last_publish_time = now
 
-        rate.sleep()
+def loop():
+    while not node_transport.is_shutdown():
+        loop_step()
+        loop_rate.sleep()
+
+if __name__ == '__main__':
+    rospy.init_node("joy_esp_interface_node")
+    setup()
+    threading.Thread(target=odom_reset_worker, name="odom_reset", daemon=True).start()
+    loop()
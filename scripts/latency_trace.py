@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+# Histogramas de latencia por estagio do caminho ticks -> /cmd_vel/safe, sem ROS.
+#
+# Cada estagio (ticks2odom, position_control, safe_twist) registra quanto
+# tempo levou para processar a mensagem e a idade dela: tempo desde o
+# instante de origem carimbado no header (chegada dos ticks, propagado pela
+# odometria e pelos TwistStamped) ou, sem carimbo, desde que a mensagem
+# chegou ao no. Os histogramas tem baldes fixos em escala log, entao
+# registrar é O(log n) e nao aloca nada.
+
+import bisect
+
+MIN_LATENCY = 1e-5      # segundos, limite superior do primeiro balde
+MAX_LATENCY = 10.0      # segundos, acima disso cai no ultimo balde
+BINS_PER_DECADE = 10
+
+PERCENTILES = (50, 90, 99)
+
+
+def log_edges(low=MIN_LATENCY, high=MAX_LATENCY, per_decade=BINS_PER_DECADE):
+    edges = []
+    edge = low
+    step = 10 ** (1.0 / per_decade)
+    while edge < high * (1 + 1e-9):
+        edges.append(edge)
+        edge *= step
+    return tuple(edges)
+
+
+EDGES = log_edges()
+
+
+class LatencyHistogram:
+    """Fixed log-spaced histogram of durations in seconds.
+
+    Percentiles are reported as the upper edge of the bucket that holds
+    them (within ~26 % with 10 buckets per decade), capped at ``max``,
+    which is exact.
+    """
+
+    __slots__ = ("edges", "counts", "count", "total", "max")
+
+    def __init__(self, edges=EDGES):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        if self.count == 0:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.edges[i], self.max) if i < len(self.edges) else self.max
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def reset(self):
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class StageTrace:
+    """Processing time and input age of one pipeline stage.
+
+    ``record(processing, age)`` is called once per message; ``age`` may be
+    None when the input carries no stamp. ``age_reference`` tells what the
+    age is measured from ("ticks" when the origin stamp is propagated).
+    ``budget`` (seconds, optional) flags the stage when the p99 age goes
+    above it.
+    """
+
+    def __init__(self, name, age_reference="ticks", budget=None):
+        self.name = name
+        self.age_reference = age_reference
+        self.budget = budget
+        self.processing = LatencyHistogram()
+        self.age = LatencyHistogram()
+
+    def record(self, processing, age=None):
+        self.processing.add(processing)
+        if age is not None:
+            # relogios de maquinas diferentes: idade negativa vira zero
+            self.age.add(max(age, 0.0))
+
+    def over_budget(self):
+        if self.budget is None:
+            return False
+        p99 = self.age.percentile(99)
+        return p99 is not None and p99 > self.budget
+
+    def summary(self):
+        """List of (key, value) strings, latencies in milliseconds."""
+        values = [("messages", str(self.processing.count)),
+                  ("age_reference", self.age_reference)]
+        for label, hist in (("processing", self.processing), ("age", self.age)):
+            for q in PERCENTILES:
+                values.append((f"{label}_p{q}_ms", _ms(hist.percentile(q))))
+            values.append((f"{label}_max_ms", _ms(hist.max if hist.count else None)))
+        if self.budget is not None:
+            values.append(("age_budget_ms", _ms(self.budget)))
+        return values
+
+    def reset(self):
+        self.processing.reset()
+        self.age.reset()
+
+
+def _ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1e3:.3f}"
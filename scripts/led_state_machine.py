@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# Maquina de estados da fita de LED por tabela, sem ROS.
+#
+# A cor sai da primeira regra da tabela (em ordem de prioridade) cujo
+# estado da maquina principal e flag batem. Flags transitorias (flash de
+# goal alcancado, aviso de abort) tem instante de expiracao proprio, entao
+# apagam no tempo certo mesmo sem nenhuma mensagem nova.
+
+import math
+from collections import namedtuple
+
+# states: estados da maquina principal em que a regra vale (None: todos)
+# flag: flag que precisa estar ativa (None: nenhuma)
+LedRule = namedtuple("LedRule", ["states", "flag", "color"])
+
+
+class LedStateMachine:
+    """Priority table of ``LedRule`` over the main state and a set of
+    flags with expiry times.
+
+    ``trigger(flag, now, duration)`` activates a transient flag for
+    ``duration`` seconds; ``set_level(flag, active, now, hold)`` follows a
+    level input and keeps the flag on for ``hold`` seconds after it drops.
+    ``color(now)`` evaluates the table; ``next_expiry(now)`` tells when the
+    color may change without any new input.
+    """
+
+    def __init__(self, rules, default_color, main_state=None):
+        self.rules = tuple(rules)
+        self.default_color = default_color
+        self.main_state = main_state
+        self.expiry = {}    # flag -> instante em que deixa de valer (inf enquanto mantida)
+
+    def set_state(self, main_state):
+        self.main_state = main_state
+
+    def trigger(self, flag, now, duration):
+        self.expiry[flag] = now + duration
+
+    def clear(self, flag):
+        self.expiry.pop(flag, None)
+
+    def set_level(self, flag, active, now, hold=0.0):
+        if active:
+            self.expiry[flag] = math.inf
+        elif self.expiry.get(flag) == math.inf:
+            self.expiry[flag] = now + hold
+
+    def is_active(self, flag, now):
+        return self.expiry.get(flag, -math.inf) > now
+
+    def color(self, now):
+        for rule in self.rules:
+            if rule.states is not None and self.main_state not in rule.states:
+                continue
+            if rule.flag is not None and not self.is_active(rule.flag, now):
+                continue
+            return rule.color
+        return self.default_color
+
+    def next_expiry(self, now):
+        """Earliest finite expiry after ``now``, or None."""
+        pending = [t for t in self.expiry.values() if now < t < math.inf]
+        return min(pending) if pending else None
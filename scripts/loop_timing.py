@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+# Medicao de tempo dos loops e callbacks dos nos, sem ROS.
+#
+# LoopStats registra, a cada iteracao, quanto tempo o no trabalhou, o atraso
+# do despertar em relacao ao prazo (jitter), prazos perdidos inteiros e
+# quantas mensagens chegaram para a iteracao consumir (profundidade da fila
+# entre callbacks e loop). StackSampler amostra as pilhas de todas as
+# threads do processo, para achar quem esta comendo a CPU sem instrumentar
+# nada.
+
+import sys
+import threading
+from collections import Counter
+
+from latency_trace import LatencyHistogram, PERCENTILES
+
+SAMPLE_INTERVAL = 0.005     # segundos entre amostras do StackSampler
+TOP_FUNCTIONS = 15
+
+
+class LoopStats:
+    """Timing of a loop (or a callback) with a ``period`` deadline.
+
+    ``wake(now, deadline=None)`` marks the start of an iteration and
+    ``done(now)`` its end. Periodic loops let the stats track the
+    deadlines (``periodic=True``, like ``rospy.Rate``); event driven loops
+    pass the deadline they were waiting for, or nothing. An iteration
+    longer than ``period`` is an overrun; a wake more than one period late
+    counts the whole periods missed. ``enqueue()`` is called by the
+    callbacks that feed the loop; the count is taken at the next wake.
+    """
+
+    def __init__(self, period, periodic=True):
+        self.period = period
+        self.periodic = periodic
+        self.busy = LatencyHistogram()
+        self.jitter = LatencyHistogram()
+        self.iterations = 0
+        self.overruns = 0
+        self.missed = 0
+        self.pending = 0
+        self.depth_max = 0
+        self.depth_total = 0
+
+        self.deadline = None
+        self.wake_time = None
+
+    def enqueue(self, n=1):
+        self.pending += n
+
+    def wake(self, now, deadline=None):
+        if deadline is None and self.periodic:
+            deadline = self.deadline
+
+        if deadline is not None:
+            late = now - deadline
+            self.jitter.add(abs(late))
+            if late > self.period:
+                self.missed += int(late // self.period)
+                # como o rospy.Rate: depois de um atraso grande reancora no agora
+                deadline = now
+            self.deadline = deadline + self.period
+        elif self.periodic:
+            self.deadline = now + self.period
+
+        depth = self.pending
+        self.pending = 0
+        self.depth_total += depth
+        if depth > self.depth_max:
+            self.depth_max = depth
+
+        self.wake_time = now
+
+    def done(self, now):
+        busy = now - self.wake_time
+        self.busy.add(busy)
+        self.iterations += 1
+        if busy > self.period:
+            self.overruns += 1
+
+    def summary(self):
+        """List of (key, value) strings, times in milliseconds."""
+        values = [("iterations", str(self.iterations)),
+                  ("period_ms", f"{self.period * 1e3:.3f}"),
+                  ("overruns", str(self.overruns)),
+                  ("missed_deadlines", str(self.missed))]
+        for label, hist in (("busy", self.busy), ("jitter", self.jitter)):
+            for q in PERCENTILES:
+                p = hist.percentile(q)
+                values.append((f"{label}_p{q}_ms", "-" if p is None else f"{p * 1e3:.3f}"))
+            values.append((f"{label}_max_ms", f"{hist.max * 1e3:.3f}"))
+        mean_depth = self.depth_total / self.iterations if self.iterations else 0.0
+        values.append(("queue_depth_mean", f"{mean_depth:.2f}"))
+        values.append(("queue_depth_max", str(self.depth_max)))
+        return values
+
+
+class StackSampler:
+    """Sampling profiler over every thread of the process.
+
+    A background thread reads ``sys._current_frames()`` every
+    ``interval`` seconds and counts, per function, the samples where it
+    is running (``own``) and where it is anywhere on the stack
+    (``cumulative``). Cheap enough to leave on while the robot drives.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.own = Counter()
+        self.cumulative = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack_sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                self.samples += 1
+                self.own[_function(frame)] += 1
+
+                seen = set()
+                while frame is not None:
+                    key = _function(frame)
+                    if key not in seen:
+                        seen.add(key)
+                        self.cumulative[key] += 1
+                    frame = frame.f_back
+
+    def report(self, top=TOP_FUNCTIONS):
+        lines = [f"{self.samples} amostras a cada {self.interval * 1e3:.1f} ms"]
+        for title, counter in (("proprio", self.own), ("cumulativo", self.cumulative)):
+            lines.append(f"-- {title}")
+            for (filename, line, name), n in counter.most_common(top):
+                share = 100.0 * n / self.samples if self.samples else 0.0
+                lines.append(f"{share:6.1f}%  {name} ({filename}:{line})")
+        return "\n".join(lines)
+
+
+def _function(frame):
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+# Publicacao de diagnosticos dos nos em /diagnostics (diagnostic_msgs).
+#
+# Cada no registra provedores de status (funcoes que devolvem nivel,
+# mensagem e pares chave/valor) e um timer lento publica todos juntos em um
+# DiagnosticArray, para o rqt_robot_monitor ou o diagnostic_aggregator. Nada
+# é montado fora do timer, entao o custo no caminho de controle é so o de
+# registrar as amostras.
+#
+# O servico ~profile (std_srvs/SetBool) liga e desliga um profiler em tempo
+# de execucao: amostragem das pilhas de todas as threads ou cProfile da
+# thread do loop. O relatorio vai para ~profile_dir e para o log.
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from std_srvs.srv import SetBool, SetBoolResponse
+
+from loop_timing import LoopStats, StackSampler, TOP_FUNCTIONS
+from transport import ROS
+
+DIAGNOSTICS_PERIOD = 1.0    # segundos entre publicacoes
+PROFILE_DIR = "/tmp"
+PROFILE_TOGGLE_TIMEOUT = 2.0    # segundos esperando a thread do loop ligar/desligar o cProfile
+
+OK = DiagnosticStatus.OK
+WARN = DiagnosticStatus.WARN
+ERROR = DiagnosticStatus.ERROR
+
+
+class DiagnosticsPublisher:
+    """Low-rate ``/diagnostics`` publisher for one node.
+
+    ``add(name, provider)`` registers a callable returning
+    ``(level, message, [(key, value), ...])``; ``add_trace`` registers a
+    ``latency_trace.StageTrace``. Status names are prefixed with the node
+    name, so the nodes of the composite process stay apart.
+    """
+
+    def __init__(self, transport=ROS, period=DIAGNOSTICS_PERIOD):
+        self.transport = transport
+        self.prefix = transport.node_name
+        self.providers = []
+        self.pub = transport.Publisher("/diagnostics", DiagnosticArray, queue_size=5)
+        self.profiler = Profiler(transport, self.prefix,
+                                 transport.get_param("~profile_mode", "sampling"),
+                                 transport.get_param("~profile_dir", PROFILE_DIR))
+        self.timer = transport.Timer(period, self.publish_callback)
+
+    def add(self, name, provider):
+        self.providers.append((f"{self.prefix}: {name}", provider))
+
+    def add_trace(self, trace):
+        def provider():
+            if trace.over_budget():
+                return WARN, "latencia acima do orcamento", trace.summary()
+            return OK, "", trace.summary()
+        self.add(f"latency {trace.name}", provider)
+
+    def add_loop(self, name, period, periodic=True):
+        """Register and return a ``LoopStats``; the status turns WARN when
+        deadlines were missed or iterations overran since the last report."""
+        stats = LoopStats(period, periodic)
+        last = [0, 0]
+
+        def provider():
+            missed = stats.missed - last[0]
+            overruns = stats.overruns - last[1]
+            last[:] = [stats.missed, stats.overruns]
+            if missed or overruns:
+                return WARN, f"{missed} prazos perdidos, {overruns} iteracoes longas", stats.summary()
+            return OK, "", stats.summary()
+
+        self.add(f"timing {name}", provider)
+        return stats
+
+    def publish_callback(self, event):
+        array = DiagnosticArray()
+        array.header.stamp = self.transport.now()
+
+        for name, provider in self.providers:
+            level, message, values = provider()
+            array.status.append(DiagnosticStatus(
+                level=level, name=name, message=message, hardware_id="fred",
+                values=[KeyValue(key, value) for key, value in values]))
+
+        self.pub.publish(array)
+
+
+class MonitoredRate:
+    """``Rate`` of the transport (``rospy.Rate``) that also times every
+    iteration of the loop.
+
+    The time between two ``sleep`` calls is the work of one iteration;
+    the wake up after each sleep is checked against the deadline. The
+    stats are reported by ``diagnostics`` and the loop thread is where the
+    cProfile of the ``~profile`` service runs.
+    """
+
+    def __init__(self, hz, diagnostics, name="loop"):
+        self.rate = diagnostics.transport.Rate(hz)
+        self.stats = diagnostics.add_loop(name, 1.0 / hz)
+        self.profiler = diagnostics.profiler
+
+    def sleep(self):
+        # a primeira iteracao (desde a criacao) nao é medida
+        if self.stats.wake_time is not None:
+            self.stats.done(time.perf_counter())
+        self.rate.sleep()
+        self.stats.wake(time.perf_counter())
+        self.profiler.poll()
+
+
+class Profiler:
+    """Runtime profiling hook behind the ``~profile`` service.
+
+    ``mode`` "sampling" runs a ``StackSampler`` over every thread;
+    "cprofile" profiles the loop thread, which switches the profiler on
+    and off itself in ``poll`` (cProfile only sees the thread that enabled
+    it). Nodes without a loop thread always sample.
+    """
+
+    def __init__(self, transport, name, mode, directory):
+        self.transport = transport
+        self.name = name
+        self.mode = mode
+        self.directory = directory
+
+        self.wanted = False
+        self.has_loop = False
+        self.profile = None         # cProfile ativo na thread do loop
+        self.finished = None        # cProfile desligado, esperando o relatorio
+        self.toggled = threading.Event()
+        self.sampler = None
+
+        transport.Service("~profile", SetBool, self.profile_service)
+
+    # chamado pela thread do loop a cada iteracao
+    def poll(self):
+        self.has_loop = True
+        if self.wanted and self.profile is None and self.mode == "cprofile":
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            self.toggled.set()
+        elif not self.wanted and self.profile is not None:
+            self.profile.disable()
+            self.finished = self.profile
+            self.profile = None
+            self.toggled.set()
+
+    def profile_service(self, req):
+        if req.data == self.wanted:
+            return SetBoolResponse(success=True, message="profiler ja " + ("ligado" if req.data else "desligado"))
+
+        use_cprofile = self.mode == "cprofile" and self.has_loop and (req.data or self.sampler is None)
+        self.toggled.clear()
+        self.wanted = req.data
+
+        if use_cprofile:
+            if not self.toggled.wait(PROFILE_TOGGLE_TIMEOUT):
+                self.wanted = not req.data
+                return SetBoolResponse(success=False, message="a thread do loop nao respondeu")
+            if req.data:
+                return SetBoolResponse(success=True, message="cProfile ligado na thread do loop")
+            return SetBoolResponse(success=True, message=self.write_cprofile(self.finished))
+
+        if req.data:
+            self.sampler = StackSampler()
+            self.sampler.start()
+            return SetBoolResponse(success=True, message="amostragem ligada")
+
+        self.sampler.stop()
+        report = self.sampler.report()
+        self.sampler = None
+        return SetBoolResponse(success=True, message=self.write_report(report, "txt"))
+
+    def write_cprofile(self, profile):
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        path = self.write_report(out.getvalue(), "txt")
+        profile.dump_stats(path[:-len("txt")] + "prof")
+        return path
+
+    def write_report(self, report, extension):
+        path = os.path.join(self.directory, f"{self.name.replace('/', '_')}_{time.strftime('%Y%m%d_%H%M%S')}.{extension}")
+        with open(path, "w") as f:
+            f.write(report)
+        self.transport.loginfo(f"profile de {self.name} em {path}\n{report}")
+        return path
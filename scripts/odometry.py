@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+# Odometria de robo diferencial sem dependencia do ROS.
+#
+# Usada pelo no ticks2odom.py (um passo por vez) e por ferramentas offline
+# que reprocessam logs inteiros de ticks em uma unica chamada vetorizada.
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+# Parameters
+WHEELTRACK = 0.3800     # distance between whells
+WHEELRADIUS = 0.075     # radius of the wheel in meters
+TPR = 2400*3            # ticks per turn
+
+# abaixo disso sin(u)/u usa a serie de Taylor para evitar 0/0
+SMALL_ANGLE = 1e-4
+
+# leitura dos contadores de ticks
+FLOAT32_EXACT = 2**24   # acima disso um Float32 nao representa todo inteiro
+GLITCH_MARGIN = 100     # ticks de folga sobre o delta maximo pela velocidade
+MAX_GLITCHES = 5        # deltas impossiveis seguidos antes de re-basear o contador
+
+Trajectory = namedtuple("Trajectory", ["t", "x", "y", "th", "vx", "vth"])
+
+
+def sinc(u):
+    """sin(u)/u, stable for u close to zero."""
+    if abs(u) < SMALL_ANGLE:
+        return 1.0 - u * u / 6.0
+    return math.sin(u) / u
+
+
+def arc_step(x, y, th, dc, dth):
+    """Exact circular-arc pose update for a traveled distance ``dc`` and a
+    heading change ``dth``.
+
+    Equivalent to rotating the pose around the instantaneous center of
+    curvature, but without dividing by ``dth``, so straight motion is not a
+    special case.
+    """
+    k = dc * sinc(0.5 * dth)
+    th_mid = th + 0.5 * dth
+    return x + k * math.cos(th_mid), y + k * math.sin(th_mid), th + dth
+
+
+class DiffDriveOdometry:
+    def __init__(self, wheeltrack=WHEELTRACK, wheelradius=WHEELRADIUS, tpr=TPR):
+        self.wheeltrack = wheeltrack
+        self.wheelradius = wheelradius
+        self.tpr = tpr
+        self.meters_per_tick = 2 * math.pi * wheelradius / tpr
+
+        self.x = 0.0
+        self.y = 0.0
+        self.th = 0.0
+
+        # velocidades no frame do robo
+        self.vx = 0.0
+        self.vth = 0.0
+
+    def reset(self, x=0.0, y=0.0, th=0.0):
+        self.x = x
+        self.y = y
+        self.th = th
+        self.vx = 0.0
+        self.vth = 0.0
+
+    def step(self, delta_left, delta_right, dt=0.0):
+        """Integrate one pair of tick deltas and return ``(dx, dy, dth)``.
+
+        Velocities are only updated when ``dt`` is positive.
+        """
+        dl = self.meters_per_tick * delta_left
+        dr = self.meters_per_tick * delta_right
+        dc = (dl + dr) / 2
+        dth = (dr - dl) / self.wheeltrack
+
+        x, y, th = arc_step(self.x, self.y, self.th, dc, dth)
+        dx = x - self.x
+        dy = y - self.y
+
+        self.x = x
+        self.y = y
+        self.th = th
+
+        if dt > 0:
+            self.vx = dc / dt
+            self.vth = dth / dt
+
+        return dx, dy, dth
+
+    def integrate(self, delta_left, delta_right, stamps):
+        """Integrate whole arrays of tick deltas in a single vectorized call.
+
+        ``delta_left``/``delta_right`` hold the ticks counted between
+        ``stamps[i-1]`` and ``stamps[i]`` (the first sample is integrated
+        with ``dt = 0``). Starts from the current pose, leaves the
+        odometry at the last integrated pose and returns a ``Trajectory``
+        with one row per sample.
+        """
+        delta_left = np.asarray(delta_left, dtype=np.float64)
+        delta_right = np.asarray(delta_right, dtype=np.float64)
+        stamps = np.asarray(stamps, dtype=np.float64)
+
+        dl = self.meters_per_tick * delta_left
+        dr = self.meters_per_tick * delta_right
+        dc = 0.5 * (dl + dr)
+        dth = (dr - dl) / self.wheeltrack
+
+        th = self.th + np.cumsum(dth)
+        th_mid = th - 0.5 * dth
+
+        # np.sinc(u) = sin(pi*u)/(pi*u), estavel em u = 0
+        k = dc * np.sinc(0.5 * dth / np.pi)
+        x = self.x + np.cumsum(k * np.cos(th_mid))
+        y = self.y + np.cumsum(k * np.sin(th_mid))
+
+        dt = np.diff(stamps, prepend=stamps[:1]) if stamps.size else stamps
+        valid = dt > 0
+        safe_dt = np.where(valid, dt, 1.0)
+        vx = np.where(valid, dc / safe_dt, np.nan)
+        vth = np.where(valid, dth / safe_dt, np.nan)
+
+        # mantem a ultima velocidade valida onde dt <= 0, como no passo unitario
+        if vx.size:
+            if np.isnan(vx[0]):
+                vx[0] = self.vx
+                vth[0] = self.vth
+            idx = np.where(valid, np.arange(vx.size), 0)
+            np.maximum.accumulate(idx, out=idx)
+            vx = vx[idx]
+            vth = vth[idx]
+
+            self.x = float(x[-1])
+            self.y = float(y[-1])
+            self.th = float(th[-1])
+            self.vx = float(vx[-1])
+            self.vth = float(vth[-1])
+
+        return Trajectory(stamps, x, y, th, vx, vth)
+
+
+def integrate_ticks(left_ticks, right_ticks, stamps, wheeltrack=WHEELTRACK,
+                    wheelradius=WHEELRADIUS, tpr=TPR):
+    """Replay absolute (cumulative) tick counts, e.g. from a log, starting at
+    the origin. Returns a ``Trajectory``."""
+    left_ticks = np.asarray(left_ticks, dtype=np.float64)
+    right_ticks = np.asarray(right_ticks, dtype=np.float64)
+
+    odometry = DiffDriveOdometry(wheeltrack, wheelradius, tpr)
+    return odometry.integrate(
+        np.diff(left_ticks, prepend=left_ticks[:1]),
+        np.diff(right_ticks, prepend=right_ticks[:1]),
+        stamps,
+    )
+
+
+class TickPairer:
+    """Pairs left/right encoder updates by arrival time.
+
+    Every update is stored as pending for its side. When the other side
+    has a pending update no older than ``slop`` seconds, ``callback(left,
+    right, stamp)`` is called immediately with the pair and the newest of
+    the two arrival times. A side whose partner does not show up within
+    ``slop`` is emitted alone, with the other wheel's last known count,
+    either when its own next update arrives or through ``flush``.
+    """
+
+    def __init__(self, callback, slop=0.005):
+        self.callback = callback
+        self.slop = slop
+
+        self.left_ticks = 0.0
+        self.right_ticks = 0.0
+        self.left_stamp = None      # chegada do update pendente, None se nao ha
+        self.right_stamp = None
+
+    def left(self, ticks, stamp):
+        if self.left_stamp is not None:
+            self._emit_left()
+        if self.right_stamp is not None and stamp - self.right_stamp > self.slop:
+            self._emit_right()
+
+        self.left_ticks = ticks
+        self.left_stamp = stamp
+        if self.right_stamp is not None:
+            self._emit_pair()
+
+    def right(self, ticks, stamp):
+        if self.right_stamp is not None:
+            self._emit_right()
+        if self.left_stamp is not None and stamp - self.left_stamp > self.slop:
+            self._emit_left()
+
+        self.right_ticks = ticks
+        self.right_stamp = stamp
+        if self.left_stamp is not None:
+            self._emit_pair()
+
+    def flush(self, now):
+        """Emit pending updates whose partner is overdue."""
+        if self.left_stamp is not None and now - self.left_stamp > self.slop:
+            self._emit_left()
+        if self.right_stamp is not None and now - self.right_stamp > self.slop:
+            self._emit_right()
+
+    def _emit_pair(self):
+        stamp = max(self.left_stamp, self.right_stamp)
+        self.left_stamp = None
+        self.right_stamp = None
+        self.callback(self.left_ticks, self.right_ticks, stamp)
+
+    def _emit_left(self):
+        stamp = self.left_stamp
+        self.left_stamp = None
+        self.callback(self.left_ticks, self.right_ticks, stamp)
+
+    def _emit_right(self):
+        stamp = self.right_stamp
+        self.right_stamp = None
+        self.callback(self.left_ticks, self.right_ticks, stamp)
+
+
+class TickCounter:
+    """Turns the raw encoder counter published by the firmware into a
+    continuous tick total.
+
+    Rollover of a ``bits``-wide counter is unwrapped (``bits=None``: the
+    counter never wraps). A delta larger than ``max_rate * dt + margin``
+    is implausible: if the raw value itself is plausible for a counter
+    restarting from zero it is a firmware reset and counting continues
+    from it, otherwise the sample is dropped as a glitch, and after
+    ``max_glitches`` in a row the counter is re-based at the new value.
+    The first reading only sets the base, so the total starts at zero.
+    """
+
+    __slots__ = ("bits", "max_rate", "margin", "max_glitches", "total", "last_raw",
+                 "last_stamp", "consecutive_glitches", "glitches", "resets")
+
+    def __init__(self, bits=None, max_rate=None, margin=GLITCH_MARGIN, max_glitches=MAX_GLITCHES):
+        self.bits = bits
+        self.max_rate = max_rate
+        self.margin = margin
+        self.max_glitches = max_glitches
+
+        self.total = 0
+        self.last_raw = None
+        self.last_stamp = None
+        self.consecutive_glitches = 0
+        self.glitches = 0
+        self.resets = 0
+
+    def update(self, raw, stamp):
+        """Feed one raw counter reading; return the tick total."""
+        if self.last_raw is None:
+            self.last_raw = raw
+            self.last_stamp = stamp
+            return self.total
+
+        delta = raw - self.last_raw
+        if self.bits:
+            half = 1 << (self.bits - 1)
+            delta = (delta + half) % (1 << self.bits) - half
+
+        if self.max_rate is not None:
+            max_delta = self.max_rate * max(stamp - self.last_stamp, 0.0) + self.margin
+            if abs(delta) > max_delta:
+                if abs(raw) <= max_delta:
+                    # firmware reiniciou: raw é o que contou desde o boot
+                    self.resets += 1
+                    delta = raw
+                else:
+                    self.glitches += 1
+                    self.consecutive_glitches += 1
+                    # mantem a base (e o stamp), entao o proximo delta plausivel volta a contar
+                    if self.consecutive_glitches < self.max_glitches:
+                        return self.total
+                    delta = 0
+
+        self.consecutive_glitches = 0
+        self.total += int(round(delta))
+        self.last_raw = raw
+        self.last_stamp = stamp
+        return self.total
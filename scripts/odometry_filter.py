@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+# Fusao da odometria das rodas com a IMU, sem dependencia do ROS.
+#
+# EKF sobre a pose planar [x, y, th]. A predicao usa os deslocamentos das
+# rodas, com o giro combinado com a taxa do gyro pelo inverso das variancias
+# (parado, as rodas mandam; patinando, o gyro). A orientacao da IMU corrige
+# th; leituras fora do gate de inovacao sao descartadas como glitch. Todas as
+# matrizes sao alocadas no construtor e reutilizadas a cada passo.
+
+import math
+
+import numpy as np
+
+from odometry import WHEELTRACK, arc_step
+
+WHEEL_NOISE = 0.002         # m^2 de variancia por metro rodado em cada roda
+GYRO_NOISE = 0.02           # rad/s, desvio padrao da taxa de giro da IMU
+IMU_YAW_NOISE = 0.05        # rad, desvio padrao da orientacao da IMU
+INNOVATION_GATE = 9.0       # inovacao^2 / S acima disso descarta a leitura (3 sigma)
+MAX_REJECTED = 25           # leituras descartadas seguidas antes de re-sincronizar com a IMU
+
+# variancia dos eixos que um robo planar nao estima (z, roll, pitch, vy, ...)
+UNUSED_COVARIANCE = 1e6
+NONHOLONOMIC_COVARIANCE = 1e-9  # vy: o robo nao anda de lado
+
+
+class OdometryEKF:
+    """Extended Kalman filter of the planar pose from wheel displacements,
+    gyro yaw rate and IMU yaw.
+
+    ``predict`` integrates one wheel step with ``odometry.arc_step``, the
+    same integrator as ``DiffDriveOdometry``, and propagates the covariance; ``update_yaw``
+    corrects the heading with an absolute yaw reading. Covariances for the
+    ``nav_msgs/Odometry`` message are written into the preallocated
+    ``pose_covariance``/``twist_covariance`` arrays by ``covariances``.
+    """
+
+    def __init__(self, wheeltrack=WHEELTRACK, wheel_noise=WHEEL_NOISE, gyro_noise=GYRO_NOISE,
+                 yaw_noise=IMU_YAW_NOISE, gate=INNOVATION_GATE, max_rejected=MAX_REJECTED):
+        self.wheeltrack = wheeltrack
+        self.wheel_noise = wheel_noise
+        self.gyro_variance = gyro_noise * gyro_noise
+        self.yaw_variance = yaw_noise * yaw_noise
+        self.gate = gate
+        self.max_rejected = max_rejected
+
+        self.state = np.zeros(3)
+        self.P = np.zeros((3, 3))
+
+        # buffers reutilizados: jacobiano, ruido de processo, temporarios e ganho
+        self._F = np.eye(3)
+        self._Q = np.zeros((3, 3))
+        self._tmp = np.empty((3, 3))
+        self._K = np.empty(3)
+        self._dx = np.empty(3)
+
+        self.pose_covariance = np.zeros(36)
+        self.twist_covariance = np.zeros(36)
+        for i in (2, 3, 4):
+            self.pose_covariance[7 * i] = UNUSED_COVARIANCE
+            self.twist_covariance[7 * i] = UNUSED_COVARIANCE
+        self.twist_covariance[7] = NONHOLONOMIC_COVARIANCE
+
+        self.reset()
+
+    def reset(self, x=0.0, y=0.0, th=0.0):
+        self.state[0] = x
+        self.state[1] = y
+        self.state[2] = th
+        self.P.fill(0.0)
+
+        self.vx = 0.0
+        self.vth = 0.0
+        self.vx_variance = 0.0
+        self.vth_variance = 0.0
+
+        # sem leitura da IMU ainda: a primeira orientacao recebida define th
+        self.yaw_initialized = False
+        self.rejected = 0
+
+    @property
+    def x(self):
+        return self.state[0]
+
+    @property
+    def y(self):
+        return self.state[1]
+
+    @property
+    def th(self):
+        return self.state[2]
+
+    def predict(self, dl, dr, dt=0.0, gyro_rate=None):
+        """Propagate with the wheel displacements ``dl``/``dr`` [m] and, if
+        given, the gyro yaw rate [rad/s] over the same ``dt``."""
+        track = self.wheeltrack
+        var_l = self.wheel_noise * abs(dl)
+        var_r = self.wheel_noise * abs(dr)
+
+        dc = 0.5 * (dl + dr)
+        dc_var = 0.25 * (var_l + var_r)
+        dth = (dr - dl) / track
+        dth_var = (var_l + var_r) / (track * track)
+
+        # giro das rodas e do gyro combinados pelo inverso das variancias
+        if gyro_rate is not None and dt > 0:
+            gyro_dth = gyro_rate * dt
+            gyro_var = self.gyro_variance * dt * dt
+            total = dth_var + gyro_var
+            if total > 0:
+                dth = (gyro_var * dth + dth_var * gyro_dth) / total
+                dth_var = dth_var * gyro_var / total
+
+        # leitura indexada: sem montar a lista do tolist() a cada passo
+        state = self.state
+        x = state.item(0)
+        y = state.item(1)
+        th = state.item(2)
+        x_new, y_new, th_new = arc_step(x, y, th, dc, dth)
+        state[0] = x_new
+        state[1] = y_new
+        state[2] = th_new
+
+        # deslocamento do arco: (dx, dy) = k * (cos, sin) do heading medio
+        dx = x_new - x
+        dy = y_new - y
+        th_mid = th + 0.5 * dth
+        c = math.cos(th_mid)
+        s = math.sin(th_mid)
+
+        # P = F P F^T + G diag(dc_var, dth_var) G^T, com G = d(pose)/d(dc, dth)
+        F = self._F
+        F[0, 2] = -dy
+        F[1, 2] = dx
+
+        gx = -0.5 * dy
+        gy = 0.5 * dx
+        Q = self._Q
+        Q[0, 0] = c * c * dc_var + gx * gx * dth_var
+        Q[1, 1] = s * s * dc_var + gy * gy * dth_var
+        Q[0, 1] = Q[1, 0] = c * s * dc_var + gx * gy * dth_var
+        Q[0, 2] = Q[2, 0] = gx * dth_var
+        Q[1, 2] = Q[2, 1] = gy * dth_var
+        Q[2, 2] = dth_var
+
+        np.matmul(F, self.P, out=self._tmp)
+        np.matmul(self._tmp, F.T, out=self.P)
+        self.P += Q
+
+        if dt > 0:
+            self.vx = dc / dt
+            self.vth = dth / dt
+            self.vx_variance = dc_var / (dt * dt)
+            self.vth_variance = dth_var / (dt * dt)
+
+    def update_yaw(self, yaw):
+        """Correct the heading with an absolute yaw [rad]. Returns False when
+        the reading is rejected by the innovation gate."""
+        P = self.P
+        state = self.state
+
+        if not self.yaw_initialized:
+            self._seed_yaw(yaw)
+            return True
+
+        innovation = math.remainder(yaw - state[2], 2 * math.pi)
+        S = P[2, 2] + self.yaw_variance
+
+        if innovation * innovation > self.gate * S:
+            # glitch isolado e descartado; muitos seguidos -> o filtro que esta errado
+            self.rejected += 1
+            if self.rejected >= self.max_rejected:
+                self._seed_yaw(state[2] + innovation)
+            return False
+        self.rejected = 0
+
+        K = self._K
+        np.divide(P[:, 2], S, out=K)
+        np.multiply(K, innovation, out=self._dx)
+        state += self._dx
+
+        # P = P - K H P, com H = [0, 0, 1]
+        np.multiply.outer(K, P[2], out=self._tmp)
+        P -= self._tmp
+        return True
+
+    def _seed_yaw(self, yaw):
+        self.state[2] = yaw
+        self.P[2, :] = 0.0
+        self.P[:, 2] = 0.0
+        self.P[2, 2] = self.yaw_variance
+        self.yaw_initialized = True
+        self.rejected = 0
+
+    def covariances(self):
+        """Fill and return the row-major 6x6 ``(pose, twist)`` covariances
+        of ``nav_msgs/Odometry`` (x, y, z, roll, pitch, yaw)."""
+        P = self.P
+        pose = self.pose_covariance
+        pose[0] = P[0, 0]
+        pose[1] = pose[6] = P[0, 1]
+        pose[7] = P[1, 1]
+        pose[5] = pose[30] = P[0, 2]
+        pose[11] = pose[31] = P[1, 2]
+        pose[35] = P[2, 2]
+
+        twist = self.twist_covariance
+        twist[0] = self.vx_variance
+        twist[35] = self.vth_variance
+        return pose, twist
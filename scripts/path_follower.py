@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+# Seguidor de caminho (pure pursuit) sem dependencia do ROS.
+#
+# Usado pelo position_control.py quando recebe um nav_msgs/Path: o robo segue
+# todos os waypoints sem parar em cada um, com um perfil de velocidade que
+# respeita MAX_VEL, a aceleracao lateral nas curvas e a desaceleracao ate o
+# ultimo ponto.
+
+import math
+from bisect import bisect_left
+
+from control_law import MAX_VEL, MIN_VEL, FRONT, BACKWARD, reduce_angle
+
+LOOKAHEAD = 0.5             # metros a frente do ponto mais proximo
+MAX_ACCEL = 1.0             # m/s^2 ao longo do caminho
+MAX_LATERAL_ACCEL = 1.5     # m/s^2 nas curvas
+MAX_ANGULAR = 20            # rad/s, mesmo limite do safe_twist
+GOAL_TOLERANCE = 0.1        # metros ate o ultimo ponto
+HEADING_TOLERANCE = 0.1     # rad para a orientacao final
+K_HEADING = 2.0             # ganho do giro no lugar para a orientacao final
+SEARCH_WINDOW = 20          # pontos avaliados a frente na busca do mais proximo
+
+
+def curvature(x0, y0, x1, y1, x2, y2):
+    """Curvature of the circle through three points (0 when collinear)."""
+    a = math.hypot(x1 - x0, y1 - y0)
+    b = math.hypot(x2 - x1, y2 - y1)
+    c = math.hypot(x2 - x0, y2 - y0)
+    if a * b * c == 0:
+        return 0.0
+    cross = (x1 - x0) * (y2 - y0) - (y1 - y0) * (x2 - x0)
+    return 2 * cross / (a * b * c)
+
+
+def speed_profile(xs, ys, s, max_vel=MAX_VEL, min_vel=MIN_VEL,
+                  max_accel=MAX_ACCEL, max_lateral_accel=MAX_LATERAL_ACCEL):
+    """Maximum speed at each path point: limited by ``max_vel``, by the
+    lateral acceleration in curves, accelerating from ``min_vel`` at the
+    start and decelerating to zero at the last point."""
+    n = len(xs)
+    v = [max_vel] * n
+
+    for i in range(1, n - 1):
+        k = abs(curvature(xs[i - 1], ys[i - 1], xs[i], ys[i], xs[i + 1], ys[i + 1]))
+        if k > 0:
+            v[i] = min(v[i], math.sqrt(max_lateral_accel / k))
+
+    v[0] = min(v[0], min_vel)
+    for i in range(1, n):
+        v[i] = min(v[i], math.sqrt(v[i - 1] ** 2 + 2 * max_accel * (s[i] - s[i - 1])))
+
+    v[-1] = 0.0
+    for i in range(n - 2, -1, -1):
+        v[i] = min(v[i], math.sqrt(v[i + 1] ** 2 + 2 * max_accel * (s[i + 1] - s[i])))
+
+    return v
+
+
+class PurePursuit:
+    """Pure-pursuit follower for a list of ``(x, y)`` waypoints.
+
+    The nearest path point is tracked with a monotone index that only moves
+    forward inside a window bounded in points and in the arc length the
+    robot can have covered since the previous step, so each step costs
+    amortized O(1) however long the path is and however far off it the
+    robot is; the
+    lookahead point is found with a binary search on the arc length. The
+    robot drives backwards along the whole path when the path starts
+    behind it, as position_control does for single goals.
+    """
+
+    def __init__(self, waypoints, final_theta=None, lookahead=LOOKAHEAD,
+                 max_vel=MAX_VEL, min_vel=MIN_VEL, max_accel=MAX_ACCEL,
+                 max_lateral_accel=MAX_LATERAL_ACCEL, max_angular=MAX_ANGULAR,
+                 goal_tolerance=GOAL_TOLERANCE, heading_tolerance=HEADING_TOLERANCE):
+        if not waypoints:
+            raise ValueError("path has no waypoints")
+
+        self.xs = [float(p[0]) for p in waypoints]
+        self.ys = [float(p[1]) for p in waypoints]
+
+        self.s = [0.0]
+        for i in range(1, len(self.xs)):
+            self.s.append(self.s[-1] + math.hypot(self.xs[i] - self.xs[i - 1], self.ys[i] - self.ys[i - 1]))
+
+        self.velocity = speed_profile(self.xs, self.ys, self.s, max_vel, min_vel,
+                                      max_accel, max_lateral_accel)
+        self.min_vel = min_vel
+
+        self.final_theta = final_theta
+        self.lookahead = lookahead
+        self.max_angular = max_angular
+        self.goal_tolerance = goal_tolerance
+        self.heading_tolerance = heading_tolerance
+
+        self.index = 0
+        self.last_x = None               # pose do passo anterior (janela da busca)
+        self.last_y = None
+        self.motion_direction = None     # definido no primeiro passo
+        self.arrived = False
+        self.done = False
+
+    def nearest_index(self, x, y):
+        xs, ys, s = self.xs, self.ys, self.s
+        start = self.index
+        best = start
+        best_dist = math.hypot(xs[best] - x, ys[best] - y)
+
+        # janela: SEARCH_WINDOW pontos ou o arco que o robo pode ter avancado desde o
+        # passo anterior (no primeiro, a distancia ate o inicio do caminho); nao cresce
+        # com a distancia do robo ao caminho
+        if self.last_x is None:
+            travel = best_dist
+        else:
+            travel = math.hypot(x - self.last_x, y - self.last_y)
+        self.last_x = x
+        self.last_y = y
+
+        horizon = s[start] + 2 * self.lookahead + travel
+        i = start + 1
+        while i < len(xs) and (i - start < SEARCH_WINDOW or s[i] <= horizon):
+            dist = math.hypot(xs[i] - x, ys[i] - y)
+            if dist < best_dist:
+                best = i
+                best_dist = dist
+            i += 1
+
+        self.index = best
+        return best
+
+    def lookahead_point(self, index, x, y):
+        xs, ys, s = self.xs, self.ys, self.s
+        target_s = s[index] + self.lookahead
+        i = bisect_left(s, target_s, lo=index)
+        if i >= len(s):
+            return xs[-1], ys[-1]
+
+        # interpola entre i-1 e i no comprimento de arco exato
+        s0, s1 = s[i - 1], s[i]
+        t = (target_s - s0) / (s1 - s0) if s1 > s0 else 0.0
+        target_x = xs[i - 1] + t * (xs[i] - xs[i - 1])
+        target_y = ys[i - 1] + t * (ys[i] - ys[i - 1])
+
+        # robo fora do caminho perto de um salto: avanca o alvo ate ficar a
+        # pelo menos ``lookahead`` do robo, senao ele orbita o alvo
+        while math.hypot(target_x - x, target_y - y) < self.lookahead:
+            if i >= len(xs):
+                return xs[-1], ys[-1]
+            if math.hypot(xs[i] - x, ys[i] - y) >= self.lookahead:
+                t = self._circle_intersection(target_x, target_y, xs[i], ys[i], x, y)
+                return target_x + t * (xs[i] - target_x), target_y + t * (ys[i] - target_y)
+            target_x, target_y = xs[i], ys[i]
+            i += 1
+
+        return target_x, target_y
+
+    def _circle_intersection(self, ax, ay, bx, by, x, y):
+        """Fraction t of segment a->b where it leaves the lookahead circle
+        around (x, y); a is inside and b outside the circle."""
+        dx = bx - ax
+        dy = by - ay
+        fx = ax - x
+        fy = ay - y
+        a = dx * dx + dy * dy
+        b = 2 * (fx * dx + fy * dy)
+        c = fx * fx + fy * fy - self.lookahead * self.lookahead
+        return (-b + math.sqrt(max(b * b - 4 * a * c, 0.0))) / (2 * a)
+
+    def step(self, x, y, theta):
+        """Return the ``(linear, angular)`` command for the current pose;
+        ``done`` becomes True once the last point (and final heading, when
+        given) is reached."""
+        if self.done:
+            return 0.0, 0.0
+
+        if not self.arrived and math.hypot(self.xs[-1] - x, self.ys[-1] - y) < self.goal_tolerance:
+            self.arrived = True
+
+        if self.arrived:
+            return self._align_heading(theta)
+
+        index = self.nearest_index(x, y)
+        target_x, target_y = self.lookahead_point(index, x, y)
+
+        dx = target_x - x
+        dy = target_y - y
+        cos_th = math.cos(theta)
+        sin_th = math.sin(theta)
+        local_x = cos_th * dx + sin_th * dy
+        local_y = -sin_th * dx + cos_th * dy
+
+        if self.motion_direction is None:
+            self.motion_direction = FRONT if local_x >= 0 else BACKWARD
+
+        # alvo atras do robo (curva fechada ou salto no caminho): gira no lugar
+        if local_x * self.motion_direction < 0:
+            bearing = math.atan2(local_y * self.motion_direction, local_x * self.motion_direction)
+            angular = max(-self.max_angular, min(self.max_angular, K_HEADING * bearing))
+            return 0.0, angular
+
+        # curvatura do arco que passa pelo ponto de lookahead
+        distance_sq = local_x * local_x + local_y * local_y
+        kappa = 2 * local_y / distance_sq if distance_sq > 0 else 0.0
+
+        # mantem velocidade minima ate o fim para nao travar antes da tolerancia
+        speed = max(self.velocity[index], self.min_vel * 0.5)
+        if abs(kappa) * speed > self.max_angular:
+            speed = self.max_angular / abs(kappa)
+
+        linear = speed * self.motion_direction
+        angular = linear * kappa
+        return linear, angular
+
+    def _align_heading(self, theta):
+        if self.final_theta is None:
+            self.done = True
+            return 0.0, 0.0
+
+        error = reduce_angle(self.final_theta - theta)
+        if abs(error) < self.heading_tolerance:
+            self.done = True
+            return 0.0, 0.0
+
+        angular = max(-self.max_angular, min(self.max_angular, K_HEADING * error))
+        return 0.0, angular
@@ -1,58 +1,106 @@
 #!/usr/bin/env python3
 
+import math
+
 import rospy
 from nav_msgs.msg import Odometry, Path
 from geometry_msgs.msg import PoseStamped
-from tf.transformations import euler_from_quaternion
 from std_msgs.msg import Bool
-seq = 0  # Variável global para controlar o valor de sequência
-path = Path()
 
- # Criar um publisher para o tópico 'path'
-path_pub = rospy.Publisher('/path', Path, queue_size=10)
+from trajectory_buffer import TrajectoryBuffer, PATH_CAPACITY, MIN_DISTANCE, MIN_ANGLE, MIN_PERIOD
+from transport import ROS
+
+# ------ parametros (sobrescritos por ~params; decimacao em trajectory_buffer)
+PUBLISH_RATE = 2.0          # Hz de publicacao do Path completo
+
+
+def yaw_from_quaternion(q):
+    return math.atan2(2.0 * (q.w * q.z + q.x * q.y), 1.0 - 2.0 * (q.y * q.y + q.z * q.z))
+
+
+class PathPublisher:
+    def __init__(self, transport=ROS):
+        self.transport = transport
+        self.frame_id = transport.get_param("~frame_id", "odom")
 
+        self.buffer = TrajectoryBuffer(
+            capacity=transport.get_param("~capacity", PATH_CAPACITY),
+            min_distance=transport.get_param("~min_distance", MIN_DISTANCE),
+            min_angle=transport.get_param("~min_angle", MIN_ANGLE),
+            min_period=transport.get_param("~min_period", MIN_PERIOD),
+        )
+        self.seq = 0  # Variável para controlar o valor de sequência
 
-def reset_goals_callback(msg):
-        global seq
-        reset = msg.data 
-        if(reset):
-             path.poses.clear()
-             seq = 0
+        self.path = Path()
+        self.path.header.frame_id = self.frame_id
 
+        self.incremental_path = Path()
+        self.incremental_path.header.frame_id = self.frame_id
 
-def odometry_callback(msg):
-    global seq, path
+        # ------ publishers
+        self.path_pub = transport.Publisher('/path', Path, queue_size=1)
 
+        self.incremental_pub = None
+        if transport.get_param("~incremental", False):
+            self.incremental_pub = transport.Publisher('/path/incremental', Path, queue_size=10)
 
-    p = PoseStamped()
-    p.pose.position.x = msg.pose.pose.position.x
-    p.pose.position.y = msg.pose.pose.position.y
-    p.pose.position.z = msg.pose.pose.position.z
+        transport.Subscriber('odom', Odometry, self.odometry_callback, queue_size=10)
+        transport.Subscriber("/goal_manager/goal/reset", Bool, self.reset_goals_callback)
 
-    p.pose.orientation.x = msg.pose.pose.orientation.x
-    p.pose.orientation.y = msg.pose.pose.orientation.y
-    p.pose.orientation.z = msg.pose.pose.orientation.z
-    p.pose.orientation.w = msg.pose.pose.orientation.w
+        publish_rate = transport.get_param("~publish_rate", PUBLISH_RATE)
+        self.timer = transport.Timer(1.0 / publish_rate, self.publish_callback)
 
-    p.header.stamp = rospy.Time.now()
-    p.header.seq = seq
-    seq = seq+1
+    def reset_goals_callback(self, msg):
+        if msg.data:
+            self.buffer.clear()
+            self.seq = 0
 
-    path.poses.append(p)
-    path.header.stamp = rospy.Time.now()
-    path.header.frame_id = "odom"
-    path_pub.publish(path)
-    
+    def odometry_callback(self, msg):
+        pose = msg.pose.pose
+        stamp = self.transport.now() if msg.header.stamp.is_zero() else msg.header.stamp
+        t = stamp.to_sec()
+        yaw = yaw_from_quaternion(pose.orientation)
 
-    # Publicar a mensagem Path no tópico 'path'
+        # descarta a pose antes de alocar qualquer mensagem
+        if not self.buffer.accepts(pose.position.x, pose.position.y, yaw, t):
+            return
 
+        # copia da pose: no transporte em memoria a mensagem de odometria é reutilizada
+        p = PoseStamped()
+        p.header.stamp = stamp
+        p.header.seq = self.seq
+        p.header.frame_id = self.frame_id
+        p.pose.position.x = pose.position.x
+        p.pose.position.y = pose.position.y
+        p.pose.position.z = pose.position.z
+        p.pose.orientation.x = pose.orientation.x
+        p.pose.orientation.y = pose.orientation.y
+        p.pose.orientation.z = pose.orientation.z
+        p.pose.orientation.w = pose.orientation.w
+        self.seq += 1
+
+        self.buffer.append(p, pose.position.x, pose.position.y, yaw, t)
+
+    def publish_callback(self, event):
+        # historico e poses novas lidos juntos: o callback de odometria roda em outra thread
+        snapshot = self.buffer.snapshot()
+        if snapshot is None:
+            return
+        poses, new_poses = snapshot
+
+        now = self.transport.now()
+        self.path.header.stamp = now
+        self.path.poses = poses
+        self.path_pub.publish(self.path)
+
+        # Publicar somente as poses novas no tópico incremental
+        if self.incremental_pub is not None and new_poses:
+            self.incremental_path.header.stamp = now
+            self.incremental_path.poses = new_poses
+            self.incremental_pub.publish(self.incremental_path)
 
 
 if __name__ == '__main__':
     rospy.init_node('odometry_to_path_node')
-
-    # Subscrever ao tópico de odometria
-    rospy.Subscriber('odom', Odometry, odometry_callback)
-    rospy.Subscriber("/goal_manager/goal/reset", Bool, reset_goals_callback)
+    PathPublisher()
     rospy.spin()
-    
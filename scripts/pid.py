@@ -1,62 +1,209 @@
 #!/user/bin/env python3
 
 
-from time import time
+from time import monotonic
 
-class PIDController: 
-    def __init__(self, KP, KI, KD):
+import numpy as np
+
+INTEGRAL_LIMIT = 1.5    # limite do termo integral (anti wind-up por saturação)
+
+
+def clamp(value, limit):
+    if value > limit:
+        return limit
+    if value < -limit:
+        return -limit
+    return value
+
+
+class PIDController:
+    """PID with anti-windup, filtered derivative and output saturation.
+
+    Time step sources, in priority order: the ``dt`` passed to ``update``,
+    the fixed ``dt`` given to the constructor, or the difference between
+    two readings of ``clock`` (``time.monotonic`` by default). The first
+    clock-based update and any update with ``dt <= 0`` only apply the
+    proportional term plus the previous integral and derivative, so
+    repeated timestamps never divide by zero.
+
+    When ``update`` receives the ``measurement``, the derivative is taken
+    on the measurement instead of the error, so setpoint steps do not kick
+    the output. The derivative goes through a first-order low-pass filter
+    with time constant ``derivative_filter`` (0 disables it).
+
+    The integral term is clamped to ``integral_limit`` and, when
+    ``output_limit`` is set, also bled off by back-calculation with gain
+    ``back_calculation`` while the output is saturated.
+    """
+
+    __slots__ = (
+        "KP", "KI", "KD",
+        "dt", "clock",
+        "integral_limit", "output_limit", "back_calculation", "derivative_filter",
+        "error", "last_error", "last_measurement", "last_time",
+        "integral", "derivative_term",
+    )
+
+    def __init__(self, KP, KI, KD, dt=None, clock=monotonic,
+                 integral_limit=INTEGRAL_LIMIT, output_limit=None,
+                 back_calculation=0.0, derivative_filter=0.0):
         self.KP = KP
-        self.KD = KD 
         self.KI = KI
+        self.KD = KD
 
-        self.time = time()
-        self.last_time = time()
-        self.delta_time = 0
+        self.dt = dt
+        self.clock = clock
 
-        self.error = 0
-        self.last_error = 0
-        self.delta_error = 0
+        self.integral_limit = integral_limit
+        self.output_limit = output_limit
+        self.back_calculation = back_calculation
+        self.derivative_filter = derivative_filter
 
-        self.integral = 0
-    
-    def proporcional(self):
+        self.reset()
 
-        return self.KP * self.error
-    
-    def integrative(self): 
+    def reset(self):
+        self.error = 0.0
+        self.last_error = None
+        self.last_measurement = None
+        self.last_time = None
 
-        self.integral += self.error * self.delta_time
-            #anti wind-up
-        if(self.integral > 1.5 or self.integral < -1.5):
-            self.integral = 0
-        # print(self.integral)
-        return self.integral * self.KI
+        self.integral = 0.0             # termo integral já multiplicado por KI
+        self.derivative_term = 0.0      # derivada filtrada, sem o ganho KD
 
-    def derivative(self):
-        self.delta_error = self.error - self.last_error
+    def _delta_time(self, dt):
+        if dt is not None:
+            return dt
+        if self.dt is not None:
+            return self.dt
+
+        now = self.clock()
+        delta_time = 0.0 if self.last_time is None else now - self.last_time
+        self.last_time = now
+        return delta_time
+
+    def update(self, error, measurement=None, dt=None):
+        delta_time = self._delta_time(dt)
+        self.error = error
+
+        if delta_time > 0:
+            self.integral = clamp(self.integral + self.KI * error * delta_time, self.integral_limit)
+
+            if measurement is not None and self.last_measurement is not None:
+                raw_derivative = -(measurement - self.last_measurement) / delta_time
+            elif self.last_error is not None:
+                raw_derivative = (error - self.last_error) / delta_time
+            else:
+                raw_derivative = 0.0
+
+            if self.derivative_filter > 0:
+                alpha = delta_time / (self.derivative_filter + delta_time)
+                self.derivative_term += alpha * (raw_derivative - self.derivative_term)
+            else:
+                self.derivative_term = raw_derivative
+
+        output = self.KP * error + self.integral + self.KD * self.derivative_term
+
+        if self.output_limit is not None:
+            saturated = clamp(output, self.output_limit)
+
+            # back-calculation: descarrega o integral enquanto a saída satura
+            if saturated != output and self.back_calculation > 0 and delta_time > 0:
+                self.integral = clamp(
+                    self.integral + self.back_calculation * (saturated - output) * delta_time,
+                    self.integral_limit)
+            output = saturated
+
+        self.last_error = error
+        self.last_measurement = measurement
+
+        return output
 
-        if(self.delta_error != 0):
-            self.delta_error = self.delta_error/self.delta_time
-        else:
-            self.delta_error = 0
-        return self.delta_error*self.KD
-            
     def output(self, kp, ki, kd, error):
         self.KP = kp
         self.KI = ki
         self.KD = kd
 
-        self.error = error
+        return self.update(error)
+
+
+class VectorPIDController:
+    """N independent PID controllers stepped at once over NumPy arrays.
+
+    Same control law as ``PIDController`` (clamped integral,
+    back-calculation, filtered derivative, output saturation) with a fixed
+    ``dt``. Gains may be scalars or arrays of shape ``(N,)``, one entry per
+    instance, which is what gain sweeps use.
+    """
+
+    __slots__ = (
+        "KP", "KI", "KD", "dt",
+        "integral_limit", "output_limit", "back_calculation", "alpha",
+        "integral", "derivative_term", "last_error", "started",
+    )
+
+    def __init__(self, KP, KI, KD, dt, size=None,
+                 integral_limit=INTEGRAL_LIMIT, output_limit=None,
+                 back_calculation=0.0, derivative_filter=0.0):
+        KP, KI, KD = np.broadcast_arrays(
+            np.asarray(KP, dtype=np.float64),
+            np.asarray(KI, dtype=np.float64),
+            np.asarray(KD, dtype=np.float64))
+        if size is not None:
+            KP, KI, KD = (np.broadcast_to(k, (size,)) for k in (KP, KI, KD))
+
+        self.KP = KP
+        self.KI = KI
+        self.KD = KD
+        self.dt = dt
+
+        self.integral_limit = integral_limit
+        self.output_limit = output_limit
+        self.back_calculation = back_calculation
+        self.alpha = dt / (derivative_filter + dt) if derivative_filter > 0 else 1.0
+
+        self.integral = np.zeros(KP.shape)
+        self.derivative_term = np.zeros(KP.shape)
+        self.last_error = np.zeros(KP.shape)
+        self.started = False
+
+    def reset(self):
+        self.integral.fill(0.0)
+        self.derivative_term.fill(0.0)
+        self.last_error.fill(0.0)
+        self.started = False
+
+    def update(self, error, measurement_delta=None):
+        """Step every controller with ``error`` and return the outputs.
+
+        ``measurement_delta`` (change of the measurement since the last
+        step) switches the derivative to the measurement, as in
+        ``PIDController``.
+        """
+        dt = self.dt
+
+        self.integral += self.KI * error * dt
+        np.clip(self.integral, -self.integral_limit, self.integral_limit, out=self.integral)
+
+        if measurement_delta is not None:
+            raw_derivative = -measurement_delta / dt
+        elif self.started:
+            raw_derivative = (error - self.last_error) / dt
+        else:
+            raw_derivative = 0.0
+        self.derivative_term += self.alpha * (raw_derivative - self.derivative_term)
+
+        output = self.KP * error + self.integral + self.KD * self.derivative_term
+
+        if self.output_limit is not None:
+            saturated = np.clip(output, -self.output_limit, self.output_limit)
 
-        self.time = time()
-        self.delta_time = self.time - self.last_time
+            # back-calculation: descarrega o integral enquanto a saída satura
+            if self.back_calculation > 0:
+                self.integral += self.back_calculation * (saturated - output) * dt
+                np.clip(self.integral, -self.integral_limit, self.integral_limit, out=self.integral)
+            output = saturated
 
-        if (self.error != 0):
-            output = self.proporcional() + self.integrative() + self.derivative()
-        else: 
-            output = self.proporcional() + self.derivative()
-        
-        self.last_error = self.error
-        self.last_time = self.time
+        self.last_error[...] = error
+        self.started = True
 
-        return output
\ No newline at end of file
+        return output
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+# Varredura offline de ganhos do PID angular do position_control.
+#
+# Simula N robos em paralelo, um por combinacao de ganhos, seguindo a mesma
+# sequencia de goals, e reporta tempo de subida, overshoot e erro de
+# orientacao em regime para cada candidato. Cada passo e o mesmo do
+# PositionController (troca de orientacao frontal/traseira, velocidade
+# linear pelo erro) contra a planta do position_sim.py, so que sobre arrays;
+# no fim o melhor candidato e re-simulado com as classes escalares para
+# garantir que a varredura otimiza o controlador que roda no robo.
+#
+#   rosrun fred_move_base pid_tuning.py --kp 5:40:8 --ki 0:2:5 --kd 0:1:3
+#   rosrun fred_move_base pid_tuning.py --goals goals.csv --top 20
+
+import argparse
+import itertools
+import math
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from control_law import PositionController, FRONT, BACKWARD, linear_speed
+from pid import PIDController, VectorPIDController
+from position_sim import DiffDrivePlant, DT, MAX_WHEEL_SPEED, MOTOR_TIME_CONSTANT
+from odometry import WHEELTRACK
+from safety_pipeline import MAX_ANGULAR_SPEED
+
+GOAL_TIMEOUT = 10.0         # segundos maximos por goal
+GOAL_TOLERANCE = 0.1        # metros para considerar o goal alcancado
+RISE_FRACTION = 0.1         # subida: |erro| abaixo de 10% do erro inicial
+SETTLE_WINDOW = 0.5         # segundos finais usados no erro em regime
+CHECK_TOLERANCE = 1e-6      # rad entre a simulacao vetorial e a escalar
+
+# percurso padrao com curvas para os dois lados e uma volta de 180 graus
+DEFAULT_GOALS = [(1.0, 0.0), (1.0, 1.0), (0.0, 1.0), (0.0, 0.0), (2.0, -1.0), (0.0, -0.5)]
+
+
+# reduce_angle do control_law sobre arrays (mesma forma fechada)
+def reduce_angle(angle):
+    return angle - 2 * np.pi * np.ceil((angle - np.pi) / (2 * np.pi))
+
+
+def simulate(kp, ki, kd, goals, dt=DT, goal_timeout=GOAL_TIMEOUT,
+             goal_tolerance=GOAL_TOLERANCE, start=(0.0, 0.0, 0.0)):
+    """Run every gain candidate through ``goals`` and return the heading
+    error history, shape ``(len(goals), steps, N)``, with NaN after the
+    goal is reached, plus the initial error of each segment ``(len(goals), N)``.
+
+    Vectorized copy of ``PositionController.step`` driving
+    ``position_sim.DiffDrivePlant``, with the angular command saturated
+    like safe_twist does; ``check`` compares it with the scalar classes.
+    """
+    kp = np.asarray(kp, dtype=np.float64)
+    n = kp.size
+    steps = int(round(goal_timeout / dt))
+
+    pid = VectorPIDController(kp, ki, kd, dt, size=n)
+
+    x = np.full(n, float(start[0]))
+    y = np.full(n, float(start[1]))
+    th = np.full(n, float(start[2]))
+    direction = np.full(n, float(FRONT))
+    left_speed = np.zeros(n)
+    right_speed = np.zeros(n)
+
+    half_track = 0.5 * WHEELTRACK
+    alpha = dt / (MOTOR_TIME_CONSTANT + dt)
+
+    errors = np.full((len(goals), steps, n), np.nan)
+    initial_errors = np.zeros((len(goals), n))
+
+    for g, (goal_x, goal_y) in enumerate(goals):
+        active = np.ones(n, dtype=bool)
+
+        for k in range(steps):
+            dx = goal_x - x
+            dy = goal_y - y
+            active &= np.hypot(dx, dy) >= goal_tolerance
+            if not active.any():
+                break
+
+            # ------ PositionController.step
+            error_angle = np.arctan2(dy, dx)
+            front_error = reduce_angle(error_angle - th)
+            backward_error = reduce_angle(error_angle - reduce_angle(th + np.pi))
+
+            to_backward = (np.abs(front_error) > np.abs(backward_error)) & (direction == FRONT)
+            to_front = (np.abs(backward_error) > np.abs(front_error)) & (direction == BACKWARD)
+            direction = np.where(to_backward, BACKWARD, np.where(to_front, FRONT, direction))
+            error = np.where(direction == FRONT, front_error, backward_error)
+
+            if k == 0:
+                initial_errors[g] = error
+            errors[g, k] = np.where(active, error, np.nan)
+
+            # quem ja chegou nao passa mais pelo controlador: o PID fica como estava
+            state = (pid.integral.copy(), pid.derivative_term.copy(), pid.last_error.copy())
+            angular = pid.update(error)
+            for current, previous in zip((pid.integral, pid.derivative_term, pid.last_error), state):
+                np.copyto(current, previous, where=~active)
+            linear = linear_speed(error, direction)
+            angular = np.clip(angular, -MAX_ANGULAR_SPEED, MAX_ANGULAR_SPEED)
+            linear = np.where(active, linear, 0.0)
+            angular = np.where(active, angular, 0.0)
+
+            # ------ DiffDrivePlant.step
+            left_cmd = np.clip(linear - angular * half_track, -MAX_WHEEL_SPEED, MAX_WHEEL_SPEED)
+            right_cmd = np.clip(linear + angular * half_track, -MAX_WHEEL_SPEED, MAX_WHEEL_SPEED)
+            left_speed = np.where(active, left_speed + alpha * (left_cmd - left_speed), left_speed)
+            right_speed = np.where(active, right_speed + alpha * (right_cmd - right_speed), right_speed)
+
+            dc = 0.5 * (left_speed + right_speed) * dt
+            dth = (right_speed - left_speed) * dt / WHEELTRACK
+            step = np.where(active, dc * np.sinc(0.5 * dth / np.pi), 0.0)
+            th_mid = th + 0.5 * dth
+            x = x + step * np.cos(th_mid)
+            y = y + step * np.sin(th_mid)
+            th = np.where(active, th + dth, th)
+
+    return errors, initial_errors
+
+
+def simulate_scalar(kp, ki, kd, goals, dt=DT, goal_timeout=GOAL_TIMEOUT,
+                    goal_tolerance=GOAL_TOLERANCE, start=(0.0, 0.0, 0.0)):
+    """Heading error history of one candidate, shape ``(len(goals), steps)``,
+    run through ``PositionController`` and ``DiffDrivePlant`` themselves."""
+    steps = int(round(goal_timeout / dt))
+    controller = PositionController(kp, ki, kd, pid=PIDController(kp, ki, kd, dt=dt))
+    plant = DiffDrivePlant()
+    plant.reset(*start)
+
+    errors = np.full((len(goals), steps), np.nan)
+    for g, (goal_x, goal_y) in enumerate(goals):
+        for k in range(steps):
+            if math.hypot(goal_x - plant.x, goal_y - plant.y) < goal_tolerance:
+                break
+            linear, angular = controller.step(plant.x, plant.y, plant.th, goal_x, goal_y)
+            errors[g, k] = controller.angular_pid.error
+            plant.step(linear, min(max(angular, -MAX_ANGULAR_SPEED), MAX_ANGULAR_SPEED), dt)
+    return errors
+
+
+def check(errors, index, kp, ki, kd, goals, dt=DT, goal_timeout=GOAL_TIMEOUT):
+    """Largest heading error difference [rad] between candidate ``index``
+    of the vectorized run and the scalar controller with the same gains."""
+    scalar = simulate_scalar(kp, ki, kd, goals, dt=dt, goal_timeout=goal_timeout)
+    vector = errors[:, :, index]
+    if not np.array_equal(np.isnan(scalar), np.isnan(vector)):
+        return np.inf
+    return float(np.nanmax(np.abs(scalar - vector), initial=0.0))
+
+
+def step_metrics(errors, initial_errors, dt=DT, rise_fraction=RISE_FRACTION,
+                 settle_window=SETTLE_WINDOW):
+    """Rise time [s], overshoot [fraction of the initial error] and
+    steady-state heading error [rad], averaged over the goals."""
+    n_goals, steps, n = errors.shape
+    window = max(1, int(round(settle_window / dt)))
+    e0 = np.abs(initial_errors)
+    sign = np.sign(initial_errors)[:, None, :]
+
+    # sem erro inicial nao ha degrau para medir
+    has_step = e0 > 1e-3
+
+    abs_errors = np.abs(errors)
+    risen = abs_errors <= rise_fraction * e0[:, None, :]
+    rise_idx = np.where(risen.any(axis=1), risen.argmax(axis=1), steps)
+    rise_time = np.where(rise_idx < steps, rise_idx * dt, np.inf)
+
+    # overshoot: erro de sinal oposto ao inicial depois da subida
+    after_rise = np.arange(steps)[None, :, None] >= rise_idx[:, None, :]
+    crossed = np.where(after_rise, -sign * errors, 0.0)
+    overshoot = np.nanmax(np.nan_to_num(crossed, nan=0.0), axis=1).clip(min=0.0)
+    overshoot = overshoot / np.where(has_step, e0, 1.0)
+
+    # erro em regime: media de |erro| nas ultimas amostras antes de chegar/timeout
+    valid = ~np.isnan(errors)
+    last_idx = np.where(valid.any(axis=1), steps - 1 - valid[:, ::-1, :].argmax(axis=1), 0)
+    idx = np.arange(steps)[None, :, None]
+    in_window = valid & (idx > last_idx[:, None, :] - window) & (idx <= last_idx[:, None, :])
+    steady_state = (np.where(in_window, abs_errors, 0.0).sum(axis=1)
+                    / np.maximum(in_window.sum(axis=1), 1))
+
+    rise_time = np.where(has_step, rise_time, np.nan)
+    overshoot = np.where(has_step, overshoot, np.nan)
+
+    # goals sem degrau viram NaN e sao ignorados nas medias
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return (np.nanmean(np.where(np.isinf(rise_time), steps * dt, rise_time), axis=0),
+                np.nan_to_num(np.nanmax(overshoot, axis=0)),
+                steady_state.mean(axis=0))
+
+
+def parse_range(text):
+    """"a" -> [a]; "a,b,c" -> [a, b, c]; "start:stop:num" -> linspace."""
+    if ":" in text:
+        start, stop, num = text.split(":")
+        return np.linspace(float(start), float(stop), int(num))
+    return np.array([float(v) for v in text.split(",")])
+
+
+def load_goals(path):
+    goals = np.loadtxt(path, delimiter=",", ndmin=2, usecols=(0, 1))
+    return [tuple(goal) for goal in goals]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline PID gain sweep for position_control")
+    parser.add_argument("--kp", default="5:40:8", help="value, list a,b,c or range start:stop:num")
+    parser.add_argument("--ki", default="0:2:5")
+    parser.add_argument("--kd", default="0:1:3")
+    parser.add_argument("--goals", help="CSV with one x,y goal per line")
+    parser.add_argument("--dt", type=float, default=DT)
+    parser.add_argument("--timeout", type=float, default=GOAL_TIMEOUT, help="seconds per goal")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    goals = load_goals(args.goals) if args.goals else DEFAULT_GOALS
+    candidates = np.array(list(itertools.product(
+        parse_range(args.kp), parse_range(args.ki), parse_range(args.kd))))
+    kp, ki, kd = candidates.T
+
+    start = time.perf_counter()
+    errors, initial_errors = simulate(kp, ki, kd, goals, dt=args.dt, goal_timeout=args.timeout)
+    rise_time, overshoot, steady_state = step_metrics(errors, initial_errors, dt=args.dt)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(candidates)} candidates x {len(goals)} goals simulated in {elapsed:.2f} s\n")
+    print(f"{'KP':>8} {'KI':>8} {'KD':>8} {'rise [s]':>10} {'overshoot':>10} {'ss err [rad]':>13}")
+
+    # ordena por erro em regime, depois overshoot, depois tempo de subida
+    order = np.lexsort((rise_time, overshoot, np.round(steady_state, 3)))
+    for i in order[:args.top]:
+        print(f"{kp[i]:8.3f} {ki[i]:8.3f} {kd[i]:8.3f} "
+              f"{rise_time[i]:10.3f} {overshoot[i]:10.3f} {steady_state[i]:13.4f}")
+
+    best = order[0]
+    difference = check(errors, best, kp[best], ki[best], kd[best], goals, dt=args.dt, goal_timeout=args.timeout)
+    print(f"\nscalar PositionController check (best candidate): max |diff| = {difference:.2e} rad")
+    if difference > CHECK_TOLERANCE:
+        print("MISMATCH: the sweep no longer simulates PositionController")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
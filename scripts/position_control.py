@@ -1,23 +1,24 @@
 #!/usr/bin/env python3
 
 
-from pid import PIDController
+import time
+
+from control_law import PositionController, BACKWARD, MAX_VEL, yaw_from_quaternion
+from path_follower import PurePursuit, LOOKAHEAD, MAX_ACCEL, MAX_LATERAL_ACCEL
+from latency_trace import StageTrace
+from node_diagnostics import DiagnosticsPublisher, MonitoredRate, DIAGNOSTICS_PERIOD
+from transport import ROS
 
-import math 
 import rospy 
-import tf2_ros
-import tf
 
-from tf.transformations import quaternion_multiply
-from geometry_msgs.msg import Pose2D, PoseStamped,Quaternion, Twist
-from nav_msgs.msg import Odometry
+from geometry_msgs.msg import Pose2D, PoseStamped,Quaternion, Twist, TwistStamped
+from nav_msgs.msg import Odometry, Path
 from std_msgs.msg import Bool 
 
 # flag da maquina de estados
 active_pid = False
 
 # pose atual do robo em relação a odometria
-robot_pose = Pose2D()
 odom_pose = Pose2D()
 odom_quaternion = Quaternion()
 
@@ -25,208 +26,174 @@ odom_quaternion = Quaternion()
 goal_pose = Pose2D()
 goal_pose.x = 0.25
 
-# ------ publishers 
-cmd_vel_pub = rospy.Publisher('/cmd_vel', Twist, queue_size = 10)
+LOG_PERIOD = 1.0    # segundos entre logs do controle
+LOOP_RATE = 50      # Hz do modo timer
+ODOM_TIMEOUT = 0.2  # idade maxima da odometria antes de parar o robo
+MIN_QUATERNION_NORM = 1e-6  # abaixo disso a orientacao do ultimo pose do caminho nao foi preenchida
 
-# ------ messages 
-cmd_vel = Twist()
+# "timer": controle a 50 Hz | "odom": um passo de controle a cada mensagem de odometria
+control_mode = "timer"
+odom_timeout = ODOM_TIMEOUT
+last_odom_stamp = None
+odom_stale = True
 
-# limites de velocidade 
-MIN_VEL = 0.5     # velocidade para fazer curva 
-MAX_VEL = 2
+# seguidor de caminho ativo (None -> segue goal_pose)
+path_follower = None
+path_params = {}
+watchdog_timer = None
 
-# ṔID angular setup 
-KP_ANGULAR = 20
-KI_ANGULAR = 1
-KD_ANGULAR = 0
+# ------ transporte e publishers (criados no setup)
+node_transport = None
+cmd_vel_pub = None
+path_completed_pub = None
+
+# ------ messages 
+cmd_vel = Twist()
+# ~stamped: publica TwistStamped com o carimbo da odometria (origem: ticks)
+stamped = False
+cmd_vel_stamped = TwistStamped()
+cmd_vel_stamped.twist = cmd_vel
 
-angular_vel = PIDController(KP_ANGULAR, KI_ANGULAR, KD_ANGULAR)
+# latencia: idade da odometria usada e tempo do passo de controle
+trace = StageTrace("position_control")
+diagnostics = None
+# tempo de cada ciclo do modo timer (fila: odometrias por ciclo) ou de cada odometria no modo odom
+loop_rate = None
+timing = None
 
-# variavel de controle de direção e sentido 
-motion_direction = 1    #  1  --> orientação frontal 
-                        # -1  --> orientação traseira
+# lei de controle: orientação frontal/traseira + PID angular
+controller = PositionController()
 
 def turn_on_pid_callback(msg): 
     global active_pid
     active_pid = msg.data
 
 def odom_callback(odom_msg): 
-    global odom_pose, odom_quaternion
+    global odom_quaternion, last_odom_stamp
 
     odom_pose.x = odom_msg.pose.pose.position.x
     odom_pose.y = odom_msg.pose.pose.position.y
     odom_quaternion = odom_msg.pose.pose.orientation
-    
-    odom_pose.theta = tf.transformations.euler_from_quaternion([
-        odom_quaternion.x, 
-        odom_quaternion.y, 
-        odom_quaternion.z, 
-        odom_quaternion.w
-        ])[2]
+
+    # heading calculado uma unica vez por mensagem de odometria
+    odom_pose.theta = yaw_from_quaternion(odom_quaternion)
+
+    stamp = odom_msg.header.stamp
+    last_odom_stamp = node_transport.now() if stamp.is_zero() else stamp
+
+    if control_mode == "odom":
+        timing.wake(time.perf_counter())
+        position_control()
+        timing.done(time.perf_counter())
+    else:
+        timing.enqueue()
 
 def setpoint_callback(goal_msg): 
-    global goal_pose
+    global path_follower
+
+    # um goal pontual cancela o caminho em andamento
+    path_follower = None
 
     goal_pose.x = goal_msg.pose.position.x 
     goal_pose.y = goal_msg.pose.position.y 
-    goal_pose.theta = tf.transformations.euler_from_quaternion([
-        goal_msg.pose.orientation.x, 
-        goal_msg.pose.orientation.y, 
-        goal_msg.pose.orientation.z, 
-        goal_msg.pose.orientation.w
-        ])[2]
+    goal_pose.theta = yaw_from_quaternion(goal_msg.pose.orientation)
     
     # rospy.loginfo("POSITION CONTROL: Received new goal")
 
-# Orientação e posição do robô com x+ apontado para trás e y+ para direita
-def backward_orientation():
-    global odom_pose, odom_quaternion
-    bkward_pose = Pose2D()
+def path_callback(path_msg):
+    global path_follower
 
-    # * utilizando a odometria ------------------------------------------------------------------------------------------------------
+    if not path_msg.poses:
+        path_follower = None
+        return
 
-    bkward_quaternion = Quaternion()
-    bkward_pose.x = odom_pose.x
-    bkward_pose.y = odom_pose.y
-    
-    q_rot = tf.transformations.quaternion_from_euler(0, 0, math.pi)
-
-    bkward_quaternion = quaternion_multiply([odom_quaternion.x, odom_quaternion.y, odom_quaternion.z, odom_quaternion.w],q_rot)
-    bkward_pose.theta = tf.transformations.euler_from_quaternion(bkward_quaternion)[2]
-
-    # * ------------------------------------------------------------------------------------------------------------------------------
-
-    # tf_buffer = tf2_ros.Buffer()
-    # tf_listener = tf2_ros.TransformListener(tf_buffer)
-
-    # try:
-    #     transform = tf_buffer.lookup_transform("odom", "backward_orientation_link", rospy.Time(0), rospy.Duration(2.0))
-        
-    #     bkward_pose.x = transform.transform.translation.x
-    #     bkward_pose.y = transform.transform.translation.y
-    #     bkward_pose.theta = tf.transformations.euler_from_quaternion([
-    #         transform.transform.rotation.x,
-    #         transform.transform.rotation.y,
-    #         transform.transform.rotation.z,
-    #         transform.transform.rotation.w
-    #     ])[2]
-        
-    # except (tf2_ros.LookupException, tf2_ros.ConnectivityException, tf2_ros.ExtrapolationException):
-    #     rospy.logwarn("Failed to lookup transform from 'odom' to 'backward_orientation_link'")
-    
-    return bkward_pose
-
-# Orientação e posição do robô com x+ apontado para frente e y+ para esquerda
-def front_orientation():
-    global odom_pose
-    front_pose = Pose2D()
-
-    # * utilizando a odometria ------------------------------------------------------------------------------------------------------
-
-    front_pose.x = odom_pose.x
-    front_pose.y = odom_pose.y
-    front_pose.theta = odom_pose.theta
-
-    # * ------------------------------------------------------------------------------------------------------------------------------
-
-    # tf_buffer = tf2_ros.Buffer()
-    # tf_listener = tf2_ros.TransformListener(tf_buffer)
-
-    # try:
-    #     transform = tf_buffer.lookup_transform("odom", "base_link", rospy.Time(0), rospy.Duration(1.0))
-        
-    #     front_pose.x = transform.transform.translation.x
-    #     front_pose.y = transform.transform.translation.y
-    #     front_pose.theta = tf.transformations.euler_from_quaternion([
-    #         transform.transform.rotation.x,
-    #         transform.transform.rotation.y,
-    #         transform.transform.rotation.z,
-    #         transform.transform.rotation.w
-    #     ])[2]
-        
-    # except (tf2_ros.LookupException, tf2_ros.ConnectivityException, tf2_ros.ExtrapolationException):
-    #     rospy.logwarn("Failed to lookup transform from 'odom' to 'base_link'")
-    
-    return front_pose
+    waypoints = [(p.pose.position.x, p.pose.position.y) for p in path_msg.poses]
 
-# reduz ângulo entre -2pi e 2pi
-# def reduce_angle(angle):
-#     if angle > 2*math.pi:
-#         angle = angle - 4*math.pi
-    
-#     if angle < -2*math.pi:
-#         angle = angle + 4*math.pi
-    
-#     return angle
+    # quaternion zerado (caminho sem orientacao): sem giro final no ultimo ponto
+    q = path_msg.poses[-1].pose.orientation
+    if q.x*q.x + q.y*q.y + q.z*q.z + q.w*q.w > MIN_QUATERNION_NORM:
+        final_theta = yaw_from_quaternion(q)
+    else:
+        final_theta = None
 
-# reduz ângulo entre -pi e pi
-def reduce_angle(angle):
-    while angle > math.pi:
-        angle -= 2*math.pi
-    
-    while angle <= -math.pi:
-        angle += 2*math.pi
-    
-    return angle
+    path_follower = PurePursuit(waypoints, final_theta=final_theta, **path_params)
+    node_transport.loginfo(f"POSITION CONTROL: following path with {len(waypoints)} waypoints")
 
-def position_control():
-    global robot_pose, goal_pose
-    global motion_direction, active_pid
+def publish_cmd_vel():
+    if stamped:
+        cmd_vel_stamped.header.stamp = last_odom_stamp
+        cmd_vel_pub.publish(cmd_vel_stamped)
+    else:
+        cmd_vel_pub.publish(cmd_vel)
 
-    if motion_direction == 1: 
-        robot_pose = front_orientation()
-    
-    elif motion_direction == -1:
-        robot_pose = backward_orientation()
-    
-    dx = goal_pose.x - robot_pose.x 
-    dy = goal_pose.y - robot_pose.y 
+def follow_path():
+    global path_follower
 
-    error_angle = math.atan2(dy,dx)
+    follower = path_follower
+    cmd_vel.linear.x, cmd_vel.angular.z = follower.step(odom_pose.x, odom_pose.y, odom_pose.theta)
 
-    bkward_pose = backward_orientation()
-    backward_orientation_error = reduce_angle(error_angle - bkward_pose.theta)
+    if follower.done:
+        node_transport.loginfo("POSITION CONTROL: path completed")
+        path_follower = None
+        path_completed_pub.publish(True)
 
-    front_pose = front_orientation()
-    front_orientation_error = reduce_angle(error_angle - front_pose.theta)
+# watchdog: para de publicar e zera o comando quando a odometria envelhece
+def odom_is_fresh():
+    global odom_stale
 
-    # print(f" front orientation error:  {front_orientation_error}")
-    # print(f"backeward orientation error:  {backward_orientation_error}")
+    fresh = (last_odom_stamp is not None and
+             (node_transport.now() - last_odom_stamp).to_sec() <= odom_timeout)
 
-    # print(f"goal pose:  x = {goal_pose.x}   y = {goal_pose.y}")
+    if not fresh and not odom_stale:
+        node_transport.logwarn(f"POSITION CONTROL: odometry older than {odom_timeout} s, stopping")
+        cmd_vel.linear.x = 0
+        cmd_vel.angular.z = 0
+        if active_pid:
+            publish_cmd_vel()
 
-    if (abs(front_orientation_error) > abs(backward_orientation_error)) and (motion_direction == 1):
-        motion_direction = -1 
-        robot_pose = backward_orientation()
+    elif fresh and odom_stale and last_odom_stamp is not None:
+        node_transport.loginfo("POSITION CONTROL: odometry back, resuming")
+        controller.angular_pid.reset()
 
-        rospy.loginfo("POSITION CONTROL: Switching to backward orientation")
+    odom_stale = not fresh
+    return fresh
 
+def odom_watchdog_callback(event):
+    odom_is_fresh()
 
-    elif (abs(backward_orientation_error) > abs(front_orientation_error)) and (motion_direction == -1): 
-        motion_direction = 1 
-        robot_pose = front_orientation()
-        
-        rospy.loginfo("POSITION CONTROL: Switching to front orientation")
+def position_control():
+    if not odom_is_fresh():
+        return
 
-    dx = goal_pose.x - robot_pose.x 
-    dy = goal_pose.y - robot_pose.y 
+    start = time.perf_counter()
+    age = node_transport.get_time() - last_odom_stamp.to_sec()
 
-    rospy.loginfo(f"POSITION: goal x = {goal_pose.x}  |  goal y = {goal_pose.y}")
+    if path_follower is not None:
+        follow_path()
+    else:
+        follow_goal()
 
-    error_angle = math.atan2(dy,dx)
+    # mede so a lei de controle: o publish abaixo nao entra no tempo do estagio
+    trace.record(time.perf_counter() - start, age)
 
-    orientation_error = reduce_angle(error_angle - robot_pose.theta)
+    if (active_pid):
+        publish_cmd_vel()
 
-    # # mapea a velocidade linear em função do erro de orientação, 
-    # # se o erro for máximo -> vel_linear mínima
-    # # sem o erro for mínimo -> vel_linear máxima
+def follow_goal():
+    motion_direction = controller.motion_direction
 
-    rospy.loginfo(f"POSITION CONTROL: error dx = {dx}  |  error dy{dy}\n")
+    cmd_vel.linear.x, cmd_vel.angular.z = controller.step(
+        odom_pose.x, odom_pose.y, odom_pose.theta, goal_pose.x, goal_pose.y)
 
-    rospy.loginfo(f"POSITION CONTROL: output velocidade linear = {cmd_vel.linear.x}  |  angular = {cmd_vel.angular.z}")
+    if controller.motion_direction != motion_direction:
+        if controller.motion_direction == BACKWARD:
+            node_transport.loginfo("POSITION CONTROL: Switching to backward orientation")
+        else:
+            node_transport.loginfo("POSITION CONTROL: Switching to front orientation")
 
-    cmd_vel.linear.x = ((1-abs(orientation_error)/math.pi)*(MAX_VEL - MIN_VEL) + MIN_VEL) * motion_direction
-    cmd_vel.angular.z = angular_vel.output(KP_ANGULAR, KI_ANGULAR, KD_ANGULAR, orientation_error)
+    node_transport.loginfo_throttle(LOG_PERIOD, "POSITION: goal x = %f  |  goal y = %f", goal_pose.x, goal_pose.y)
+    node_transport.loginfo_throttle(LOG_PERIOD, "POSITION CONTROL: output velocidade linear = %f  |  angular = %f",
+                                    cmd_vel.linear.x, cmd_vel.angular.z)
 
     # if (math.hypot(dx, dy) < 0.1): 
     #     cmd_vel.linear.x = 0
@@ -234,27 +201,68 @@ def position_control():
     #     cmd_vel_pub.publish(cmd_vel)
     #     active_pid = False    
 
-    if (active_pid):
+    # print(f"VEL LINEAR = {cmd_vel.linear.x}") 
+    # print(f"VEL ANGULAR = {cmd_vel.angular.z}")
 
-        # print(f"VEL LINEAR = {cmd_vel.linear.x}") 
-        # print(f"VEL ANGULAR = {cmd_vel.angular.z}")
-        cmd_vel_pub.publish(cmd_vel)
+def setup(transport=ROS):
+    global node_transport, cmd_vel_pub, path_completed_pub, control_mode, odom_timeout, path_params, watchdog_timer, stamped
+    global diagnostics, loop_rate, timing
+
+    node_transport = transport
+    # PID angular no tempo do transporte (tempo ROS, o do fluxo no replay)
+    controller.angular_pid.clock = transport.get_time
+
+    # o safe_twist tem que assinar a fonte navigation com stamped: true
+    stamped = transport.get_param("~stamped", False)
+    cmd_vel_pub = transport.Publisher('/cmd_vel/navigation', TwistStamped if stamped else Twist, queue_size = 10)
+
+    control_mode = transport.get_param("~mode", "timer")
+    odom_timeout = transport.get_param("~odom_timeout", ODOM_TIMEOUT)
+
+    path_params = {
+        "lookahead": transport.get_param("~lookahead", LOOKAHEAD),
+        "max_vel": transport.get_param("~max_vel", MAX_VEL),
+        "max_accel": transport.get_param("~max_accel", MAX_ACCEL),
+        "max_lateral_accel": transport.get_param("~max_lateral_accel", MAX_LATERAL_ACCEL),
+    }
+    path_completed_pub = transport.Publisher('/navigation/path/completed', Bool, queue_size = 1)
+
+    trace.budget = transport.get_param("~latency_budget", None)
+    diagnostics = DiagnosticsPublisher(transport, transport.get_param("~diagnostics_period", DIAGNOSTICS_PERIOD))
+    diagnostics.add_trace(trace)
+
+    # antes dos subscribers: o odom_callback ja usa o timing
+    if control_mode == "odom":
+        timing = diagnostics.add_loop("odom callback", 1.0 / LOOP_RATE, periodic=False)
+    else:
+        loop_rate = MonitoredRate(LOOP_RATE, diagnostics, "timer loop")
+        timing = loop_rate.stats
+
+    # rospy.Subscriber("/control/on",Bool,turn_on_controller_callback)
+
+    transport.Subscriber("/odom", Odometry, odom_callback)
+    transport.Subscriber("/goal_manager/goal/current", PoseStamped, setpoint_callback)
+    transport.Subscriber("/goal_manager/path", Path, path_callback)
+    transport.Subscriber("/navigation/on",Bool, turn_on_pid_callback)
+
+    if control_mode == "odom":
+        watchdog_timer = transport.Timer(odom_timeout / 2, odom_watchdog_callback)
+
+# modo timer: controle a 50 Hz (no modo odom o controle roda nos callbacks)
+def loop():
+    while not node_transport.is_shutdown():
+        position_control()
+        loop_rate.sleep()
 
 if __name__ == '__main__':
     try:
         rospy.init_node('position_controller', anonymous=True)
-        rate = rospy.Rate(50)
+        setup()
 
-        # rospy.Subscriber("/control/on",Bool,turn_on_controller_callback)
+        if control_mode == "odom":
+            rospy.spin()
+        else:
+            loop()
 
-        rospy.Subscriber("/odom", Odometry, odom_callback)
-        rospy.Subscriber("/goal_manager/goal/current", PoseStamped, setpoint_callback)
-        rospy.Subscriber("/navigation/on",Bool, turn_on_pid_callback)
-        
-        while not rospy.is_shutdown():
-            position_control()
-            rate.sleep()
-
-    
     except rospy.ROSInterruptException:
         pass
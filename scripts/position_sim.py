@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# Simulador em malha fechada do position_control, sem ROS e mais rapido que
+# o tempo real.
+#
+# Cada episodio sorteia uma pose inicial e um goal, roda a lei de controle do
+# control_law.py contra uma planta diferencial (saturacao e atraso das rodas)
+# e mede o tempo ate o robo chegar ao goal. Serve como teste de regressao de
+# convergencia no CI:
+#
+#   rosrun fred_move_base position_sim.py --episodes 10000 --max-mean-time 6 --max-failures 0
+
+import argparse
+import math
+import random
+import sys
+import time
+
+from control_law import PositionController
+from odometry import WHEELTRACK, arc_step
+
+DT = 0.02                   # periodo do loop de controle (50 Hz)
+EPISODE_TIMEOUT = 20.0      # segundos maximos por episodio
+GOAL_TOLERANCE = 0.1        # metros para considerar o goal alcancado
+MAX_WHEEL_SPEED = 2.5       # m/s de cada roda
+MOTOR_TIME_CONSTANT = 0.05  # s, atraso de primeira ordem das rodas
+MIN_GOAL_DISTANCE = 0.5
+MAX_GOAL_DISTANCE = 5.0
+
+
+class DiffDrivePlant:
+    """Differential-drive robot driven by (linear, angular) commands, with
+    saturated first-order wheel dynamics."""
+
+    def __init__(self, wheeltrack=WHEELTRACK, max_wheel_speed=MAX_WHEEL_SPEED,
+                 motor_time_constant=MOTOR_TIME_CONSTANT):
+        self.wheeltrack = wheeltrack
+        self.max_wheel_speed = max_wheel_speed
+        self.motor_time_constant = motor_time_constant
+        self.reset()
+
+    def reset(self, x=0.0, y=0.0, th=0.0):
+        self.x = x
+        self.y = y
+        self.th = th
+        self.left_speed = 0.0
+        self.right_speed = 0.0
+
+    def step(self, linear, angular, dt):
+        half_track = 0.5 * self.wheeltrack
+        limit = self.max_wheel_speed
+
+        left_cmd = min(max(linear - angular * half_track, -limit), limit)
+        right_cmd = min(max(linear + angular * half_track, -limit), limit)
+
+        alpha = dt / (self.motor_time_constant + dt)
+        self.left_speed += alpha * (left_cmd - self.left_speed)
+        self.right_speed += alpha * (right_cmd - self.right_speed)
+
+        dc = 0.5 * (self.left_speed + self.right_speed) * dt
+        dth = (self.right_speed - self.left_speed) * dt / self.wheeltrack
+        self.x, self.y, self.th = arc_step(self.x, self.y, self.th, dc, dth)
+
+
+def run_episode(controller, plant, start, goal, dt=DT, timeout=EPISODE_TIMEOUT,
+                goal_tolerance=GOAL_TOLERANCE):
+    """Drive ``plant`` from ``start`` to ``goal``; return the convergence
+    time in seconds, or None on timeout."""
+    controller.reset()
+    plant.reset(*start)
+    goal_x, goal_y = goal
+
+    for k in range(int(round(timeout / dt))):
+        if math.hypot(goal_x - plant.x, goal_y - plant.y) < goal_tolerance:
+            return k * dt
+
+        linear, angular = controller.step(plant.x, plant.y, plant.th, goal_x, goal_y, dt=dt)
+        plant.step(linear, angular, dt)
+
+    return None
+
+
+def random_episode(rng, min_distance=MIN_GOAL_DISTANCE, max_distance=MAX_GOAL_DISTANCE):
+    start = (rng.uniform(-5, 5), rng.uniform(-5, 5), rng.uniform(-math.pi, math.pi))
+    distance = rng.uniform(min_distance, max_distance)
+    bearing = rng.uniform(-math.pi, math.pi)
+    goal = (start[0] + distance * math.cos(bearing), start[1] + distance * math.sin(bearing))
+    return start, goal
+
+
+def run(episodes, seed=0, dt=DT, timeout=EPISODE_TIMEOUT, controller=None, plant=None):
+    """Run ``episodes`` random goal approaches; return the list of
+    convergence times (None for failures)."""
+    rng = random.Random(seed)
+    controller = controller if controller is not None else PositionController()
+    plant = plant if plant is not None else DiffDrivePlant()
+
+    return [run_episode(controller, plant, *random_episode(rng), dt=dt, timeout=timeout)
+            for _ in range(episodes)]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Closed-loop position_control simulation")
+    parser.add_argument("--episodes", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dt", type=float, default=DT)
+    parser.add_argument("--timeout", type=float, default=EPISODE_TIMEOUT, help="seconds per episode")
+    parser.add_argument("--max-mean-time", type=float, help="fail if the mean convergence time is above this")
+    parser.add_argument("--max-failures", type=int, help="fail if more episodes than this time out")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run(args.episodes, seed=args.seed, dt=args.dt, timeout=args.timeout)
+    elapsed = time.perf_counter() - start
+
+    times = sorted(t for t in results if t is not None)
+    failures = len(results) - len(times)
+    mean_time = sum(times) / len(times) if times else float("inf")
+
+    print(f"{args.episodes} episodes in {elapsed:.2f} s ({args.episodes / elapsed * 60:.0f} episodes/min)")
+    print(f"failures: {failures}")
+    if times:
+        print(f"convergence time [s]: mean {mean_time:.3f} | p50 {percentile(times, 0.5):.3f} | "
+              f"p95 {percentile(times, 0.95):.3f} | max {times[-1]:.3f}")
+
+    ok = True
+    if args.max_mean_time is not None and mean_time > args.max_mean_time:
+        print(f"REGRESSION: mean convergence time {mean_time:.3f} s > {args.max_mean_time} s")
+        ok = False
+    if args.max_failures is not None and failures > args.max_failures:
+        print(f"REGRESSION: {failures} failures > {args.max_failures}")
+        ok = False
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
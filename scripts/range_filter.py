@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Filtro de leituras de sensores de distancia, sem ROS.
+#
+# Cada sensor guarda as ultimas leituras com o instante de chegada. A leitura
+# entregue ao safe_twist é a mediana das leituras validas recentes, entao um
+# eco espurio isolado nao dispara uma parada. Antes da mediana, um salto para
+# longe maior que ``max_jump`` so entra quando a leitura seguinte confirma:
+# um eco perdido nao esconde um obstaculo que ja estava na frente. Saltos
+# para perto entram sempre. Um sensor que para de publicar passa a reportar
+# "obstaculo presente" depois de ``max_age`` segundos.
+
+from collections import deque
+
+WINDOW = 5              # leituras usadas na mediana
+MAX_AGE = 0.5           # segundos sem leitura nova para considerar o sensor morto
+MIN_RANGE = 0.02        # metros, abaixo disso a leitura é invalida
+MAX_RANGE = 5.0         # metros, acima disso a leitura é saturada em MAX_RANGE
+STALE_RANGE = 0.0       # distancia reportada por um sensor sem leituras recentes
+MAX_JUMP = 1.0          # metros que uma leitura pode se afastar da anterior sem confirmacao
+
+
+class RangeFilter:
+    """Ring buffer of timestamped range readings with median filtering and
+    a freshness deadline.
+
+    Readings below ``min_range`` or NaN are dropped as invalid;
+    readings above ``max_range`` are saturated. A reading more than
+    ``max_jump`` farther than the last accepted one is held back as an
+    outlier and only accepted when the next reading lands within
+    ``max_jump`` of it; ``rejected`` counts the dropped readings.
+    ``value(now)`` returns the
+    median of the buffered readings, or ``stale_range`` (obstacle present)
+    when no reading arrived in the last ``max_age`` seconds, including
+    before the first one.
+
+    ``add`` (callback thread) is the only writer of the buffer; it then
+    swaps in an immutable ``(readings, stamp)`` snapshot, which is all that
+    ``value`` (main loop) reads.
+    """
+
+    __slots__ = ("readings", "last_stamp", "snapshot", "max_age", "min_range", "max_range",
+                 "stale_range", "max_jump", "outlier", "rejected")
+
+    def __init__(self, window=WINDOW, max_age=MAX_AGE, min_range=MIN_RANGE,
+                 max_range=MAX_RANGE, stale_range=STALE_RANGE, max_jump=MAX_JUMP):
+        self.readings = deque(maxlen=window)
+        self.last_stamp = None
+        self.snapshot = ((), None)
+        self.max_age = max_age
+        self.min_range = min_range
+        self.max_range = max_range
+        self.stale_range = stale_range
+        self.max_jump = max_jump
+        self.outlier = None     # salto para longe esperando confirmacao
+        self.rejected = 0
+
+    def add(self, distance, stamp):
+        # NaN falha nas duas comparacoes e é descartado junto com as invalidas
+        if not distance >= self.min_range:
+            self.rejected += 1
+            return False
+
+        distance = min(distance, self.max_range)
+
+        # sensor voltando depois de morto: descarta as leituras antigas
+        if self.last_stamp is not None and stamp - self.last_stamp > self.max_age:
+            self.readings.clear()
+            self.outlier = None
+
+        # salto para longe: segura ate a proxima leitura confirmar
+        readings = self.readings
+        if readings and distance - readings[-1] > self.max_jump:
+            outlier = self.outlier
+            self.outlier = distance
+            if outlier is None or abs(distance - outlier) > self.max_jump:
+                self.rejected += 1
+                return False
+        self.outlier = None
+
+        readings.append(distance)
+        self.last_stamp = stamp
+        self.snapshot = (tuple(self.readings), stamp)
+        return True
+
+    def is_fresh(self, now, stamp=None):
+        if stamp is None:
+            stamp = self.snapshot[1]
+        return stamp is not None and now - stamp <= self.max_age
+
+    def value(self, now):
+        readings, stamp = self.snapshot
+        if not self.is_fresh(now, stamp):
+            return self.stale_range
+
+        readings = sorted(readings)
+        n = len(readings)
+        middle = n // 2
+        if n % 2:
+            return readings[middle]
+        return 0.5 * (readings[middle - 1] + readings[middle])
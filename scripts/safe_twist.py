@@ -1,187 +1,247 @@
 #!/usr/bin/env python3
 
-import rospy 
+import math
+import time
+from functools import partial
+
+import rospy
 from std_msgs.msg import Int16, Bool, Float32
-from geometry_msgs.msg import Twist
+from geometry_msgs.msg import Twist, TwistStamped
 from nav_msgs.msg import Odometry
 
-robot_vel = Twist()
-cmd_vel = Twist()
-
-robot_blockage = False 
-blockage_frag = False
-blockage_previous_frag = False
-
-abort_command = True    # the robot starts blocked
-abort_flag = False
-abort_previous_flag = False
-
-left_detection = 500    # max reading 
-right_detection = 500
-back_detection = 500
-
-ROBOT_STOPED_SPEED = 0.3
-K_VEL = 1.5
-k_vel = K_VEL
-
-ultrasonic_measurements = []
-
-# ------ publishers 
-safe_cmd_vel_pub = rospy.Publisher('/cmd_vel/safe', Twist, queue_size=10)
-safety_stop_pub = rospy.Publisher('/safety/emergency/stop', Bool, queue_size=10)
-safety_distance_pub = rospy.Publisher('/safety/abort/distance', Bool, queue_size=10)
-
-MIN_DIST_CLEARANCE = 80      # distance in centimeters 
-
-MOTOR_BRAKE_FACTOR = -1
-
-MAX_LINEAR_SPEED = 2
-MAX_ANGULAR_SPEED = 20
-
-def abort_callback(abort_msg): 
-    global abort_command, abort_flag, abort_previous_flag
-
-    abort_flag = abort_msg.data
-
-    if (abort_flag and not abort_previous_flag):
-        abort_command = not abort_command
-    
-    abort_previous_flag = abort_flag
+from edge_detector import OnChange
+from latency_trace import StageTrace
+from node_diagnostics import DiagnosticsPublisher, DIAGNOSTICS_PERIOD, OK, ERROR
+from range_filter import RangeFilter, WINDOW, MAX_AGE, MAX_JUMP
+from safety_pipeline import SafetyPipeline, MAX_LINEAR_SPEED, MAX_ANGULAR_SPEED
+from speed_governor import SpeedGovernor, SensorGeometry, MIN_TIME_TO_COLLISION, MAX_BRAKING_DECEL
+from velocity_profiler import (VelocityProfiler, MAX_LINEAR_ACCEL, MAX_LINEAR_JERK,
+                               MAX_ANGULAR_ACCEL, MAX_ANGULAR_JERK,
+                               EMERGENCY_LINEAR_DECEL, EMERGENCY_ANGULAR_DECEL)
+from transport import ROS
+from twist_mux import TwistMux, SOURCES, LOCKS
+
+safe_cmd_vel = Twist()
+# ~publish_stamped: copia em /cmd_vel/safe/stamped com o carimbo de origem do comando
+safe_cmd_vel_stamped = TwistStamped()
+safe_cmd_vel_stamped.twist = safe_cmd_vel
+
+# topico, escala para metros e geometria (x, y [m] no base_link, yaw [rad]) de cada sensor
+RANGE_SENSORS = {
+    "left":  {"topic": "sensor/range/ultrasonic/left",  "scale": 0.01, "x": 0.25,  "y": 0.15,  "yaw": 0.0},
+    "right": {"topic": "sensor/range/ultrasonic/right", "scale": 0.01, "x": 0.25,  "y": -0.15, "yaw": 0.0},
+    "back":  {"topic": "sensor/range/ultrasonic/back",  "scale": 0.01, "x": -0.25, "y": 0.0,   "yaw": math.pi},
+}
+
+# estado compartilhado entre callbacks e loop (snapshots imutaveis); criado no main
+pipeline = None
+
+# ------ transporte e publishers (criados no setup)
+node_transport = None
+safe_cmd_vel_pub = None
+safe_cmd_vel_stamped_pub = None
+# estados de seguranca: latched e publicados so quando mudam
+safety_stop_state = None
+safety_distance_state = None
+safety_manual_state = None
+
+MIN_DIST_CLEARANCE = 80      # distance in centimeters
+RANGE_WARN_PERIOD = 5.0      # segundos entre avisos de sensor de distancia mudo
+
+LOOP_PERIOD = 1.0 / 50       # segundos entre ciclos sem comando novo
+
+# latencia: tempo do passo e idade do comando ao publicar (desde os ticks com
+# fontes stamped, senao desde a chegada ao safe_twist)
+trace = StageTrace("safe_twist")
+diagnostics = None
+timing = None
+traced = None       # ultimo comando com idade registrada
+
+def abort_callback(abort_msg):
+    pipeline.on_abort(bool(abort_msg.data))
 
     # rospy.loginfo("BOTAO DE ABORT PRESSIONADO\n")
 
-def leftUltrasonic_callback(sensor_msg): 
-    global left_detection
-
-    left_detection = sensor_msg.data
-
-def rightUltrasonic_callback(sensor_msg):
-    global right_detection 
-
-    right_detection = sensor_msg.data
-
-def backUltrasonic_callback(sensor_msg):
-    global back_detection
-
-    back_detection = sensor_msg.data
-
-def odom_callback(odom_msg): 
-    global robot_vel
-
-    robot_vel.linear.x = odom_msg.twist.twist.linear.x
-    robot_vel.angular.z = odom_msg.twist.twist.angular.z
-
-def cmdVel_callback(vel_msg):
-    global cmd_vel, k_vel 
-
-    cmd_vel = vel_msg
-    
-    #add rampa 
-
-    robot_not_moving = abs(robot_vel.linear.x) < ROBOT_STOPED_SPEED 
-    
-    # if robot not moving add ramp else dont 
-    # if( robot_not_moving ):
-    #    cmd_vel.linear.x =    robot_vel.linear.x +  k_vel
-
-
-    if abort_command or in_danger_zone: 
-        cmd_vel.linear.x = 0
-        cmd_vel.angular.z = 0 
-
-    # if cmd_vel.linear.x == 0:
-    #     k_vel = 0 
-    # else:
-    #     k_vel = K_VEL
-
-    print(f"SAFE_TWIST: robot mov :{robot_not_moving}, vel:  {robot_vel.linear.x} : {cmd_vel.linear.x}")
+def range_callback(name, scale, sensor_msg):
+    pipeline.on_range(name, sensor_msg.data * scale, node_transport.get_time())
+
+def odom_callback(odom_msg):
+    pipeline.on_odometry(odom_msg.twist.twist.linear.x, odom_msg.twist.twist.angular.z)
+
+def source_callback(name, vel_msg):
+    # so troca o comando da fonte e acorda o loop, que publica na hora
+    pipeline.on_command(name, vel_msg.linear.x, vel_msg.angular.z, node_transport.get_time())
+    timing.enqueue()
+
+def stamped_source_callback(name, vel_msg):
+    stamp = vel_msg.header.stamp
+    origin = None if stamp.is_zero() else stamp.to_sec()
+    pipeline.on_command(name, vel_msg.twist.linear.x, vel_msg.twist.angular.z, node_transport.get_time(), origin)
+    timing.enqueue()
+
+def lock_callback(name, lock_msg):
+    pipeline.on_lock(name, lock_msg.data, node_transport.get_time())
+
+# sensor sem leitura conta como obstaculo: avisa alto enquanto algum nao publica
+def range_sensors_status():
+    now = node_transport.get_time()
+    values = []
+    silent = []
+    for name, range_filter in pipeline.range_filters.items():
+        stamp = range_filter.snapshot[1]
+        if stamp is None:
+            silent.append(name)
+            state = "nunca publicou"
+        elif not range_filter.is_fresh(now, stamp):
+            silent.append(name)
+            state = f"mudo ha {now - stamp:.1f} s"
+        else:
+            state = "ok"
+        values.append((name, state))
+        values.append((f"{name}_rejected", str(range_filter.rejected)))
+
+    if silent:
+        message = f"sem leitura (bloqueando como obstaculo): {', '.join(silent)}"
+        node_transport.logwarn_throttle(RANGE_WARN_PERIOD, f"SAFE TWIST: sensores de distancia {message}")
+        return ERROR, message, values
+    return OK, "", values
+
+def setup(transport=ROS):
+    global node_transport, pipeline, safe_cmd_vel_pub, safe_cmd_vel_stamped_pub, diagnostics, timing
+    global safety_stop_state, safety_distance_state, safety_manual_state
+
+    node_transport = transport
+
+    safe_cmd_vel_pub = transport.Publisher('/cmd_vel/safe', Twist, queue_size=10)
+    if transport.get_param("~publish_stamped", False):
+        safe_cmd_vel_stamped_pub = transport.Publisher('/cmd_vel/safe/stamped', TwistStamped, queue_size=10)
+    safety_stop_state = OnChange(transport.Publisher('/safety/emergency/stop', Bool, queue_size=1, latch=True).publish)
+    safety_distance_state = OnChange(transport.Publisher('/safety/abort/distance', Bool, queue_size=1, latch=True).publish)
+    safety_manual_state = OnChange(transport.Publisher('/safety/abort/manual', Bool, queue_size=1, latch=True).publish)
+
+    # teleop acima da navegacao; cada fonte expira se parar de publicar
+    sources = transport.get_param("~sources", SOURCES)
+    locks = transport.get_param("~locks", LOCKS)
+
+    # limites de aceleração/jerk e desaceleração de emergência (abort / zona de perigo)
+    profiler = VelocityProfiler(
+        max_linear_accel=transport.get_param("~max_linear_accel", MAX_LINEAR_ACCEL),
+        max_linear_jerk=transport.get_param("~max_linear_jerk", MAX_LINEAR_JERK),
+        max_angular_accel=transport.get_param("~max_angular_accel", MAX_ANGULAR_ACCEL),
+        max_angular_jerk=transport.get_param("~max_angular_jerk", MAX_ANGULAR_JERK),
+        emergency_linear_decel=transport.get_param("~emergency_linear_decel", EMERGENCY_LINEAR_DECEL),
+        emergency_angular_decel=transport.get_param("~emergency_angular_decel", EMERGENCY_ANGULAR_DECEL),
+    )
+
+    # ligado por padrao: sem sensores o governador nao limita nada. Um sensor que nunca publica
+    # bloqueia o movimento para o lado dele (e fica ERROR em /diagnostics)
+    range_sensors = transport.get_param("~range_sensors", RANGE_SENSORS) if transport.get_param("~use_ultrasonic", True) else {}
+
+    range_filters = {}
+    sensor_geometry = {}
+    for name, sensor in range_sensors.items():
+        range_filters[name] = RangeFilter(
+            window=sensor.get("window", WINDOW),
+            max_age=sensor.get("max_age", MAX_AGE),
+            max_jump=sensor.get("max_jump", MAX_JUMP),
+        )
+        sensor_geometry[name] = SensorGeometry(sensor["x"], sensor["y"], sensor["yaw"])
+
+    governor = SpeedGovernor(
+        geometry=sensor_geometry,
+        clearance=MIN_DIST_CLEARANCE * 0.01,
+        min_ttc=transport.get_param("~min_time_to_collision", MIN_TIME_TO_COLLISION),
+        max_decel=transport.get_param("~max_braking_decel", MAX_BRAKING_DECEL),
+    )
+
+    pipeline = SafetyPipeline(TwistMux(sources, locks), governor, profiler, range_filters,
+                              max_linear=MAX_LINEAR_SPEED, max_angular=MAX_ANGULAR_SPEED)
+
+    if any(source.get("stamped", False) for source in sources.values()):
+        trace.age_reference = "ticks (fontes stamped) / receipt"
+    else:
+        trace.age_reference = "receipt"
+    trace.budget = transport.get_param("~latency_budget", None)
+    diagnostics = DiagnosticsPublisher(transport, transport.get_param("~diagnostics_period", DIAGNOSTICS_PERIOD))
+    diagnostics.add_trace(trace)
+    if range_filters:
+        diagnostics.add("range sensors", range_sensors_status)
+
+    # ciclos acordados por comando ou pelo periodo (fila: comandos recebidos por ciclo)
+    timing = diagnostics.add_loop("loop", LOOP_PERIOD, periodic=False)
+
+    transport.Subscriber('joy/controler/ps4/break', Int16, abort_callback)
+    transport.Subscriber('odom', Odometry, odom_callback)
+
+    for name, sensor in range_sensors.items():
+        transport.Subscriber(sensor["topic"], Float32, partial(range_callback, name, sensor.get("scale", 1.0)))
+
+    # stamped: true -> a fonte publica TwistStamped (ex.: position_control com ~stamped)
+    for name, source in sources.items():
+        if source.get("stamped", False):
+            transport.Subscriber(source["topic"], TwistStamped, partial(stamped_source_callback, name))
+        else:
+            transport.Subscriber(source["topic"], Twist, partial(source_callback, name))
+
+    for name, lock in locks.items():
+        transport.Subscriber(lock["topic"], Bool, partial(lock_callback, name))
+
+# um ciclo: pipeline, /cmd_vel/safe e estados de seguranca; devolve o instante do ciclo
+def loop_step():
+    global traced
+
+    start = time.perf_counter()
+    now = node_transport.get_time()
+    output = pipeline.step(now)
+
+    # so esta thread escreve e publica a mensagem de saida
+    safe_cmd_vel.linear.x = output.linear
+    safe_cmd_vel.angular.z = output.angular
+
+    # idade so na primeira publicacao de cada comando (os ciclos seguintes so repetem)
+    command = output.command
+    if command is not None and command is not traced:
+        traced = command
+        origin = command.origin if command.origin is not None else command.stamp
+        trace.record(time.perf_counter() - start, now - origin)
+    else:
+        trace.record(time.perf_counter() - start)
+
+    safe_cmd_vel_pub.publish(safe_cmd_vel)
+
+    if safe_cmd_vel_stamped_pub is not None:
+        origin = command.origin if command is not None else None
+        safe_cmd_vel_stamped.header.stamp = node_transport.from_sec(origin if origin is not None else now)
+        safe_cmd_vel_stamped_pub.publish(safe_cmd_vel_stamped)
+
+    safety_stop_state.update(output.emergency)
+    safety_distance_state.update(output.in_danger_zone)
+    safety_manual_state.update(pipeline.abort.command)
+    return now
+
+def loop():
+    next_tick = node_transport.get_time() + LOOP_PERIOD
+
+    while not node_transport.is_shutdown():
+
+        # acorda com um comando novo ou no periodo do loop (rampa e watchdog das fontes)
+        timeout = max(0.0, next_tick - node_transport.get_time())
+        deadline = time.perf_counter() + timeout
+        woken = pipeline.wait(timeout)
+
+        # jitter so nos despertares pelo periodo; um comando acorda antes do prazo
+        timing.wake(time.perf_counter(), None if woken else deadline)
+        diagnostics.profiler.poll()
+
+        now = loop_step()
+        timing.done(time.perf_counter())
+
+        if now >= next_tick:
+            next_tick += LOOP_PERIOD
+            if next_tick < now:
+                next_tick = now + LOOP_PERIOD
 
 if __name__ == '__main__':
     rospy.init_node('cmd_vel_safe')
-    rate = rospy.Rate(50)
-
-    rospy.Subscriber("/cmd_vel", Twist, cmdVel_callback)
-    rospy.Subscriber('joy/controler/ps4/break', Int16, abort_callback)
-    rospy.Subscriber('odom', Odometry, odom_callback)
-
-    # rospy.Subscriber('sensor/range/ultrasonic/left', Float32, leftUltrasonic_callback)
-    # rospy.Subscriber('sensor/range/ultrasonic/right', Float32, rightUltrasonic_callback)
-    # rospy.Subscriber('sensor/range/ultrasonic/back', Float32, backUltrasonic_callback)
-    
-    while not rospy.is_shutdown():
-        
-        smallest_measurement = 500
-
-        in_danger_zone = False 
-        in_safe_zone = True   
-
-        robot_safety = not abort_command
-
-        ultrasonic_measurements = [left_detection, right_detection, back_detection]
-
-        for i in range(0,2):
-            if(ultrasonic_measurements[i] < smallest_measurement):
-                smallest_measurement = ultrasonic_measurements[i]
-
-        braking_factor = smallest_measurement/(2*MIN_DIST_CLEARANCE)
-
-        if braking_factor > 1:
-            braking_factor = 1
-        
-        if braking_factor < 0.5:
-            braking_factor = 0 
-
-        if (
-            left_detection < MIN_DIST_CLEARANCE     or
-            right_detection < MIN_DIST_CLEARANCE    or 
-            back_detection < MIN_DIST_CLEARANCE 
-        ):
-        
-            in_danger_zone = True
-
-        in_safe_zone = not in_danger_zone
-
-        # rospy.loginfo(f"SAFE TWIST: Ultrassom -> esquerda: {left_detection} | direita: {right_detection} | back: {back_detection}")
-
-        if robot_safety:
-        
-            if in_danger_zone:
-                cmd_vel.linear.x = robot_vel.linear.x * MOTOR_BRAKE_FACTOR
-                cmd_vel.angular.z = robot_vel.angular.z * MOTOR_BRAKE_FACTOR
-                # rospy.loginfo(f"SAFE TWIST: Robot in the danger zone, obstacle ahead!")
-
-            if in_safe_zone:
-                braking_factor = 1
-
-                cmd_vel.linear.x = cmd_vel.linear.x * braking_factor
-                cmd_vel.angular.z = cmd_vel.angular.z * braking_factor
-                # rospy.loginfo(f"SAFE TWIST: Robot in the safety zone")
-
-        if abort_command:
-
-            
-            cmd_vel.linear.x = 0
-            cmd_vel.angular.z = 0
-
-            # cmd_vel.linear.x = robot_vel.linear.x * MOTOR_BRAKE_FACTOR
-            # cmd_vel.angular.z = robot_vel.angular.z * MOTOR_BRAKE_FACTOR
-
-            # rospy.loginfo(f"SAFE TWIST: --------------------- MANUAL SAFETY STOP ---------------------------------")
-
-        if (cmd_vel.linear.x > MAX_LINEAR_SPEED):
-            cmd_vel.linear.x = MAX_LINEAR_SPEED
-    
-        elif(cmd_vel.linear.x < -MAX_LINEAR_SPEED):
-            cmd_vel.linear.x = -MAX_LINEAR_SPEED
-
-        if (cmd_vel.angular.z > MAX_ANGULAR_SPEED):
-            cmd_vel.angular.z = MAX_ANGULAR_SPEED
-        
-        elif(cmd_vel.angular.z < -MAX_ANGULAR_SPEED):
-            cmd_vel.angular.z = -MAX_ANGULAR_SPEED
-
-        safe_cmd_vel_pub.publish(cmd_vel)
-        safety_stop_pub.publish(abort_command or in_danger_zone)
-        safety_distance_pub.publish(in_danger_zone)
-
-        rate.sleep()
+    setup()
+    loop()
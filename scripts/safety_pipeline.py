@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# Estado compartilhado e pipeline de seguranca do safe_twist, sem ROS.
+#
+# Os callbacks (threads do rospy) so trocam tuplas imutaveis; o loop
+# principal le cada tupla uma vez por ciclo e é o unico que roda o
+# governador e a rampa e monta a saida. Nao ha lock entre callbacks e loop
+# e nenhum comando meio atualizado chega ao /cmd_vel/safe.
+
+import threading
+from collections import namedtuple
+
+MAX_LINEAR_SPEED = 2
+MAX_ANGULAR_SPEED = 20
+
+Velocity = namedtuple("Velocity", ["linear", "angular"])
+
+# estado do botao de abort: comando atual e ultimo valor do botao (borda de subida)
+AbortState = namedtuple("AbortState", ["command", "pressed"])
+
+# saida de um ciclo: comando seguro, alvo lido do mux e flags de seguranca;
+# command: Command da fonte selecionada (None: nenhuma), com chegada e origem
+SafeCommand = namedtuple("SafeCommand", ["linear", "angular", "target", "emergency",
+                                         "in_danger_zone", "ranges", "command"])
+
+
+class SafetyPipeline:
+    """Command arbitration, collision governor, abort and velocity ramp of
+    ``safe_twist``, with all shared state exchanged as immutable snapshots.
+
+    The ``on_*`` methods are called from the subscriber threads and only
+    replace tuples (or append to a ``RangeFilter``, which publishes its
+    own snapshot). ``step`` runs in a single thread, reads every snapshot
+    once and is the only writer of the governor and profiler state.
+    ``wait`` blocks the loop until a new command arrives, so commands are
+    still published on arrival without the callbacks running the pipeline.
+    """
+
+    def __init__(self, mux, governor, profiler, range_filters=None,
+                 max_linear=MAX_LINEAR_SPEED, max_angular=MAX_ANGULAR_SPEED):
+        self.mux = mux
+        self.governor = governor
+        self.profiler = profiler
+        self.range_filters = dict(range_filters or {})
+        self.max_linear = max_linear
+        self.max_angular = max_angular
+
+        self.robot_vel = Velocity(0.0, 0.0)
+        self.abort = AbortState(True, False)    # the robot starts blocked
+
+        self.wake = threading.Event()
+        self.last_stamp = None
+        self.output = SafeCommand(0.0, 0.0, None, True, False, {}, None)
+
+    # ------ callbacks (threads do rospy)
+
+    def on_command(self, name, linear, angular, now, origin=None):
+        if self.mux.update(name, linear, angular, now, origin):
+            self.wake.set()
+
+    def on_lock(self, name, locked, now):
+        self.mux.set_lock(name, locked, now)
+        if locked:
+            self.wake.set()
+
+    def on_odometry(self, linear, angular):
+        self.robot_vel = Velocity(linear, angular)
+
+    def on_abort(self, pressed):
+        # um unico callback escreve este estado (um topico, uma thread)
+        state = self.abort
+        command = state.command
+        if pressed and not state.pressed:
+            command = not command
+            self.wake.set()
+        self.abort = AbortState(command, pressed)
+
+    def on_range(self, name, distance, now):
+        self.range_filters[name].add(distance, now)
+
+    # ------ loop principal
+
+    def wait(self, timeout):
+        """Sleep until a command arrives or ``timeout`` seconds pass."""
+        woken = self.wake.wait(timeout)
+        # limpar antes do step: um comando que chega depois ainda acorda o proximo ciclo
+        self.wake.clear()
+        return woken
+
+    def step(self, now):
+        command = self.mux.select(now)
+        robot_vel = self.robot_vel
+        abort_command = self.abort.command
+
+        # mediana das leituras recentes de cada sensor; sensor mudo -> obstaculo presente
+        ranges = {name: f.value(now) for name, f in self.range_filters.items()}
+
+        # nenhuma fonte publicando (no caiu) -> alvo zero
+        target = Velocity(command.linear, command.angular) if command is not None else Velocity(0.0, 0.0)
+
+        # escala continua pelo tempo ate colisao, só com os sensores na direção do movimento
+        linear, angular = self.governor.step(
+            ranges, target.linear, target.angular, robot_vel.linear, robot_vel.angular)
+        in_danger_zone = self.governor.in_danger_zone
+
+        if abort_command:
+            linear = 0.0
+            angular = 0.0
+
+        linear = min(max(linear, -self.max_linear), self.max_linear)
+        angular = min(max(angular, -self.max_angular), self.max_angular)
+
+        dt = now - self.last_stamp if self.last_stamp is not None else 0.0
+        self.last_stamp = now
+
+        emergency = abort_command or in_danger_zone
+        linear, angular = self.profiler.step(linear, angular, dt, emergency=emergency)
+
+        output = SafeCommand(linear, angular, target, emergency, in_danger_zone, ranges, command)
+        self.output = output
+        return output
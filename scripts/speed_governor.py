@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Governador de velocidade por tempo ate colisao, sem ROS.
+#
+# Para cada sensor de distancia calcula a velocidade com que o ponto de
+# montagem do sensor se aproxima do obstaculo (pelo comando e pela odometria)
+# e limita o comando para que o robo ainda consiga parar antes da distancia
+# de seguranca. Sensores que apontam para longe do movimento (o de tras,
+# andando para frente) nao limitam nada.
+
+import math
+from collections import namedtuple
+
+MIN_DIST_CLEARANCE = 0.80   # metros que devem sobrar ate o obstaculo
+MIN_TIME_TO_COLLISION = 1.0 # segundos minimos ate atingir a distancia de seguranca
+MAX_BRAKING_DECEL = 1.5     # m/s^2 que o robo consegue frear
+MAX_SENSOR_RANGE = 5.0      # metros, leituras maiores sao tratadas como livre
+
+# x, y [m] no base_link e direcao [rad] para onde o sensor aponta
+SensorGeometry = namedtuple("SensorGeometry", ["x", "y", "yaw"])
+
+SENSOR_GEOMETRY = {
+    "left": SensorGeometry(0.25, 0.15, 0.0),
+    "right": SensorGeometry(0.25, -0.15, 0.0),
+    "back": SensorGeometry(-0.25, 0.0, math.pi),
+}
+
+
+def closing_speed(geometry, linear, angular):
+    """Speed [m/s] at which the sensor mount point moves along the sensor
+    axis, i.e. towards whatever it sees (negative when moving away)."""
+    vx = linear - angular * geometry.y
+    vy = angular * geometry.x
+    return vx * math.cos(geometry.yaw) + vy * math.sin(geometry.yaw)
+
+
+class SpeedGovernor:
+    """Continuous speed scaling from each sensor's time to collision.
+
+    For a sensor with free distance ``d`` (reading minus clearance), the
+    closing speed is limited to ``min(d / min_ttc, sqrt(2 * decel * d))``
+    and the command is scaled by the smallest allowed/actual ratio over
+    the sensors, so linear and angular motion shrink together and the path
+    curvature is kept. Only a command that closes on a sensor is scaled; the
+    measured velocity just tightens that limit while the robot still moves
+    in faster than commanded. Moving away from an obstacle (an escape from
+    inside the clearance included) is never limited.
+    """
+
+    def __init__(self, geometry=None, clearance=MIN_DIST_CLEARANCE,
+                 min_ttc=MIN_TIME_TO_COLLISION, max_decel=MAX_BRAKING_DECEL,
+                 max_range=MAX_SENSOR_RANGE):
+        self.geometry = dict(geometry if geometry is not None else SENSOR_GEOMETRY)
+        self.clearance = clearance
+        self.min_ttc = min_ttc
+        self.max_decel = max_decel
+        self.max_range = max_range
+
+        self.scale = 1.0
+        self.in_danger_zone = False
+        self.limiting_sensor = None
+
+    def allowed_speed(self, distance):
+        free = min(distance, self.max_range) - self.clearance
+        if free <= 0:
+            return 0.0
+        return min(free / self.min_ttc, math.sqrt(2 * self.max_decel * free))
+
+    def step(self, ranges, linear, angular, measured_linear=0.0, measured_angular=0.0):
+        """Scale the ``(linear, angular)`` command with the sensor ``ranges``
+        (dict name -> metres) and the measured robot velocity."""
+        scale = 1.0
+        in_danger_zone = False
+        limiting_sensor = None
+
+        for name, distance in ranges.items():
+            geometry = self.geometry.get(name)
+            if geometry is None:
+                continue
+
+            commanded = closing_speed(geometry, linear, angular)
+            measured = closing_speed(geometry, measured_linear, measured_angular)
+            if distance < self.clearance and max(commanded, measured) > 0:
+                in_danger_zone = True
+
+            # o comando que se afasta (fuga) passa inteiro, mesmo com o robo ainda derivando para o obstaculo
+            if commanded <= 0:
+                continue
+
+            # a odometria so aperta o limite: robo ainda se aproximando mais rapido que o comando
+            sensor_scale = self.allowed_speed(distance) / max(commanded, measured)
+            if sensor_scale < scale:
+                scale = sensor_scale
+                limiting_sensor = name
+
+        self.scale = scale
+        self.in_danger_zone = in_danger_zone
+        self.limiting_sensor = limiting_sensor
+
+        return linear * scale, angular * scale
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# Curvas do joystick para o joy_esp_interface, sem ROS.
+#
+# O valor do analogico (Int16, -128..127) passa por uma deadzone continua
+# (a saida parte de zero na borda, sem salto) e por uma curva expo, que da
+# mais resolucao em baixa velocidade. As duas etapas sao pre-calculadas em
+# uma tabela de 256 posicoes, entao cada leitura custa um indice de lista.
+
+import math
+from collections import namedtuple
+
+MAX_VALUE_CONTROLER = 127
+LUT_SIZE = 256          # valores possiveis de um eixo de 8 bits
+LUT_OFFSET = 128        # indice da tabela = valor do eixo + LUT_OFFSET
+
+DEADZONE = 20           # valor do eixo abaixo do qual a saida é zero
+LINEAR_EXPO = 0.3       # 0: linear | 1: cubica
+ANGULAR_EXPO = 0.5
+
+# velocidades maximas de cada modo (m/s, rad/s)
+SpeedMode = namedtuple("SpeedMode", ["max_linear", "max_angular"])
+
+SPEED_MODES = {
+    "precise": SpeedMode(0.3, 1.0),
+    "slow": SpeedMode(1.0, 3.0),
+    "normal": SpeedMode(5.0, 10.0),
+}
+SPEED_MODE_ORDER = ("precise", "slow", "normal")
+
+
+def shape(value, deadzone=DEADZONE, expo=LINEAR_EXPO, max_value=MAX_VALUE_CONTROLER):
+    """Stick value -> normalized command in [-1, 1], continuous at the
+    deadzone edge: ``u = (|v| - deadzone) / (max - deadzone)``, then
+    ``(1 - expo) * u + expo * u**3``."""
+    magnitude = abs(value) - deadzone
+    if magnitude <= 0:
+        return 0.0
+
+    u = min(magnitude / (max_value - deadzone), 1.0)
+    return math.copysign((1.0 - expo) * u + expo * u * u * u, value)
+
+
+def build_lut(deadzone=DEADZONE, expo=LINEAR_EXPO, max_value=MAX_VALUE_CONTROLER):
+    """256-entry table of ``shape`` for the stick values -128..127."""
+    return [shape(i - LUT_OFFSET, deadzone, expo, max_value) for i in range(LUT_SIZE)]
+
+
+class TeleopShaper:
+    """Stick values -> ``(linear, angular)`` velocities through per-axis
+    lookup tables and the current speed mode."""
+
+    def __init__(self, deadzone=DEADZONE, linear_expo=LINEAR_EXPO, angular_expo=ANGULAR_EXPO,
+                 modes=None, mode="normal", max_value=MAX_VALUE_CONTROLER):
+        self.linear_lut = build_lut(deadzone, linear_expo, max_value)
+        self.angular_lut = build_lut(deadzone, angular_expo, max_value)
+        self.modes = dict(modes if modes is not None else SPEED_MODES)
+        self.order = [name for name in SPEED_MODE_ORDER if name in self.modes] or list(self.modes)
+        self.set_mode(mode)
+
+    def set_mode(self, name):
+        self.speed = self.modes[name]
+        self.mode = name
+
+    def next_mode(self):
+        index = self.order.index(self.mode) if self.mode in self.order else -1
+        self.set_mode(self.order[(index + 1) % len(self.order)])
+        return self.mode
+
+    def command(self, linear_axis, angular_axis):
+        # eixos fora de -128..127 (Int16) saturam no extremo da tabela
+        i = min(max(int(linear_axis) + LUT_OFFSET, 0), LUT_SIZE - 1)
+        j = min(max(int(angular_axis) + LUT_OFFSET, 0), LUT_SIZE - 1)
+        return (self.linear_lut[i] * self.speed.max_linear,
+                -self.angular_lut[j] * self.speed.max_angular)
@@ -1,157 +1,313 @@
 #!/usr/bin/env python3
 import math
-from math import sin, cos, pi
+import threading
+import time
 
 import rospy
-import tf
 from nav_msgs.msg import Odometry
-from std_msgs.msg import Float32,Bool
+from std_msgs.msg import Float32, Int32, Int64, UInt32
 from sensor_msgs.msg import Imu
-from geometry_msgs.msg import Point, Pose, Quaternion, Twist, Vector3
+from geometry_msgs.msg import TransformStamped
+from std_srvs.srv import Trigger, TriggerResponse
 
-# Parameters
-wheeltrack = 0.3800  # distance between whells
-wheelradius = 0.075  # radius of the wheel in meters
-TPR = 2400*3  # ticks per turn
-left_ticks = 0
-right_ticks = 0
-last_left_ticks = 0
-last_right_ticks = 0
-heading = 0
-reset_odom = False
-
-imu_quaternion = []
-
-# x = 0
-x = 0.0 #consider robot front  not base_link
-y = 0.0
-th = 0.0
-
-vx = 0.0
-vy = 0.0
-vth = 0.0
-
-heading_offset = 0.0 #offset para zerar o mpu 
-
-def reset_callback(msg):
-    global reset_odom
-    reset_odom = msg.data
-
-def leftTicksCallback(msg):
-    global left_ticks
-    left_ticks = msg.data
-
-
-def rightTicksCallback(msg):
-    global right_ticks
-    right_ticks = msg.data
-
-
-def headingCB(msg):
-    global heading
-    global imu_quaternion
-
-    imu_quaternion = msg.orientation
-    heading = tf.transformations.euler_from_quaternion([imu_quaternion.x, imu_quaternion.y, imu_quaternion.z, imu_quaternion.w])[2]
-
-
-rospy.init_node('odometry_publisher')
-
-odom_pub = rospy.Publisher("odom", Odometry, queue_size=50)
-left_ticks_sub = rospy.Subscriber(
-    "power/status/distance/ticks/left", Float32, leftTicksCallback)
-right_ticks_sub = rospy.Subscriber(
-    "power/status/distance/ticks/right", Float32, rightTicksCallback)
-heading_sub = rospy.Subscriber("sensor/orientation/imu", Imu, headingCB)
-
-reset_odom_sub = rospy.Subscriber("/odom/reset",Bool,reset_callback)
-
-current_time = rospy.Time.now()
-last_time = rospy.Time.now()
-
-r = rospy.Rate(50)
-
-while not rospy.is_shutdown():
-    current_time = rospy.Time.now()
-    # print(left_ticks, right_ticks)
-
-    delta_L = left_ticks - last_left_ticks
-    delta_R = right_ticks - last_right_ticks
-    dl = 2 * pi * wheelradius * delta_L / TPR
-    dr = 2 * pi * wheelradius * delta_R / TPR
-    dc = (dl + dr) / 2
-    dt = (current_time - last_time).to_sec()
-    dth = (dr-dl)/wheeltrack
-
-    if dr == dl:
-        dx = dr*cos(th)
-        dy = dr*sin(th)
-
-    else:
-        radius = dc/dth
-
-        iccX = x-radius*sin(th)
-        iccY = y+radius*cos(th)
-
-        dx = cos(dth) * (x-iccX) - sin(dth) * (y-iccY) + iccX - x
-        dy = sin(dth) * (x-iccX) + cos(dth) * (y-iccY) + iccY - y
-
-    x += dx
-    y += dy
-    # th = (th+dth) % (2*pi)
-    th = heading - heading_offset
-
-    if(reset_odom):
-        # x = 0
-        x = 0
-        y = 0
-        #th = 0
-        heading_offset = heading
-
-    odom_quat = tf.transformations.quaternion_from_euler(0, 0, th)
-
-    # compute the odometry relative to the footprint frame
-    odom_quat = tf.transformations.quaternion_from_euler(0, 0, th)
-    odom_broadcaster = tf.TransformBroadcaster()
-    odom_broadcaster.sendTransform(
-        (x, y, 0.),
-        odom_quat,
-        current_time,
-        "base_footprint",
-        "odom"
-    )
-
-    # crate a frame between base_link e base_footprint
-    base_link_quat = tf.transformations.quaternion_from_euler(0, 0, 0)  # no rotation
-    base_link_broadcaster = tf.TransformBroadcaster()
-    base_link_broadcaster.sendTransform(
-        (0, 0, 0.08),  # offset between base_footprint and base_link in meters
-        base_link_quat,
-        current_time,
-        "base_link",
-        "base_footprint"
-    )
+from fred_move_base.srv import SetPose, SetPoseResponse
+from latency_trace import StageTrace
+from node_diagnostics import DiagnosticsPublisher, MonitoredRate, DIAGNOSTICS_PERIOD
+from transport import ROS
 
-    # next, we'll publish the odometry message over ROS
-    odom = Odometry()
-    odom.header.stamp = current_time
-    odom.header.frame_id = "odom"
-
-    odom.pose.pose = Pose(Point(x, y, 0.), Quaternion(*odom_quat))
-
-    if dt > 0:
-        vx = dx/dt
-        vy = dy/dt
-        vth = dth/dt
-
-    odom.child_frame_id = "base_footprint"
-    odom.twist.twist = Twist(Vector3(vx, vy, 0), Vector3(0, 0, vth))
-
-    odom_pub.publish(odom)
-
-    last_left_ticks = left_ticks
-    last_right_ticks = right_ticks
-    last_time = current_time
-    print(f'X:{x} | Y:{y} | Theta:{th}')
-    r.sleep()
+from odometry import DiffDriveOdometry, TickPairer, TickCounter, WHEELTRACK, WHEELRADIUS, TPR, FLOAT32_EXACT
+from odometry_filter import OdometryEKF, WHEEL_NOISE, GYRO_NOISE, IMU_YAW_NOISE
 
+# Parameters
+BASE_LINK_HEIGHT = 0.08     # offset between base_footprint and base_link in meters
+LOOP_RATE = 50              # Hz do modo poll
+LOG_PERIOD = 1.0            # segundos entre logs da pose
+MAX_WHEEL_SPEED = 3.0       # m/s, acima disso o delta de ticks é glitch
+
+# tipo da mensagem de ticks -> (classe, bits do contador no firmware; None: nao da a volta)
+TICK_TYPES = {
+    "float32": (Float32, None),
+    "int32": (Int32, 32),
+    "uint32": (UInt32, 32),
+    "int64": (Int64, 64),
+}
+
+
+def yaw_from_quaternion(q):
+    return math.atan2(2.0 * (q.w * q.z + q.x * q.y), 1.0 - 2.0 * (q.y * q.y + q.z * q.z))
+
+
+class Ticks2Odom:
+    def __init__(self, transport=ROS):
+        self.transport = transport
+
+        # "poll": amostra os ticks a ~rate Hz | "event": publica a cada par de ticks recebido
+        self.mode = transport.get_param("~mode", "poll")
+        self.rate = transport.get_param("~rate", LOOP_RATE)
+        # carimbo da odometria no modo poll: "ticks" (chegada do tick mais novo, ou o ciclo
+        # quando nao chegou tick desde a ultima publicacao) | "loop" (instante do ciclo).
+        # Nos dois publica a cada ciclo: parado e sem ticks a odometria continua fresca.
+        self.stamp_source = transport.get_param("~stamp", "ticks")
+
+        self.left_ticks = 0
+        self.right_ticks = 0
+        self.last_left_ticks = 0
+        self.last_right_ticks = 0
+        self.heading = 0.0
+        self.heading_offset = 0.0 #offset para zerar o mpu
+        self.gyro_rate = None
+        self.tick_stamp = None      # chegada do tick mais novo (segundos, tempo ROS)
+
+        self.x = 0.0 #consider robot front  not base_link
+        self.y = 0.0
+        self.th = 0.0
+
+        # geometria das rodas (wheeltrack, meters_per_tick); a pose fica no EKF,
+        # integrada pelo mesmo odometry.arc_step do DiffDriveOdometry
+        self.odometry = DiffDriveOdometry(
+            transport.get_param("~wheeltrack", WHEELTRACK),
+            transport.get_param("~wheelradius", WHEELRADIUS),
+            transport.get_param("~ticks_per_turn", TPR),
+        )
+        # fusao das rodas com a orientacao e a taxa de giro da IMU
+        self.use_imu_yaw = transport.get_param("~use_imu_yaw", True)
+        self.use_imu_rate = transport.get_param("~use_imu_rate", True)
+        self.ekf = OdometryEKF(
+            self.odometry.wheeltrack,
+            wheel_noise=transport.get_param("~wheel_noise", WHEEL_NOISE),
+            gyro_noise=transport.get_param("~gyro_noise", GYRO_NOISE),
+            yaw_noise=transport.get_param("~imu_yaw_noise", IMU_YAW_NOISE),
+        )
+        self.odom_lock = threading.Lock()
+
+        # contadores do firmware -> total continuo (volta do contador, reboot do ESP, glitches)
+        self.tick_type = transport.get_param("~tick_type", "float32")
+        tick_msg, counter_bits = TICK_TYPES[self.tick_type]
+        counter_bits = transport.get_param("~counter_bits", counter_bits)
+        max_rate = transport.get_param("~max_wheel_speed", MAX_WHEEL_SPEED) / self.odometry.meters_per_tick
+        self.left_counter = TickCounter(counter_bits, max_rate)
+        self.right_counter = TickCounter(counter_bits, max_rate)
+
+        self.tick_pairer = TickPairer(self.tick_pair_callback, transport.get_param("~sync_slop", 0.005))
+
+        # ------ messages (alocadas uma vez e reutilizadas a cada ciclo)
+        self.odom = Odometry()
+        self.odom.header.frame_id = "odom"
+        self.odom.child_frame_id = "base_footprint"
+
+        self.odom_tf = TransformStamped()
+        self.odom_tf.header.frame_id = "odom"
+        self.odom_tf.child_frame_id = "base_footprint"
+
+        # ------ publishers
+        self.odom_pub = transport.Publisher("odom", Odometry, queue_size=50)
+        self.tf_broadcaster = transport.TransformBroadcaster()
+
+        # frame fixo entre base_footprint e base_link, publicado uma unica vez
+        self.static_broadcaster = transport.StaticTransformBroadcaster()
+        base_link_tf = TransformStamped()
+        base_link_tf.header.stamp = transport.now()
+        base_link_tf.header.frame_id = "base_footprint"
+        base_link_tf.child_frame_id = "base_link"
+        base_link_tf.transform.translation.z = BASE_LINK_HEIGHT
+        base_link_tf.transform.rotation.w = 1.0  # no rotation
+        self.static_broadcaster.sendTransform(base_link_tf)
+
+        if self.mode == "event":
+            transport.Subscriber("power/status/distance/ticks/left", tick_msg, self.left_ticks_event_callback)
+            transport.Subscriber("power/status/distance/ticks/right", tick_msg, self.right_ticks_event_callback)
+        else:
+            transport.Subscriber("power/status/distance/ticks/left", tick_msg, self.left_ticks_callback)
+            transport.Subscriber("power/status/distance/ticks/right", tick_msg, self.right_ticks_callback)
+        transport.Subscriber("sensor/orientation/imu", Imu, self.heading_callback)
+
+        self.last_time = transport.now()
+
+        # ------ latencia: idade dos ticks ao publicar e tempo de integracao
+        age_reference = "loop" if self.mode != "event" and self.stamp_source == "loop" else "ticks"
+        self.trace = StageTrace("ticks2odom", age_reference, transport.get_param("~latency_budget", None))
+        self.diagnostics = DiagnosticsPublisher(transport, transport.get_param("~diagnostics_period", DIAGNOSTICS_PERIOD))
+        self.diagnostics.add_trace(self.trace)
+
+        # tempo de cada ciclo do modo poll (fila: ticks recebidos por ciclo) ou de cada par no modo event
+        if self.mode == "event":
+            self.loop_rate = None
+            self.timing = self.diagnostics.add_loop("tick pairs", 1.0 / self.rate, periodic=False)
+        else:
+            self.loop_rate = MonitoredRate(self.rate, self.diagnostics, "poll loop")
+            self.timing = self.loop_rate.stats
+
+        # ------ services
+        transport.Service("/odom/reset", Trigger, self.reset_service)
+        transport.Service("/odom/set_pose", SetPose, self.set_pose_service)
+
+    def set_pose(self, x, y, theta):
+        # tudo sob o lock: nenhum passo de integracao ve metade da pose nova
+        with self.odom_lock:
+            self.heading_offset = self.heading - theta
+            self.ekf.reset(x, y, theta)
+
+            # ticks contados antes do reset nao entram na pose nova
+            self.last_left_ticks = self.left_ticks
+            self.last_right_ticks = self.right_ticks
+
+            self.x = x
+            self.y = y
+            self.th = theta
+
+        self.transport.loginfo("ticks2odom: pose re-semeada em X:%f | Y:%f | Theta:%f", x, y, theta)
+
+    def reset_service(self, req):
+        self.set_pose(0.0, 0.0, 0.0)
+        return TriggerResponse(success=True, message="odometria zerada")
+
+    def set_pose_service(self, req):
+        self.set_pose(req.x, req.y, req.theta)
+        return SetPoseResponse(success=True, message="pose definida")
+
+    def count_ticks(self, counter, raw, stamp):
+        if self.tick_type == "float32" and abs(raw) >= FLOAT32_EXACT:
+            self.transport.logwarn_once("ticks2odom: contador acima de 2^24 em Float32, ticks perdidos; use ~tick_type int32")
+
+        resets, glitches = counter.resets, counter.glitches
+        total = counter.update(raw, stamp)
+
+        if counter.resets != resets:
+            self.transport.logwarn("ticks2odom: contador de ticks reiniciou (reboot do ESP?)")
+        elif counter.glitches != glitches:
+            self.transport.logwarn_throttle(LOG_PERIOD, "ticks2odom: delta de ticks impossivel descartado (%d no total)", counter.glitches)
+        return total
+
+    def left_ticks_callback(self, msg):
+        with self.odom_lock:
+            self.tick_stamp = self.transport.get_time()
+            self.left_ticks = self.count_ticks(self.left_counter, msg.data, self.tick_stamp)
+            self.timing.enqueue()
+
+    def right_ticks_callback(self, msg):
+        with self.odom_lock:
+            self.tick_stamp = self.transport.get_time()
+            self.right_ticks = self.count_ticks(self.right_counter, msg.data, self.tick_stamp)
+            self.timing.enqueue()
+
+    # modo event: integra e publica assim que um par de ticks chega
+    def left_ticks_event_callback(self, msg):
+        with self.odom_lock:
+            stamp = self.transport.get_time()
+            self.tick_pairer.left(self.count_ticks(self.left_counter, msg.data, stamp), stamp)
+
+    def right_ticks_event_callback(self, msg):
+        with self.odom_lock:
+            stamp = self.transport.get_time()
+            self.tick_pairer.right(self.count_ticks(self.right_counter, msg.data, stamp), stamp)
+
+    def flush_ticks_callback(self, event):
+        with self.odom_lock:
+            self.tick_pairer.flush(self.transport.get_time())
+
+    def tick_pair_callback(self, left, right, stamp):
+        self.timing.wake(time.perf_counter())
+        self.left_ticks = left
+        self.right_ticks = right
+        self.publish_odometry(self.transport.from_sec(stamp))
+        self.timing.done(time.perf_counter())
+
+    def heading_callback(self, msg):
+        # covariancia[0] == -1: a IMU nao mede esse campo (REP 145)
+        with self.odom_lock:
+            self.heading = yaw_from_quaternion(msg.orientation)
+
+            if self.use_imu_rate and msg.angular_velocity_covariance[0] != -1:
+                self.gyro_rate = msg.angular_velocity.z
+
+            if self.use_imu_yaw and msg.orientation_covariance[0] != -1:
+                self.ekf.update_yaw(self.heading - self.heading_offset)
+
+    def publish_odometry(self, current_time):
+        start = time.perf_counter()
+        age = self.transport.get_time() - current_time.to_sec()
+
+        left_ticks = self.left_ticks
+        right_ticks = self.right_ticks
+        meters_per_tick = self.odometry.meters_per_tick
+        ekf = self.ekf
+
+        dt = (current_time - self.last_time).to_sec()
+
+        ekf.predict(meters_per_tick * (left_ticks - self.last_left_ticks),
+                    meters_per_tick * (right_ticks - self.last_right_ticks),
+                    dt, self.gyro_rate)
+
+        self.x = ekf.x
+        self.y = ekf.y
+        self.th = ekf.th
+
+        # quaternion de uma rotacao pura em z, calculado uma unica vez
+        qz = math.sin(0.5 * self.th)
+        qw = math.cos(0.5 * self.th)
+
+        # compute the odometry relative to the footprint frame
+        odom_tf = self.odom_tf
+        odom_tf.header.stamp = current_time
+        odom_tf.transform.translation.x = self.x
+        odom_tf.transform.translation.y = self.y
+        odom_tf.transform.rotation.z = qz
+        odom_tf.transform.rotation.w = qw
+        self.tf_broadcaster.sendTransform(odom_tf)
+
+        # next, we'll publish the odometry message over ROS
+        odom = self.odom
+        odom.header.stamp = current_time
+        odom.pose.pose.position.x = self.x
+        odom.pose.pose.position.y = self.y
+        odom.pose.pose.orientation.z = qz
+        odom.pose.pose.orientation.w = qw
+
+        # velocidades no frame do robo (child_frame_id)
+        odom.twist.twist.linear.x = ekf.vx
+        odom.twist.twist.angular.z = ekf.vth
+        odom.pose.covariance, odom.twist.covariance = ekf.covariances()
+
+        # tempo do estagio: integracao do EKF e montagem da mensagem, sem o publish
+        self.trace.record(time.perf_counter() - start, age)
+        self.odom_pub.publish(odom)
+
+        self.last_left_ticks = left_ticks
+        self.last_right_ticks = right_ticks
+        self.last_time = current_time
+
+        self.transport.loginfo_throttle(LOG_PERIOD, 'X:%f | Y:%f | Theta:%f', self.x, self.y, self.th)
+
+    def start(self):
+        # modo event: emite os ticks cujo par nao chegou dentro do sync_slop
+        if self.mode == "event":
+            self.flush_timer = self.transport.Timer(self.tick_pairer.slop, self.flush_ticks_callback)
+
+    # um ciclo do modo poll
+    def loop_step(self):
+        with self.odom_lock:
+            # carimbo dos ticks so com tick novo: o carimbo nunca repete nem volta no tempo
+            if (self.stamp_source == "ticks" and self.tick_stamp is not None and
+                    self.tick_stamp > self.last_time.to_sec()):
+                self.publish_odometry(self.transport.from_sec(self.tick_stamp))
+            else:
+                self.publish_odometry(self.transport.now())
+
+    def loop(self):
+        r = self.loop_rate
+
+        while not self.transport.is_shutdown():
+            self.loop_step()
+            r.sleep()
+
+    def spin(self):
+        self.start()
+        if self.mode == "event":
+            rospy.spin()
+        else:
+            self.loop()
+
+
+if __name__ == '__main__':
+    rospy.init_node('odometry_publisher')
+    Ticks2Odom().spin()
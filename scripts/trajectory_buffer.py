@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# Historico de poses do path_publisher com decimacao, sem ROS.
+
+import math
+import threading
+from collections import deque
+
+# ------ parametros (sobrescritos pelos ~params do path_publisher)
+PATH_CAPACITY = 5000        # numero maximo de poses mantidas no Path
+MIN_DISTANCE = 0.05         # metros percorridos para aceitar uma nova pose
+MIN_ANGLE = 0.10            # radianos girados para aceitar uma nova pose
+MIN_PERIOD = 0.0            # segundos minimos entre duas poses aceitas
+
+
+class TrajectoryBuffer:
+    """Fixed-capacity pose history with distance/angle/time decimation.
+
+    Poses are only stored when the robot moved at least ``min_distance``
+    metres or turned ``min_angle`` radians since the last stored pose, and
+    never faster than ``min_period`` seconds. The oldest poses are dropped
+    once ``capacity`` is reached, so memory and publish cost stay bounded.
+
+    ``append`` and ``clear`` run on subscriber threads and ``snapshot`` on
+    the publish timer; a lock keeps every pose in exactly one snapshot.
+    """
+
+    def __init__(self, capacity=PATH_CAPACITY, min_distance=MIN_DISTANCE,
+                 min_angle=MIN_ANGLE, min_period=MIN_PERIOD):
+        self.poses = deque(maxlen=capacity)
+        self.pending = []
+        self.min_distance = min_distance
+        self.min_angle = min_angle
+        self.min_period = min_period
+        self.dirty = False
+        self.lock = threading.Lock()
+
+        self._last = None   # (x, y, yaw, t) da ultima pose aceita
+
+    def accepts(self, x, y, yaw, t):
+        if self._last is None:
+            return True
+
+        last_x, last_y, last_yaw, last_t = self._last
+
+        if t - last_t < self.min_period:
+            return False
+
+        if math.hypot(x - last_x, y - last_y) >= self.min_distance:
+            return True
+
+        dyaw = math.atan2(math.sin(yaw - last_yaw), math.cos(yaw - last_yaw))
+        return abs(dyaw) >= self.min_angle
+
+    def append(self, pose, x, y, yaw, t):
+        with self.lock:
+            self.poses.append(pose)
+            self.pending.append(pose)
+            self._last = (x, y, yaw, t)
+            self.dirty = True
+
+    def take_pending(self):
+        with self.lock:
+            pending = self.pending
+            self.pending = []
+            return pending
+
+    def snapshot(self):
+        """Return ``(poses, pending)``: a list copy of the history and the
+        poses appended since the last call, or None when nothing changed."""
+        with self.lock:
+            if not self.dirty:
+                return None
+            self.dirty = False
+            pending = self.pending
+            self.pending = []
+            return list(self.poses), pending
+
+    def clear(self):
+        with self.lock:
+            self.poses.clear()
+            self.pending = []
+            self._last = None
+            self.dirty = True
+
+    def __len__(self):
+        return len(self.poses)
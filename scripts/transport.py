@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+# Transporte de mensagens entre os nos do fred_move_base.
+#
+# Cada no cria publishers, subscribers, servicos, clientes de servico, timers e
+# broadcasters de TF, le parametros e tambem o relogio ROS e o log por um
+# transporte.
+# RosTransport é o rospy puro (um processo por no, como nos launch files).
+# InProcessBus liga varios nos no mesmo processo (fred_move_base_composite):
+# a mensagem publicada vai direto para os callbacks locais, sem serializar
+# nem passar por TCPROS, e só é repassada ao ROS quando alguem de fora assina
+# o topico (rqt, rosbag, ...). Topicos sem publisher local (ESP, IMU,
+# joystick) continuam vindo do ROS, assim como os topicos listados como
+# externos, que tambem tem publishers fora do processo. Servicos seguem a
+# mesma ideia: um cliente no processo chama o handler local direto, e o
+# servico continua anunciado no ROS para quem chamar de fora (rosservice,
+# outros nos). O replay offline (benchmarks/replay_transport.py) roda os
+# mesmos nos sobre um transporte com o relogio do fluxo gravado.
+
+from functools import partial
+
+import rospy
+import tf2_ros
+
+
+class RosClock:
+    """ROS time, rate, shutdown flag, TF broadcasters and logging of the
+    transports that run on a live ROS graph."""
+
+    def get_time(self):
+        return rospy.get_time()
+
+    def now(self):
+        return rospy.Time.now()
+
+    def from_sec(self, seconds):
+        return rospy.Time.from_sec(seconds)
+
+    def is_shutdown(self):
+        return rospy.is_shutdown()
+
+    def Rate(self, hz):
+        return rospy.Rate(hz)
+
+    def TransformBroadcaster(self):
+        return tf2_ros.TransformBroadcaster()
+
+    def StaticTransformBroadcaster(self):
+        return tf2_ros.StaticTransformBroadcaster()
+
+    # as funcoes do rospy sem embrulho: throttle e once contam por linha de quem chama
+    loginfo = staticmethod(rospy.loginfo)
+    logwarn = staticmethod(rospy.logwarn)
+    logerr = staticmethod(rospy.logerr)
+    loginfo_throttle = staticmethod(rospy.loginfo_throttle)
+    logwarn_throttle = staticmethod(rospy.logwarn_throttle)
+    logwarn_once = staticmethod(rospy.logwarn_once)
+
+
+class RosTransport(RosClock):
+    """Plain rospy, used by every node started on its own."""
+
+    @property
+    def node_name(self):
+        return rospy.get_name().lstrip("/")
+
+    def Publisher(self, topic, msg_type, **kwargs):
+        return rospy.Publisher(topic, msg_type, **kwargs)
+
+    def Subscriber(self, topic, msg_type, callback, **kwargs):
+        return rospy.Subscriber(topic, msg_type, callback, **kwargs)
+
+    def get_param(self, name, default=None):
+        return rospy.get_param(name, default)
+
+    def Service(self, name, srv_type, handler):
+        return rospy.Service(name, srv_type, handler)
+
+    def ServiceProxy(self, name, srv_type):
+        return rospy.ServiceProxy(name, srv_type)
+
+    def Timer(self, period, callback, oneshot=False):
+        return rospy.Timer(rospy.Duration(period), callback, oneshot=oneshot)
+
+
+ROS = RosTransport()
+
+
+class LocalPublisher:
+    """Publisher of the in-process bus. Like ``rospy.Publisher.publish``,
+    accepts a message or the arguments of the message constructor."""
+
+    __slots__ = ("bus", "topic", "msg_type", "ros_pub", "latch")
+
+    def __init__(self, bus, topic, msg_type, ros_pub, latch):
+        self.bus = bus
+        self.topic = topic
+        self.msg_type = msg_type
+        self.ros_pub = ros_pub
+        self.latch = latch
+
+    def publish(self, *args, **kwargs):
+        if len(args) == 1 and not kwargs and isinstance(args[0], self.msg_type):
+            msg = args[0]
+        else:
+            msg = self.msg_type(*args, **kwargs)
+
+        if self.latch:
+            self.bus.latched[self.topic] = msg
+
+        # observabilidade: serializa só se houver assinante externo (ou latched)
+        if self.latch or self.ros_pub.get_num_connections() > 0:
+            self.ros_pub.publish(msg)
+
+        self.bus.deliver(self.topic, msg)
+
+    def get_num_connections(self):
+        return len(self.bus.callbacks.get(self.topic, ())) + self.ros_pub.get_num_connections()
+
+
+class LocalServiceProxy:
+    """Service client of the in-process bus. Calls the handler of a
+    service hosted in this process directly, without TCPROS; services
+    provided by other processes go through a ``rospy.ServiceProxy``. The
+    service is looked up on every call, so the client may be created
+    before the node that provides it."""
+
+    __slots__ = ("bus", "name", "srv_type", "ros_proxy")
+
+    def __init__(self, bus, name, srv_type):
+        self.bus = bus
+        self.name = name
+        self.srv_type = srv_type
+        self.ros_proxy = rospy.ServiceProxy(name, srv_type)
+
+    def wait_for_service(self, timeout=None):
+        if self.name not in self.bus.services:
+            self.ros_proxy.wait_for_service(timeout)
+
+    def __call__(self, *args, **kwargs):
+        handler = self.bus.services.get(self.name)
+        if handler is None:
+            return self.ros_proxy(*args, **kwargs)
+
+        request_class = self.srv_type._request_class
+        if len(args) == 1 and not kwargs and isinstance(args[0], request_class):
+            request = args[0]
+        else:
+            request = request_class(*args, **kwargs)
+
+        # como no rospy: erro no handler chega ao cliente como ServiceException
+        try:
+            response = handler(request)
+        except Exception as e:
+            raise rospy.ServiceException(f"service [{self.name}] responded with an error: {e!r}")
+        if response is None:
+            raise rospy.ServiceException(f"service [{self.name}] returned no response")
+        return response
+
+
+class InProcessBus:
+    """Topic table shared by the nodes hosted in one process.
+
+    Messages are delivered by direct call in the publisher's thread and
+    the same object is handed to every subscriber, so subscribers must
+    copy what they keep after the callback returns. Call ``connect`` after
+    all nodes are created, to subscribe through ROS the topics that no
+    local node publishes.
+    """
+
+    def __init__(self):
+        self.callbacks = {}     # topico -> [callback]
+        self.types = {}         # topico -> tipo da mensagem
+        self.publishers = {}    # topico -> LocalPublisher
+        self.latched = {}       # topico -> ultima mensagem latched
+        self.services = {}      # servico -> handler
+        self.ros_services = []
+        self.ros_subscribers = []
+
+    def transport(self, node_name):
+        return InProcessTransport(self, node_name)
+
+    def publisher(self, topic, msg_type, latch=False, **kwargs):
+        pub = self.publishers.get(topic)
+        if pub is None:
+            ros_pub = rospy.Publisher(topic, msg_type, latch=latch, **kwargs)
+            pub = self.publishers[topic] = LocalPublisher(self, topic, msg_type, ros_pub, latch)
+        return pub
+
+    def subscribe(self, topic, msg_type, callback):
+        self.callbacks.setdefault(topic, []).append(callback)
+        self.types[topic] = msg_type
+
+        if topic in self.latched:
+            self._call(topic, callback, self.latched[topic])
+
+    def service(self, name, srv_type, handler):
+        # anunciado tambem no ROS: rosservice e nos de fora continuam chamando
+        self.services[name] = handler
+        ros_service = rospy.Service(name, srv_type, handler)
+        self.ros_services.append(ros_service)
+        return ros_service
+
+    def service_proxy(self, name, srv_type):
+        return LocalServiceProxy(self, name, srv_type)
+
+    def deliver(self, topic, msg):
+        for callback in self.callbacks.get(topic, ()):
+            self._call(topic, callback, msg)
+
+    def connect(self, external=()):
+        """Subscribe through ROS the topics without a local publisher and
+        the ``external`` ones, which also have publishers in other
+        processes. Messages published by this process are not delivered
+        twice."""
+        external = {rospy.resolve_name(topic) for topic in external}
+        for topic, msg_type in self.types.items():
+            if topic not in self.publishers or topic in external:
+                self.ros_subscribers.append(
+                    rospy.Subscriber(topic, msg_type, partial(self.deliver_external, topic)))
+
+    def deliver_external(self, topic, msg):
+        # a copia que este processo publicou ja foi entregue em memoria
+        header = getattr(msg, "_connection_header", None)
+        if header is not None and header.get("callerid") == rospy.get_name():
+            return
+        self.deliver(topic, msg)
+
+    def _call(self, topic, callback, msg):
+        # como no rospy: erro em um callback nao derruba quem publicou
+        try:
+            callback(msg)
+        except Exception as e:
+            rospy.logerr(f"in-process bus: callback de {topic} falhou: {e!r}")
+
+
+class InProcessTransport(RosClock):
+    """Transport of one node hosted on an ``InProcessBus``. Private
+    parameters and services ``~name`` live in ``~<node_name>/name``."""
+
+    def __init__(self, bus, node_name):
+        self.bus = bus
+        self.node_name = node_name
+
+    def Publisher(self, topic, msg_type, **kwargs):
+        return self.bus.publisher(rospy.resolve_name(topic), msg_type, **kwargs)
+
+    def Subscriber(self, topic, msg_type, callback, **kwargs):
+        self.bus.subscribe(rospy.resolve_name(topic), msg_type, callback)
+
+    def get_param(self, name, default=None):
+        return rospy.get_param(self.private_name(name), default)
+
+    def Service(self, name, srv_type, handler):
+        return self.bus.service(rospy.resolve_name(self.private_name(name)), srv_type, handler)
+
+    def ServiceProxy(self, name, srv_type):
+        return self.bus.service_proxy(rospy.resolve_name(self.private_name(name)), srv_type)
+
+    def Timer(self, period, callback, oneshot=False):
+        return rospy.Timer(rospy.Duration(period), callback, oneshot=oneshot)
+
+    def private_name(self, name):
+        if name.startswith("~"):
+            return f"~{self.node_name}/{name[1:]}"
+        return name
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Limitador de aceleracao e jerk dos comandos de velocidade, sem ROS.
+#
+# Usado pelo safe_twist.py entre /cmd_vel e /cmd_vel/safe, para que degraus
+# no comando (troca de sentido, goal novo, joystick) nao cheguem direto aos
+# motores e facam as rodas patinarem.
+
+import math
+
+MAX_LINEAR_ACCEL = 1.0          # m/s^2
+MAX_LINEAR_JERK = 5.0           # m/s^3
+MAX_ANGULAR_ACCEL = 10.0        # rad/s^2
+MAX_ANGULAR_JERK = 50.0         # rad/s^3
+EMERGENCY_LINEAR_DECEL = 3.0    # m/s^2, sem limite de jerk
+EMERGENCY_ANGULAR_DECEL = 30.0  # rad/s^2, sem limite de jerk
+
+
+class RateLimiter:
+    """Acceleration- and jerk-limited tracking of a velocity setpoint.
+
+    The acceleration changes at most ``max_jerk * dt`` per step. Each step
+    applies the largest acceleration ``a`` that still lets the next steps
+    ramp it back to zero before the target, ``a*dt + a**2/(2*max_jerk) <=
+    remaining``, so the output settles on the target without a jump in
+    acceleration. ``acceleration`` is the one applied in the last step.
+    ``max_jerk <= 0`` disables the jerk limit (trapezoidal profile).
+    """
+
+    __slots__ = ("max_accel", "max_jerk", "emergency_decel", "velocity", "acceleration")
+
+    def __init__(self, max_accel, max_jerk=0.0, emergency_decel=None):
+        self.max_accel = max_accel
+        self.max_jerk = max_jerk
+        self.emergency_decel = emergency_decel if emergency_decel is not None else max_accel
+        self.reset()
+
+    def reset(self, velocity=0.0):
+        self.velocity = velocity
+        self.acceleration = 0.0
+
+    def step(self, target, dt, emergency=False):
+        if dt <= 0:
+            return self.velocity
+
+        error = target - self.velocity
+
+        # parada de emergencia: desacelera o mais rapido permitido, sem jerk
+        if emergency:
+            max_step = self.emergency_decel * dt
+            self.velocity += max(-max_step, min(max_step, error))
+            self.acceleration = 0.0
+            return self.velocity
+
+        sign = 1.0 if error > 0 else -1.0
+        remaining = abs(error)
+
+        if self.max_jerk <= 0:
+            self.acceleration = sign * min(self.max_accel, remaining / dt)
+            self.velocity += self.acceleration * dt
+            return self.velocity
+
+        # tudo no sentido do alvo: accel > 0 aproxima
+        jerk = self.max_jerk
+        max_change = jerk * dt
+        accel = sign * self.acceleration
+        landing = remaining / dt
+
+        # chega no alvo neste passo e ainda zera a aceleracao no proximo
+        if landing <= max_change and abs(landing - accel) <= max_change:
+            self.acceleration = sign * landing
+            self.velocity = target
+            return target
+
+        # maior aceleracao com a*dt + a^2/(2*jerk) <= restante
+        desired = min(self.max_accel, jerk * (math.sqrt(dt * dt + 2 * remaining / jerk) - dt))
+        accel = max(accel - max_change, min(accel + max_change, desired))
+
+        self.acceleration = sign * accel
+        self.velocity += self.acceleration * dt
+        return self.velocity
+
+
+class VelocityProfiler:
+    """Linear and angular ``RateLimiter`` pair for a twist command."""
+
+    def __init__(self, max_linear_accel=MAX_LINEAR_ACCEL, max_linear_jerk=MAX_LINEAR_JERK,
+                 max_angular_accel=MAX_ANGULAR_ACCEL, max_angular_jerk=MAX_ANGULAR_JERK,
+                 emergency_linear_decel=EMERGENCY_LINEAR_DECEL,
+                 emergency_angular_decel=EMERGENCY_ANGULAR_DECEL):
+        self.linear = RateLimiter(max_linear_accel, max_linear_jerk, emergency_linear_decel)
+        self.angular = RateLimiter(max_angular_accel, max_angular_jerk, emergency_angular_decel)
+
+    def reset(self, linear=0.0, angular=0.0):
+        self.linear.reset(linear)
+        self.angular.reset(angular)
+
+    def step(self, linear, angular, dt, emergency=False):
+        return (self.linear.step(linear, dt, emergency),
+                self.angular.step(angular, dt, emergency))